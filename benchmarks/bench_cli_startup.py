@@ -0,0 +1,60 @@
+"""
+Benchmark du démarrage à froid de la ligne de commande : chaque mesure lance un
+nouvel interpréteur, comme un contrôle de santé planifié.
+
+Compare `cli.py status` et `cli.py --help` (bibliothèque standard seulement) à
+l'import de `main.py` (pandas, SQLAlchemy, requests). Avec `--max-seconds`, le
+script échoue si la médiane de `cli.py status` dépasse le seuil.
+
+Usage :
+    python benchmarks/bench_cli_startup.py [--repeat 10] [--max-seconds 0.2]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+CLI = os.path.join(SRC_DIR, 'cli.py')
+
+
+def median_seconds(command, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=SRC_DIR)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max-seconds', type=float, help="Seuil de la médiane de `cli.py status`.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.sqlite')
+        subprocess.run([sys.executable, CLI, 'init-db', '--database', database], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        commands = {
+            'python -c pass': [sys.executable, '-c', 'pass'],
+            'cli.py --help': [sys.executable, CLI, '--help'],
+            'cli.py status': [sys.executable, CLI, 'status', '--database', database],
+            'import main': [sys.executable, '-c', 'import main'],
+        }
+        results = {name: median_seconds(command, args.repeat) for name, command in commands.items()}
+
+    for name, seconds in results.items():
+        print(f"{name:<16} {seconds * 1000:8.1f} ms")
+    if args.max_seconds is not None and results['cli.py status'] > args.max_seconds:
+        print(f"cli.py status dépasse le seuil de {args.max_seconds * 1000:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark de la transformation parallèle des utilisateurs.
+
+Pour chaque taille de tenant et chaque nombre de processus, mesure
+`transform_users` (utilisateurs et contrats) en série puis en parallèle, et
+vérifie que les DataFrames obtenus sont identiques. Mesure aussi l'envoi des
+utilisateurs bruts aux processus par pickle, inclus dans le temps parallèle.
+
+Usage :
+    python benchmarks/bench_parallel_transform.py [nombre_utilisateurs ...] [--workers 2 4]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from data_processor import transform_users, PARALLEL_START_METHOD
+from synthetic import generate_users
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare la transformation des utilisateurs en série et en parallèle.")
+    parser.add_argument('sizes', nargs='*', type=int, default=[100_000])
+    parser.add_argument('--workers', nargs='+', type=int, default=[2, 4])
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPU disponibles, processus lancés par '{PARALLEL_START_METHOD}'")
+    for size in args.sizes:
+        users = generate_users(size)
+        serial, serial_seconds = timed(transform_users, users)
+        _, pickle_seconds = timed(lambda: pickle.loads(pickle.dumps(users, protocol=5)))
+        print(f"{size:>9} série : {serial_seconds:6.2f}s (pickle des utilisateurs bruts : {pickle_seconds:6.2f}s)")
+        for workers in args.workers:
+            parallel, parallel_seconds = timed(transform_users, users, workers=workers, min_rows=1)
+            for expected, frame in zip(serial, parallel):
+                pd.testing.assert_frame_equal(frame, expected)
+            print(f"{size:>9} {workers} processus : {parallel_seconds:6.2f}s "
+                  f"(accélération x{serial_seconds / parallel_seconds:4.2f})")
+
+
+if __name__ == '__main__':
+    main()
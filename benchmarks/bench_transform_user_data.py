@@ -0,0 +1,75 @@
+"""
+Benchmark de `transform_user_data` : implémentation colonne par colonne
+comparée à l'ancienne implémentation à base de `apply` ligne par ligne.
+
+Usage :
+    python benchmarks/bench_transform_user_data.py [nombre_utilisateurs ...]
+"""
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from data_processor import extract_role_ids, process_users, transform_user_data
+from synthetic import generate_users
+
+
+def legacy_transform_user_data(df: pd.DataFrame) -> pd.DataFrame:
+    # Implémentation d'origine, conservée comme référence, complétée de l'ID du manager
+    df['managerId'] = df['manager'].apply(
+        lambda x: x.get('id') if isinstance(x, dict) else None
+    ).astype('Int64')
+    df['department'] = df['department'].apply(
+        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
+    )
+    df['legalEntity'] = df['legalEntity'].apply(
+        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
+    )
+    df['rolePrincipal'] = df['rolePrincipal'].apply(
+        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
+    )
+    df['manager'] = df['manager'].apply(
+        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
+    )
+    df['theoreticalRemuneration'] = df['applicationData'].apply(
+        lambda x: x.get('theoreticalRemuneration', {}).get('value', 'Unknown')
+        if isinstance(x, dict) else 'Unknown'
+    )
+    df['habilitedRoles'] = df['habilitedRoles'].apply(extract_role_ids)
+    df['habilitedRoles'] = df['habilitedRoles'].apply(json.dumps)
+    df.drop(columns=['applicationData'], errors='ignore', inplace=True)
+    return df
+
+
+def best_of(func, users, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        df = process_users(users)
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(sizes):
+    for size in sizes:
+        users = generate_users(size)
+        # Mêmes valeurs, les colonnes à faible cardinalité étant désormais catégorielles
+        pd.testing.assert_frame_equal(
+            transform_user_data(process_users(users)).astype(object),
+            legacy_transform_user_data(process_users(users)).astype(object),
+        )
+        legacy = best_of(legacy_transform_user_data, users)
+        current = best_of(transform_user_data, users)
+        print(f"{size:>9} utilisateurs : apply {legacy * 1000:8.1f} ms, "
+              f"colonnes {current * 1000:8.1f} ms, gain x{legacy / current:.1f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,75 @@
+"""
+Benchmark de la mémoire occupée par les utilisateurs transformés.
+
+Pour chaque taille de tenant, compare la représentation précédente (colonnes
+de chaînes, un objet par ligne) à la représentation compacte de
+`transform_user_data` (colonnes à faible cardinalité encodées en catégories),
+ainsi que les contrats construits ligne par ligne ou colonne par colonne :
+mémoire du DataFrame (`memory_usage(deep=True)`), octets par utilisateur et
+pic mémoire de la construction (tracemalloc).
+
+Usage :
+    python benchmarks/bench_user_memory.py [nombre_utilisateurs ...]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from data_processor import (process_users, transform_user_data, process_contracts_from_users,
+                            CATEGORICAL_USER_COLUMNS)
+from synthetic import generate_users
+
+
+def legacy_transform_user_data(users):
+    # Représentation précédente : les colonnes catégorielles redeviennent des colonnes de chaînes
+    df = transform_user_data(process_users(users))
+    for column in CATEGORICAL_USER_COLUMNS:
+        df[column] = df[column].astype(df[column].cat.categories.dtype)
+    return df
+
+
+def legacy_process_contracts_from_users(users):
+    # Implémentation précédente : un dictionnaire intermédiaire par contrat
+    return pd.DataFrame([
+        {
+            "user_id": user.get("id"),
+            "start_date": user.get("dtContractStart"),
+            "end_date": user.get("dtContractEnd"),
+            "theoretical_remuneration": user.get("applicationData", {}).get("theoreticalRemuneration", {}).get("value", "Unknown"),
+        }
+        for user in users
+    ])
+
+
+def measure(func, users):
+    gc.collect()
+    tracemalloc.start()
+    df = func(users)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df.memory_usage(deep=True).sum(), peak
+
+
+def main(sizes):
+    for size in sizes:
+        users = generate_users(size)
+        for name, before, after in [
+            ('users', legacy_transform_user_data, lambda users: transform_user_data(process_users(users))),
+            ('contracts', legacy_process_contracts_from_users, process_contracts_from_users),
+        ]:
+            before_bytes, before_peak = measure(before, users)
+            after_bytes, after_peak = measure(after, users)
+            print(f"{size:>9} {name:<9} : avant {before_bytes / 2 ** 20:7.1f} MiB ({before_bytes / size:6.0f} o/utilisateur, "
+                  f"pic {before_peak / 2 ** 20:7.1f} MiB), après {after_bytes / 2 ** 20:7.1f} MiB "
+                  f"({after_bytes / size:6.0f} o/utilisateur, pic {after_peak / 2 ** 20:7.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100_000])
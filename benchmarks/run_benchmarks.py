@@ -0,0 +1,156 @@
+"""
+Benchmark de bout en bout du pipeline de synchronisation contre l'API simulée.
+
+Pour chaque taille de tenant, mesure séparément le débit (lignes/s) et le pic
+mémoire (tracemalloc) des étapes : récupération (`get_users`, `get_departments`),
+transformation (`transform_user_data`, `process_contracts_from_users`,
+`process_departments`) et écriture (`insert_new_records`).
+
+Usage :
+    python benchmarks/run_benchmarks.py 1000 10000 100000 [--latency 0.02] [--rate-limit-every 50] [--json rapport.json]
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from api_client import LuccaAPIClient, RateLimiter
+from data_processor import (process_users, transform_user_data, process_contracts_from_users,
+                            process_departments, clean_user_data)
+from db_manager import initialize_db, insert_new_records, create_sqlite_engine
+from stub_api import StubLuccaAPI
+from sync import USER_FIELDS, DEPARTMENT_FIELDS
+
+
+def measure(func, trace_memory: bool):
+    """
+    Exécute `func` une fois pour le temps, puis une seconde fois sous tracemalloc pour le pic mémoire.
+
+    Returns:
+        tuple: (résultat, durée en secondes, pic mémoire en octets ou None)
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def fresh_engine(directory: str, name: str):
+    engine = create_sqlite_engine(os.path.join(directory, name))
+    initialize_db(engine)
+    return engine
+
+
+def run_size(size: int, args) -> list:
+    results = []
+
+    def record(stage, rows, elapsed, peak):
+        results.append({
+            'users': size,
+            'stage': stage,
+            'rows': rows,
+            'seconds': round(elapsed, 4),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed else None,
+            'peak_memory_mib': round(peak / 2 ** 20, 2) if peak is not None else None,
+        })
+
+    with StubLuccaAPI(user_count=size, seed=args.seed, latency=args.latency,
+                      rate_limit_every=args.rate_limit_every, retry_after=0) as api, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ['API_URL'] = api.url
+        os.environ.setdefault('LUCCA_API_TOKEN', 'benchmark')
+        client = LuccaAPIClient(page_size=args.page_size, max_workers=args.workers,
+                                rate_limiter=RateLimiter(rate=args.rate, max_rate=args.rate))
+
+        users, elapsed, peak = measure(lambda: client.get_users(params={'fields': USER_FIELDS}), args.memory)
+        assert len(users) == size, f"{len(users)} utilisateurs récupérés sur {size}"
+        record('get_users', len(users), elapsed, peak)
+
+        departments, elapsed, peak = measure(lambda: client.get_departments(params={'fields': DEPARTMENT_FIELDS}), args.memory)
+        record('get_departments', len(departments), elapsed, peak)
+
+        users_df, elapsed, peak = measure(lambda: transform_user_data(process_users(users)), args.memory)
+        record('transform_user_data', len(users_df), elapsed, peak)
+
+        contracts_df, elapsed, peak = measure(lambda: process_contracts_from_users(users), args.memory)
+        record('process_contracts_from_users', len(contracts_df), elapsed, peak)
+
+        departments_df, elapsed, peak = measure(lambda: process_departments(departments), args.memory)
+        record('process_departments', len(departments_df), elapsed, peak)
+
+        users_df = clean_user_data(users_df)
+        del users
+        for table, df, key in [('contracts', contracts_df, 'user_id'), ('users', users_df, 'id'),
+                               ('departments', departments_df, 'id')]:
+            engines = iter([fresh_engine(tmp_dir, f'{table}_{i}.sqlite') for i in range(2)])
+            inserted, elapsed, peak = measure(lambda: insert_new_records(df, next(engines), table, id_column=key), args.memory)
+            record(f'insert_new_records[{table}]', inserted, elapsed, peak)
+
+        results.append({'users': size, 'stage': 'http', 'requests': api.requests,
+                        'rate_limited': api.rate_limited, 'bytes': api.bytes_sent})
+    return results
+
+
+def print_results(results):
+    print(f"{'utilisateurs':>12}  {'étape':<36}{'lignes':>10}{'secondes':>10}{'lignes/s':>12}{'pic MiB':>10}")
+    for result in results:
+        if result['stage'] == 'http':
+            print(f"{result['users']:>12}  {'http':<36}{result['requests']:>10} requêtes, "
+                  f"{result['rate_limited']} limitées, {result['bytes'] / 2 ** 20:.1f} MiB reçus")
+            continue
+        peak = f"{result['peak_memory_mib']:.1f}" if result['peak_memory_mib'] is not None else '-'
+        print(f"{result['users']:>12}  {result['stage']:<36}{result['rows']:>10}{result['seconds']:>10.3f}"
+              f"{result['rows_per_second'] or 0:>12.0f}{peak:>10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sizes', nargs='*', type=int, default=[1_000, 10_000, 100_000],
+                        help="Tailles de tenant (nombre d'utilisateurs), jusqu'à 1 000 000.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help="Latence de l'API simulée, en secondes.")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Injecte un HTTP 429 toutes les n requêtes.")
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=1_000.0, help="Débit maximal du client, en requêtes/s.")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="Ne pas mesurer le pic mémoire.")
+    parser.add_argument('--json', help="Écrit les résultats dans ce fichier JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Les nouvelles tentatives sur 429 sont comptées dans le rapport, pas journalisées
+    logging.basicConfig(level=logging.ERROR)
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size, args))
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Serveur HTTP local simulant les endpoints `/api/v3/users` et `/api/v3/departments` de Lucca.
+
+Il sert les données de `synthetic.py`, respecte la pagination `paging=offset,limit`,
+le filtre `modifiedOn=since,...` et les requêtes conditionnelles (`ETag`,
+`If-None-Match`), et peut simuler une latence ainsi que des limites de taux
+(HTTP 429 avec `Retry-After`).
+
+Usage :
+    with StubLuccaAPI(user_count=10_000, latency=0.05, rate_limit_every=20) as api:
+        os.environ['API_URL'] = api.url
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import synthetic
+
+
+class StubLuccaAPI:
+    def __init__(self, user_count: int = 1_000, department_count: Optional[int] = None, seed: int = 0,
+                 latency: float = 0.0, max_page_size: int = 1_000, rate_limit_every: int = 0,
+                 retry_after: float = 0.0, port: int = 0):
+        """
+        Args:
+            user_count (int): Nombre d'utilisateurs du tenant simulé.
+            department_count (int, optional): Nombre de départements. Par défaut proportionnel aux utilisateurs.
+            seed (int): Graine des données générées.
+            latency (float): Délai ajouté à chaque réponse, en secondes.
+            max_page_size (int): Limite appliquée au paramètre `paging`.
+            rate_limit_every (int): Renvoie un HTTP 429 toutes les `n` requêtes (0 pour désactiver).
+            retry_after (float): Valeur de l'en-tête `Retry-After` des réponses 429.
+            port (int): Port d'écoute, 0 pour un port libre.
+        """
+        self.user_count = user_count
+        self.department_count = department_count or synthetic.default_department_count(user_count)
+        self.seed = seed
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'StubLuccaAPI':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'StubLuccaAPI':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _next_request_is_limited(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            limited = self.rate_limit_every > 0 and self.requests % self.rate_limit_every == 0
+            self.rate_limited += int(limited)
+            return limited
+
+    def _page(self, query):
+        offset, limit = 0, self.max_page_size
+        if 'paging' in query:
+            offset, limit = (int(value) for value in query['paging'][0].split(','))
+        return offset, min(limit, self.max_page_size)
+
+    def users_page(self, query):
+        offset, limit = self._page(query)
+        first_id = 1
+        modified_filter = query.get('modifiedOn', [''])[0]
+        if modified_filter.startswith('since,'):
+            first_id = synthetic.first_user_modified_since(modified_filter.split(',', 1)[1])
+        start = first_id + offset
+        stop = min(start + limit, self.user_count + 1)
+        return [synthetic.make_user(user_id, self.seed, self.department_count) for user_id in range(start, stop)]
+
+    def departments_page(self, query):
+        offset, limit = self._page(query)
+        stop = min(offset + limit, self.department_count)
+        return [
+            synthetic.make_department(department_id, self.user_count, self.department_count, self.seed)
+            for department_id in range(offset + 1, stop + 1)
+        ]
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                if body is None:
+                    payload = b''
+                elif isinstance(body, bytes):
+                    payload = body
+                else:
+                    payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+                with api._lock:
+                    api.bytes_sent += len(payload)
+
+            def do_GET(self):
+                if api.latency:
+                    time.sleep(api.latency)
+                if api._next_request_is_limited():
+                    self._send(429, {'message': 'Rate limit exceeded'}, {'Retry-After': str(api.retry_after)})
+                    return
+
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/api/v3/users':
+                    items = api.users_page(query)
+                elif url.path == '/api/v3/departments':
+                    items = api.departments_page(query)
+                else:
+                    self._send(404, {'message': 'Not found'})
+                    return
+                payload = json.dumps({'header': {}, 'data': {'items': items}}).encode('utf-8')
+                etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    with api._lock:
+                        api.not_modified += 1
+                    self._send(304, None, {'ETag': etag})
+                    return
+                self._send(200, payload, {'ETag': etag})
+
+        return Handler
@@ -0,0 +1,152 @@
+"""
+Générateur reproductible de données Lucca synthétiques (utilisateurs et départements).
+
+Chaque enregistrement est dérivé uniquement de la graine et de son index : une
+page quelconque peut donc être générée sans matérialiser tout le tenant, ce qui
+permet de simuler jusqu'à un million d'utilisateurs.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+BASE_URL = 'https://synthetic.ilucca.net'
+# Les modifiedOn sont croissants avec l'id : un filtre `since` revient à un offset
+MODIFIED_ON_START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+MODIFIED_ON_STEP = timedelta(seconds=60)
+
+FIRST_NAMES = ['Alice', 'Bruno', 'Camille', 'David', 'Emma', 'Félix', 'Gaëlle', 'Hugo', 'Inès', 'Jules', 'Léa', 'Louis']
+LAST_NAMES = ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau']
+LEGAL_ENTITIES = ['Reflect SAS', 'Reflect Belgium', 'Reflect GmbH', 'Reflect Ltd']
+ROLES = [f'Role {i}' for i in range(1, 31)]
+
+
+def default_department_count(user_count: int) -> int:
+    """Nombre de départements proportionné au nombre d'utilisateurs (environ un pour 50)."""
+    return max(5, min(5_000, user_count // 50))
+
+
+def department_of(user_id: int, department_count: int) -> int:
+    return 1 + (user_id - 1) % department_count
+
+
+def modified_on(user_id: int) -> str:
+    return (MODIFIED_ON_START + MODIFIED_ON_STEP * user_id).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def first_user_modified_since(since: str) -> int:
+    """Plus petit id d'utilisateur dont le `modifiedOn` est postérieur ou égal à `since`."""
+    since_dt = datetime.fromisoformat(since.replace('Z', '+00:00'))
+    if since_dt.tzinfo is None:
+        since_dt = since_dt.replace(tzinfo=timezone.utc)
+    elapsed = (since_dt - MODIFIED_ON_START) / MODIFIED_ON_STEP
+    return max(1, int(-(-elapsed // 1)))
+
+
+def _ref(kind: str, ref_id: int, name: str) -> Dict[str, Any]:
+    return {'id': ref_id, 'name': name, 'url': f'{BASE_URL}/api/v3/{kind}/{ref_id}'}
+
+
+def make_user(user_id: int, seed: int = 0, department_count: int = 20) -> Dict[str, Any]:
+    """
+    Génère l'utilisateur `user_id` avec les champs demandés par `main.py`.
+
+    Args:
+        user_id (int): Identifiant (à partir de 1).
+        seed (int): Graine du tenant.
+        department_count (int): Nombre de départements du tenant.
+
+    Returns:
+        Dict[str, Any]: Utilisateur au format de l'API Lucca v3.
+    """
+    rng = random.Random(seed * 1_000_003 + user_id)
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+    department_id = department_of(user_id, department_count)
+    manager_id = rng.randint(1, user_id - 1) if user_id > 1 and rng.random() > 0.05 else None
+    contract_start = datetime(2015, 1, 1) + timedelta(days=rng.randint(0, 3000))
+    has_left = rng.random() < 0.1
+
+    return {
+        'id': user_id,
+        'name': f'{first_name} {last_name}',
+        'url': f'{BASE_URL}/api/v3/users/{user_id}',
+        'displayName': f'{last_name} {first_name}',
+        'modifiedOn': modified_on(user_id),
+        'lastName': last_name,
+        'firstName': first_name,
+        'login': f'{first_name[0].lower()}{last_name.lower()}{user_id}',
+        'mail': f'{first_name.lower()}.{last_name.lower()}{user_id}@example.com',
+        'birthDate': f'{rng.randint(1960, 2002)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00',
+        'department': _ref('departments', department_id, f'Department {department_id}'),
+        'manager': _ref('users', manager_id, f'User {manager_id}') if manager_id else None,
+        'rolePrincipal': _ref('roles', rng.randint(1, len(ROLES)), rng.choice(ROLES)),
+        'legalEntity': _ref('legal-entities', 1, rng.choice(LEGAL_ENTITIES)),
+        'employeeNumber': f'E{user_id:07d}',
+        'dtContractStart': contract_start.strftime('%Y-%m-%dT00:00:00'),
+        'dtContractEnd': (contract_start + timedelta(days=rng.randint(30, 2000))).strftime('%Y-%m-%dT00:00:00') if has_left else None,
+        'applicationData': {
+            'theoreticalRemuneration': {'value': rng.randint(25_000, 120_000), 'currencyId': 'EUR'}
+        } if rng.random() > 0.05 else {},
+        'habilitedRoles': [
+            _ref('roles', role_id, ROLES[role_id - 1]) for role_id in sorted(rng.sample(range(1, len(ROLES) + 1), rng.randint(0, 4)))
+        ],
+    }
+
+
+def make_department(department_id: int, user_count: int, department_count: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Génère le département `department_id`, avec ses membres et sa position dans l'arborescence.
+
+    Args:
+        department_id (int): Identifiant (à partir de 1).
+        user_count (int): Nombre d'utilisateurs du tenant.
+        department_count (int): Nombre de départements du tenant.
+        seed (int): Graine du tenant.
+
+    Returns:
+        Dict[str, Any]: Département au format de l'API Lucca v3.
+    """
+    rng = random.Random(seed * 7_919 + department_id)
+    parent_id = department_id // 2 if department_id > 1 else None
+    level = department_id.bit_length() - 1
+    members = [
+        _ref('users', user_id, f'User {user_id}') for user_id in range(department_id, user_count + 1, department_count)
+    ]
+    hierarchy = []
+    current = department_id
+    while current:
+        hierarchy.append(current)
+        current //= 2
+
+    return {
+        'id': department_id,
+        'name': f'Department {department_id}',
+        'code': f'D{department_id:04d}',
+        'hierarchy': '/' + '/'.join(str(d) for d in reversed(hierarchy)) + '/',
+        'parentId': parent_id,
+        'isActive': rng.random() > 0.05,
+        'position': department_id,
+        'level': level,
+        'sortOrder': department_id,
+        'headID': members[0]['id'] if members else None,
+        'users': members,
+        'currentUsers': members,
+        'currentUsersCount': len(members),
+    }
+
+
+def iter_users(count: int, seed: int = 0, department_count: int = None, start: int = 1) -> Iterator[Dict[str, Any]]:
+    department_count = department_count or default_department_count(count)
+    for user_id in range(start, count + 1):
+        yield make_user(user_id, seed, department_count)
+
+
+def generate_users(count: int, seed: int = 0, department_count: int = None) -> List[Dict[str, Any]]:
+    """Génère les `count` utilisateurs d'un tenant synthétique."""
+    return list(iter_users(count, seed, department_count))
+
+
+def generate_departments(user_count: int, seed: int = 0, department_count: int = None) -> List[Dict[str, Any]]:
+    """Génère les départements d'un tenant synthétique de `user_count` utilisateurs."""
+    department_count = department_count or default_department_count(user_count)
+    return [make_department(d, user_count, department_count, seed) for d in range(1, department_count + 1)]
@@ -1,3 +1,3 @@
 export API_URL= #Url
 export LUCCA_API_TOKEN= #Token
-python src/main.py
\ No newline at end of file
+python src/cli.py sync
\ No newline at end of file
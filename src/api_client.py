@@ -1,67 +1,816 @@
 import requests
-from typing import Dict, Any, List, Optional
+from requests.adapters import HTTPAdapter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+import codecs
+import hashlib
+import json
 import logging
 import os
+import random
+import threading
+import time
+
+# Taille de page et nombre de requêtes simultanées par défaut
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_MAX_WORKERS = 4
+# Tri envoyé avec chaque page : les pages demandées en parallèle découpent un même ordre total,
+# sans dépendre de l'ordre par défaut du serveur
+DEFAULT_ORDER_BY = 'id,asc'
+
+# Débit initial (requêtes/seconde) et politique de nouvelle tentative par défaut
+DEFAULT_RATE = 10.0
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 60.0
+
+# Statuts HTTP transitoires pour lesquels une nouvelle tentative est faite
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Durée de fraîcheur et taille maximale par défaut du cache de réponses
+DEFAULT_CACHE_TTL = 300.0
+DEFAULT_CACHE_MAX_BYTES = 256 * 2 ** 20
+
+# Taille des blocs lus sur le flux de la réponse en mode de décodage incrémental
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Observateur des requêtes de l'appelant en cours (voir `LuccaAPIClient.observe_requests`).
+# Le contexte est recopié dans les threads du pool de pages : chaque requête est imputée
+# à l'appelant qui l'a demandée, même si d'autres parcours tournent en même temps.
+_request_observer: ContextVar[Optional[Callable[[Dict[str, Any]], None]]] = ContextVar(
+    'lucca_request_observer', default=None)
+
+
+def _notify_observer(counts: Dict[str, Any]) -> None:
+    observer = _request_observer.get()
+    if observer is not None:
+        observer(counts)
+
+
+class LuccaAPIError(Exception):
+    """Erreur renvoyée par l'API Lucca (statut HTTP ou message d'erreur dans la réponse)."""
+
+
+class RateLimitError(LuccaAPIError):
+    """Limite de taux atteinte, malgré les nouvelles tentatives."""
+
+
+def _header(headers, *names: str) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Convertit un en-tête `Retry-After` (secondes ou date HTTP) en délai en secondes.
+
+    Args:
+        value (str): Valeur de l'en-tête.
+        now (float, optional): Horodatage epoch de référence. Par défaut l'heure courante.
+
+    Returns:
+        Optional[float]: Délai en secondes, ou None si l'en-tête est absent ou invalide.
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at - (time.time() if now is None else now), 0.0)
+
+
+class _JSONStreamReader:
+    """Tampon de texte alimenté bloc par bloc, dont les valeurs JSON sont décodées au fil de l'eau."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def _fill(self) -> bool:
+        # Ajoute un bloc au tampon en abandonnant la partie déjà décodée ; False en fin de flux
+        if self.exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            text = self._utf8.decode(b'', final=True)
+        else:
+            text = self._utf8.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Renvoie le prochain caractère significatif sans le consommer ('' en fin de flux)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON invalide : '{char}' attendu, '{found}' trouvé.")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Décode la valeur JSON suivante, en lisant autant de blocs que nécessaire."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Un nombre en fin de tampon peut se poursuivre dans le bloc suivant
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_json_path(reader: _JSONStreamReader, path: Sequence[str], top_level: bool) -> Iterator[Any]:
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if top_level and key == 'message':
+            raise LuccaAPIError(reader.value())
+        if key == path[0] and len(path) > 1:
+            yield from _iter_json_path(reader, path[1:], top_level=False)
+        elif key == path[0]:
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        raise ValueError(f"JSON invalide : ',' ou ']' attendu, '{separator}' trouvé.")
+        else:
+            reader.value()
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f"JSON invalide : ',' ou '}}' attendu, '{separator}' trouvé.")
+
+
+def iter_json_items(chunks: Iterable[bytes], path: Sequence[str] = ('data', 'items')) -> Iterator[Any]:
+    """
+    Décode incrémentalement un corps JSON et renvoie un à un les éléments du tableau situé à `path`.
+
+    Seul l'élément en cours de décodage et le bloc courant sont en mémoire : le
+    corps complet n'est jamais assemblé, et les autres clés sont ignorées.
+
+    Args:
+        chunks (Iterable[bytes]): Blocs successifs du corps (par exemple `response.iter_content()`).
+        path (Sequence[str]): Clés menant au tableau, depuis l'objet racine.
+
+    Yields:
+        Any: Éléments du tableau, dans l'ordre du corps.
+
+    Raises:
+        LuccaAPIError: Si l'objet racine porte une clé `message` (réponse d'erreur de l'API).
+        ValueError: Si le corps n'est pas un JSON valide.
+    """
+    reader = _JSONStreamReader(chunks)
+    yield from _iter_json_path(reader, path, top_level=True)
+    if reader.peek():
+        raise ValueError("JSON invalide : données après l'objet racine.")
+
+
+def _is_rate_limit_message(data: Any) -> bool:
+    message = data.get('message') if isinstance(data, dict) else None
+    return isinstance(message, str) and message.lower() == "rate limit exceeded"
+
+
+class RateLimiter:
+    """
+    Seau à jetons partagé par tous les workers d'un client.
+
+    Le débit s'adapte au quota du tenant : il est recalculé à partir des en-têtes
+    `RateLimit-Remaining`/`RateLimit-Reset` quand l'API les fournit, augmente
+    doucement après chaque succès et est divisé par deux à chaque limite de taux
+    (AIMD). Un `Retry-After` suspend toutes les requêtes jusqu'à son échéance.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: Optional[float] = None,
+                 min_rate: float = 0.5, max_rate: Optional[float] = None,
+                 increase: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("Le débit doit être positif.")
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 4
+        self.increase = increase
+        self.clock = clock
+        self.sleep = sleep
+
+        self._tokens = self.burst
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(now - self._updated, 0.0)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Attend qu'un jeton soit disponible et le consomme.
+
+        Returns:
+            float: Temps passé à attendre dans la file, en secondes.
+        """
+        start = self.clock()
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                delay = self._blocked_until - now
+                if delay <= 0:
+                    # Tolérance pour les erreurs d'arrondi du remplissage
+                    if self._tokens >= 1 - 1e-9:
+                        self._tokens = max(self._tokens - 1, 0.0)
+                        return now - start
+                    delay = (1 - self._tokens) / self.rate
+            self.sleep(delay)
+
+    def defer(self, seconds: float) -> None:
+        """Suspend l'émission de toutes les requêtes pendant `seconds` secondes."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+
+    def on_success(self, headers=None) -> None:
+        """Met à jour le débit après une réponse acceptée, à partir des en-têtes de quota s'il y en a."""
+        remaining = _header(headers or {}, 'RateLimit-Remaining', 'X-RateLimit-Remaining')
+        reset = _header(headers or {}, 'RateLimit-Reset', 'X-RateLimit-Reset')
+        with self._lock:
+            try:
+                remaining = int(remaining) if remaining is not None else None
+                reset = float(reset) if reset is not None else None
+            except (TypeError, ValueError):
+                remaining = reset = None
+
+            if remaining is not None and reset is not None:
+                # Un reset très grand est un horodatage epoch plutôt qu'un délai
+                if reset > 1e9:
+                    reset = reset - time.time()
+                reset = max(reset, 0.0)
+                if remaining <= 0:
+                    self._blocked_until = max(self._blocked_until, self.clock() + reset)
+                else:
+                    learned = remaining / max(reset, 1.0)
+                    self.rate = min(self.max_rate, max(self.min_rate, learned))
+                self._tokens = min(self._tokens, float(max(remaining, 0)))
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self) -> None:
+        """Réduit le débit de moitié après une limite de taux."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+
+
+class ResponseCache:
+    """
+    Cache disque des réponses de l'API, indexé par endpoint et paramètres.
+
+    Une entrée fraîche (moins de `ttl` secondes) est servie sans requête. Une
+    entrée expirée est revalidée par une requête conditionnelle (`If-None-Match`
+    ou `If-Modified-Since`) quand la réponse d'origine portait un `ETag` ou un
+    `Last-Modified` ; sinon elle est simplement retéléchargée. La taille totale
+    est bornée à `max_bytes` par éviction des entrées les moins récemment utilisées.
+    """
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_CACHE_TTL, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    @staticmethod
+    def key(endpoint: str, params: Optional[Dict[str, Any]]) -> str:
+        canonical = json.dumps([endpoint, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f'{key}.{suffix}')
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Renvoie les métadonnées d'une entrée (validateurs, date de stockage), ou None."""
+        try:
+            with open(self._path(key, 'meta'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._path(key, 'body')):
+            return None
+        return meta
+
+    def is_fresh(self, meta: Dict[str, Any]) -> bool:
+        return time.time() - meta['stored_at'] < self.ttl
+
+    @staticmethod
+    def conditional_headers(meta: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Lit le corps d'une entrée et la marque comme récemment utilisée.
+
+        Renvoie None si le corps a disparu ou est illisible : un autre worker a pu
+        l'évincer depuis `get`. L'appelant traite alors l'entrée comme absente.
+        """
+        body_path = self._path(key, 'body')
+        try:
+            with open(body_path, 'rb') as f:
+                body = json.loads(f.read())
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self.hits += 1
+        return body
+
+    def _write(self, path: str, content: bytes) -> int:
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        return len(content) - previous
+
+    def put(self, key: str, content: bytes, headers) -> None:
+        """Enregistre le corps brut d'une réponse HTTP 200 et ses validateurs."""
+        meta = {
+            'etag': _header(headers or {}, 'ETag'),
+            'last_modified': _header(headers or {}, 'Last-Modified'),
+            'stored_at': time.time(),
+        }
+        with self._lock:
+            self.misses += 1
+            # Le corps est écrit avant les métadonnées, qui signalent une entrée complète
+            self._size += self._write(self._path(key, 'body'), content)
+            self._size += self._write(self._path(key, 'meta'), json.dumps(meta).encode('utf-8'))
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def refresh(self, key: str, meta: Dict[str, Any], headers) -> Optional[Dict[str, Any]]:
+        """Prolonge une entrée revalidée (HTTP 304) et renvoie son corps, ou None s'il a été évincé."""
+        meta = dict(meta, stored_at=time.time())
+        meta['etag'] = _header(headers or {}, 'ETag') or meta.get('etag')
+        meta['last_modified'] = _header(headers or {}, 'Last-Modified') or meta.get('last_modified')
+        with self._lock:
+            self.revalidations += 1
+            self._size += self._write(self._path(key, 'meta'), json.dumps(meta).encode('utf-8'))
+        return self.load(key)
+
+    def _evict(self) -> None:
+        # Éviction LRU : la date de modification du corps est mise à jour à chaque lecture
+        bodies = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.body')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in bodies:
+            if self._size <= self.max_bytes:
+                break
+            key = entry.name[:-len('.body')]
+            for suffix in ('meta', 'body'):
+                path = self._path(key, suffix)
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._size -= size
+
 
 class LuccaAPIClient:
-    def __init__(self):
-        self.base_url = os.getenv('API_URL')
-        self.api_token = os.getenv('LUCCA_API_TOKEN')
+    def __init__(self, page_size: Optional[int] = None, max_workers: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 cache: Optional[ResponseCache] = None, base_url: Optional[str] = None,
+                 api_token: Optional[str] = None, stream_json: Optional[bool] = None):
+        # Par défaut, le tenant est lu dans l'environnement (API_URL, LUCCA_API_TOKEN)
+        self.base_url = base_url or os.getenv('API_URL')
+        self.api_token = api_token or os.getenv('LUCCA_API_TOKEN')
 
         if not self.api_token:
             raise ValueError("Le token API est manquant.")
 
+        self.page_size = page_size or int(os.getenv('LUCCA_PAGE_SIZE', DEFAULT_PAGE_SIZE))
+        self.max_workers = max_workers or int(os.getenv('LUCCA_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+        if self.page_size < 1 or self.max_workers < 1:
+            raise ValueError("La taille de page et le nombre de workers doivent être positifs.")
+
         self.headers = {
             'Authorization': f'lucca application={self.api_token}',
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
 
+        # Session partagée : les connexions keep-alive sont réutilisées par tous les workers,
+        # y compris lorsque les utilisateurs et les départements sont récupérés en parallèle
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2 * self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Ordonnanceur de requêtes partagé par les workers
+        self.rate_limiter = rate_limiter or RateLimiter(rate=float(os.getenv('LUCCA_RATE_LIMIT', DEFAULT_RATE)))
+        self.max_retries = max_retries
+        self._stats_lock = threading.Lock()
+
+        # Cache de réponses optionnel, activé par LUCCA_CACHE_DIR
+        if cache is None and os.getenv('LUCCA_CACHE_DIR'):
+            cache = ResponseCache(
+                os.getenv('LUCCA_CACHE_DIR'),
+                ttl=float(os.getenv('LUCCA_CACHE_TTL', DEFAULT_CACHE_TTL)),
+                max_bytes=int(os.getenv('LUCCA_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES)),
+            )
+        self.cache = cache
+
+        # Décodage incrémental des réponses (LUCCA_STREAM_JSON=1) : le corps n'est jamais chargé en entier
+        if stream_json is None:
+            stream_json = os.getenv('LUCCA_STREAM_JSON', '').lower() in ('1', 'true', 'yes')
+        self.stream_json = stream_json
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'bytes_downloaded': 0,
+            'queue_wait_seconds': 0.0,
+            'max_queue_wait_seconds': 0.0,
+        }
+
         # Configuration du logger
         self.logger = logging.getLogger(__name__)
-        self.logger.info(f"API_TOKEN chargé: {self.api_token}")
+        # Le token lui-même n'est jamais journalisé
+        self.logger.info("API_TOKEN chargé.")
         self.logger.info(f"BASE_URL chargé: {self.base_url}")
 
-    def get_users(self, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def _fetch_page(self, endpoint: str, params: Optional[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
         """
-        Récupère la liste des utilisateurs depuis l'API Lucca.
+        Récupère une page de résultats à partir de l'offset donné.
 
         Args:
-            params (dict): Paramètres de requête supplémentaires.
+            endpoint (str): URL de l'endpoint.
+            params (dict): Paramètres de requête communs à toutes les pages.
+            offset (int): Index du premier élément de la page.
 
         Returns:
-            List[Dict[str, Any]]: Liste des utilisateurs.
+            List[Dict[str, Any]]: Éléments de la page.
+
+        Raises:
+            LuccaAPIError: Si l'API renvoie une erreur après les nouvelles tentatives.
+        """
+        page_params = dict(params or {})
+        page_params.setdefault('orderBy', DEFAULT_ORDER_BY)
+        page_params['paging'] = f'{offset},{self.page_size}'
+
+        data = self._request(endpoint, page_params)
+
+        # Vérifier si la réponse contient un message d'erreur
+        if 'message' in data:
+            self.logger.error(f"Erreur dans la réponse : {data['message']}")
+            raise LuccaAPIError(data['message'])
+
+        return data.get('data', {}).get('items', [])
+
+    def _record(self, waited: float, retried: bool = False, rate_limited: bool = False,
+                downloaded: int = 0) -> None:
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_downloaded'] += downloaded
+            self.stats['retries'] += int(retried)
+            self.stats['rate_limited'] += int(rate_limited)
+            self.stats['queue_wait_seconds'] += waited
+            self.stats['max_queue_wait_seconds'] = max(self.stats['max_queue_wait_seconds'], waited)
+        _notify_observer({'requests': 1, 'retries': int(retried), 'bytes_downloaded': downloaded})
+
+    @staticmethod
+    @contextmanager
+    def observe_requests(observer: Callable[[Dict[str, Any]], None]) -> Iterator[None]:
         """
-        endpoint = f'{self.base_url}/api/v3/users?formerEmployees=true'
-        params = params
-        
+        Transmet à `observer` les compteurs de chaque requête émise dans le bloc.
+
+        Contrairement à la différence des compteurs partagés `stats`, seules les
+        requêtes émises par le thread appelant, ou pour son compte par le pool de
+        pages, sont transmises. L'observateur reçoit 'requests', 'retries' et
+        'bytes_downloaded' pour chaque requête, et 'cpu_seconds' pour chaque page
+        récupérée par un thread du pool. Il peut être appelé depuis ces threads,
+        y compris après la sortie du bloc pour une page demandée à l'avance.
+
+        Args:
+            observer (Callable[[Dict[str, Any]], None]): Fonction recevant les compteurs à ajouter.
+        """
+        token = _request_observer.set(observer)
         try:
-            response = requests.get(endpoint, headers=self.headers, params=params)
+            yield
+        finally:
+            _request_observer.reset(token)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Délai avant la nouvelle tentative : `Retry-After` s'il est fourni, sinon backoff exponentiel avec jitter."""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, BACKOFF_BASE)
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def _request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Exécute une requête GET en passant par l'ordonnanceur et renvoie le corps décodé.
+
+        Chaque tentative attend un jeton du `RateLimiter`. Les limites de taux
+        (HTTP 429 ou message « rate limit exceeded »), les erreurs 5xx et les
+        erreurs réseau sont retentées jusqu'à `max_retries` fois. Si un cache est
+        configuré, une entrée fraîche est servie sans requête et une entrée
+        expirée est revalidée par une requête conditionnelle.
 
-            if response.status_code == 200:
-                data = response.json()
+        Args:
+            endpoint (str): URL de l'endpoint.
+            params (dict): Paramètres de requête.
+
+        Returns:
+            Dict[str, Any]: Corps JSON de la réponse HTTP 200.
 
-                # Vérifier si la réponse contient un message d'erreur
-                if 'message' in data:
-                    self.logger.error(f"Erreur dans la réponse : {data['message']}")
-                    if data['message'].lower() == "rate limit exceeded":
-                        self.logger.error("Limite de taux atteinte.")
-                    return []
+        Raises:
+            RateLimitError: Si la limite de taux persiste après toutes les tentatives.
+            LuccaAPIError: Pour toute autre erreur de l'API.
+        """
+        cache_key = cached = None
+        if self.cache is not None:
+            cache_key = self.cache.key(endpoint, params)
+            cached = self.cache.get(cache_key)
+            if cached is not None and self.cache.is_fresh(cached):
+                body = self.cache.load(cache_key)
+                if body is not None:
+                    return body
+                # Entrée évincée par un autre worker depuis `get` : la page est redemandée
+                cached = None
+
+        attempt = 0
+        while True:
+            waited = self.rate_limiter.acquire()
+            retry_after = None
+            rate_limited = False
+            try:
+                response = self.session.get(endpoint, params=params, headers=ResponseCache.conditional_headers(cached),
+                                            stream=self.stream_json)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                self._record(waited, retried=attempt > 0)
+                error = LuccaAPIError(f"Erreur réseau : {err}")
+            else:
+                if response.status_code == 304 and cached is not None:
+                    self._record(waited, retried=attempt > 0, downloaded=len(response.content or b''))
+                    self.rate_limiter.on_success(response.headers)
+                    body = self.cache.refresh(cache_key, cached, response.headers)
+                    if body is not None:
+                        return body
+                    # Corps évincé depuis `get` : la page est redemandée sans validateurs
+                    cached = None
+                    continue
 
+                if response.status_code == 200 and self.stream_json:
+                    data, content, downloaded = self._decode_stream(response)
+                else:
+                    data = response.json() if response.status_code == 200 else None
+                    content = response.content
+                    downloaded = len(content or b'')
+                rate_limited = response.status_code == 429 or _is_rate_limit_message(data)
+                self._record(waited, retried=attempt > 0, rate_limited=rate_limited, downloaded=downloaded)
 
-                users = data.get('data', {}).get('items', [])
-                return users
+                if data is not None and not rate_limited:
+                    self.rate_limiter.on_success(response.headers)
+                    if self.cache is not None and 'message' not in data:
+                        self.cache.put(cache_key, content, response.headers)
+                    return data
 
-            elif response.status_code == 429:
-                self.logger.error("Limite de taux atteinte (HTTP 429).")
-                return []
+                if response.status_code not in RETRYABLE_STATUSES and not rate_limited:
+                    raise LuccaAPIError(f"Statut HTTP {response.status_code}")
 
+                retry_after = parse_retry_after(_header(response.headers or {}, 'Retry-After'))
+                if rate_limited:
+                    self.logger.warning("Limite de taux atteinte, nouvelle tentative planifiée.")
+                    self.rate_limiter.on_throttle()
+                    error = RateLimitError("Limite de taux atteinte.")
+                else:
+                    error = LuccaAPIError(f"Statut HTTP {response.status_code}")
+
+            if attempt >= self.max_retries:
+                raise error
+            delay = self._backoff(attempt, retry_after)
+            if rate_limited:
+                # Le quota est commun au tenant : tous les workers patientent
+                self.rate_limiter.defer(delay)
             else:
-                response.raise_for_status()
+                self.rate_limiter.sleep(delay)
+            attempt += 1
+
+    def _decode_stream(self, response: requests.Response) -> Tuple[Dict[str, Any], Optional[bytes], int]:
+        """
+        Décode les éléments d'une réponse HTTP 200 au fil de la lecture de son flux.
+
+        Les éléments sont décodés un à un (voir `iter_json_items`) : ni le corps
+        complet, ni l'arbre JSON de l'enveloppe ne sont construits. Le corps brut
+        n'est conservé que si le cache de réponses est activé.
+
+        Args:
+            response (requests.Response): Réponse ouverte avec `stream=True`.
+
+        Returns:
+            Tuple[Dict[str, Any], Optional[bytes], int]: Corps réduit à `{'data': {'items': [...]}}`
+            (ou `{'message': ...}` pour une réponse d'erreur), corps brut (None sans cache)
+            et nombre d'octets lus.
+        """
+        received = []
+        downloaded = 0
+
+        def chunks():
+            nonlocal downloaded
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                downloaded += len(chunk)
+                if self.cache is not None:
+                    received.append(chunk)
+                yield chunk
+
+        try:
+            data = {'data': {'items': list(iter_json_items(chunks()))}}
+        except LuccaAPIError as err:
+            data = {'message': err.args[0]}
+        finally:
+            response.close()
+        return data, b''.join(received) if self.cache is not None else None, downloaded
+
+    def _fetch_page_in_pool(self, endpoint: str, params: Optional[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+        # Exécutée dans un thread du pool : son temps CPU est imputé à l'appelant qui a demandé la page
+        cpu_start = time.thread_time()
+        try:
+            return self._fetch_page(endpoint, params, offset)
+        finally:
+            _notify_observer({'cpu_seconds': time.thread_time() - cpu_start})
+
+    def iter_pages(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                   start_offset: int = 0) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Parcourt toutes les pages d'un endpoint, dans l'ordre des offsets.
+
+        Chaque page est demandée avec le même tri explicite (`orderBy`, par défaut
+        `DEFAULT_ORDER_BY` si les paramètres n'en précisent pas) : les offsets des
+        pages récupérées en parallèle se rapportent au même ordre.
+        La première page est récupérée seule : si elle n'est pas pleine, aucune
+        autre requête n'est émise. Sinon, les pages suivantes sont demandées par
+        un pool borné à `max_workers` requêtes en vol, et restituées dans l'ordre.
+        Le parcours s'arrête à la première page incomplète.
+
+        Args:
+            endpoint (str): URL de l'endpoint.
+            params (dict): Paramètres de requête communs à toutes les pages.
+            start_offset (int): Index du premier élément à récupérer, pour reprendre un parcours interrompu.
+
+        Yields:
+            List[Dict[str, Any]]: Éléments de chaque page.
+        """
+        first_page = self._fetch_page(endpoint, params, start_offset)
+        yield first_page
+        if len(first_page) < self.page_size:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            next_index = 1
+
+            def submit_next():
+                nonlocal next_index
+                offset = start_offset + next_index * self.page_size
+                # Chaque page s'exécute dans une copie du contexte de l'appelant (voir `observe_requests`)
+                pending.append(executor.submit(copy_context().run, self._fetch_page_in_pool, endpoint, params, offset))
+                next_index += 1
+
+            try:
+                for _ in range(self.max_workers):
+                    submit_next()
+
+                while pending:
+                    items = pending.popleft().result()
+                    yield items
+                    if len(items) < self.page_size:
+                        break
+                    submit_next()
+            finally:
+                # Les pages au-delà de la dernière page incomplète sont inutiles
+                for future in pending:
+                    future.cancel()
+
+    def _fetch_all(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Récupère tous les éléments d'un endpoint paginé.
 
+        Args:
+            endpoint (str): URL de l'endpoint.
+            params (dict): Paramètres de requête communs à toutes les pages.
+
+        Returns:
+            List[Dict[str, Any]]: Éléments de toutes les pages, dans l'ordre de l'API.
+        """
+        items = []
+        for page in self.iter_pages(endpoint, params):
+            items.extend(page)
+        return items
+
+    def iter_user_pages(self, params: Optional[Dict[str, Any]] = None,
+                        start_offset: int = 0) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Parcourt les utilisateurs page par page, pour un traitement en streaming.
+
+        Contrairement à `get_users`, les erreurs sont propagées à l'appelant.
+
+        Args:
+            params (dict): Paramètres de requête supplémentaires.
+            start_offset (int): Index du premier utilisateur à récupérer (reprise après un point de contrôle).
+
+        Yields:
+            List[Dict[str, Any]]: Utilisateurs de chaque page, dans l'ordre de l'API.
+        """
+        endpoint = f'{self.base_url}/api/v3/users'
+        return self.iter_pages(endpoint, {'formerEmployees': 'true', **(params or {})}, start_offset=start_offset)
+
+    def iter_department_pages(self, params: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Parcourt les départements page par page.
+
+        Contrairement à `get_departments`, les erreurs sont propagées à l'appelant.
+
+        Args:
+            params (dict): Paramètres de requête supplémentaires.
+
+        Yields:
+            List[Dict[str, Any]]: Départements de chaque page, dans l'ordre de l'API.
+        """
+        return self.iter_pages(f'{self.base_url}/api/v3/departments', params or {})
+
+    def get_users(self, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Récupère la liste des utilisateurs depuis l'API Lucca.
+
+        Args:
+            params (dict): Paramètres de requête supplémentaires.
+
+        Returns:
+            List[Dict[str, Any]]: Liste des utilisateurs.
+        """
+        endpoint = f'{self.base_url}/api/v3/users'
+        params = {'formerEmployees': 'true', **(params or {})}
+
+        try:
+            return self._fetch_all(endpoint, params)
         except Exception as err:
             self.logger.error(f'Erreur lors de la récupération des utilisateurs : {err}')
             return []
+        finally:
+            self.log_stats()
 
     def get_departments(self, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
@@ -75,31 +824,26 @@ class LuccaAPIClient:
         """
         endpoint = f'{self.base_url}/api/v3/departments'
         params = params or {}
-        
-        try:
-            response = requests.get(endpoint, headers=self.headers, params=params)
-
-            if response.status_code == 200:
-                data = response.json()
-
-                # Vérifier si la réponse contient un message d'erreur
-                if 'message' in data:
-                    self.logger.error(f"Erreur dans la réponse : {data['message']}")
-                    if data['message'].lower() == "rate limit exceeded":
-                        self.logger.error("Limite de taux atteinte.")
-                    return []
-
-                departments = data.get('data', {}).get('items', [])
-
-                return departments
-
-            elif response.status_code == 429:
-                self.logger.error("Limite de taux atteinte (HTTP 429).")
-                return []
-
-            else:
-                response.raise_for_status()
 
+        try:
+            return self._fetch_all(endpoint, params)
         except Exception as err:
             self.logger.error(f'Erreur lors de la récupération des départements : {err}')
             return []
+        finally:
+            self.log_stats()
+
+    def log_stats(self) -> None:
+        """Journalise les compteurs de requêtes et le temps d'attente dans la file."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        self.logger.info(
+            f"Requêtes : {stats['requests']}, nouvelles tentatives : {stats['retries']}, "
+            f"limites de taux : {stats['rate_limited']}, attente cumulée : {stats['queue_wait_seconds']:.2f}s "
+            f"(max {stats['max_queue_wait_seconds']:.2f}s), débit courant : {self.rate_limiter.rate:.2f} req/s"
+        )
+        if self.cache is not None:
+            self.logger.info(
+                f"Cache : {self.cache.hits} succès (dont {self.cache.revalidations} revalidations), "
+                f"{self.cache.misses} échecs."
+            )
@@ -0,0 +1,164 @@
+"""
+Point d'entrée en ligne de commande.
+
+Seule la bibliothèque standard est importée au chargement : pandas, SQLAlchemy
+et requests ne sont importés que par les sous-commandes qui en ont besoin, de
+sorte que `status` (contrôle de santé) démarre en quelques dizaines de
+millisecondes.
+
+Usage :
+    python src/cli.py sync [all|users|departments] [--full] [--stream]
+    python src/cli.py init-db
+    python src/cli.py status
+    python src/cli.py daemon|tenants|export|reconcile ...
+"""
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+import argparse
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+
+DEFAULT_DATABASE = 'reflect_db.sqlite'
+# Tables dont `status` donne le nombre de lignes
+STATUS_TABLES = ['users', 'contracts', 'departments']
+# Sous-commandes déléguées au `main` de leur module, avec leurs propres options
+DELEGATED_COMMANDS = {
+    'daemon': "Synchronisation planifiée (voir daemon.py).",
+    'tenants': "Synchronisation de plusieurs tenants (voir tenants.py).",
+    'export': "Export Parquet ou Arrow des tables (voir export.py).",
+    'reconcile': "Suppressions et écarts détectés par des sondes d'IDs (voir reconcile.py).",
+}
+
+
+def _configure_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+
+def read_status(database: str) -> Dict[str, Any]:
+    """
+    Lit l'état de la base avec le module `sqlite3`, en lecture seule et sans SQLAlchemy ni pandas.
+
+    Args:
+        database (str): Chemin de la base SQLite.
+
+    Returns:
+        Dict[str, Any]: Version du schéma, nombre de lignes des tables principales,
+        high-water marks de `sync_state`, points de contrôle des synchronisations interrompues
+        et taille de la file de réconciliation.
+
+    Raises:
+        FileNotFoundError: Si la base n'existe pas.
+    """
+    if not os.path.exists(database):
+        raise FileNotFoundError(f"Base de données introuvable : {database}")
+    conn = sqlite3.connect(f'file:{quote(os.path.abspath(database))}?mode=ro', uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        status = {
+            'database': database,
+            'schema_version': (
+                conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+                if 'schema_version' in tables else 0
+            ),
+            'tables': {
+                table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                for table in STATUS_TABLES if table in tables
+            },
+            'sync_state': {},
+        }
+        if 'sync_state' in tables:
+            for table_name, watermark, updated_at in conn.execute(
+                    "SELECT table_name, watermark, updated_at FROM sync_state ORDER BY table_name"):
+                status['sync_state'][table_name] = {'watermark': watermark, 'updated_at': updated_at}
+        if 'sync_checkpoints' in tables:
+            # Synchronisations interrompues, reprises au prochain passage
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sync_checkpoints)")}
+            last_id = 'last_id' if 'last_id' in columns else 'NULL'
+            status['checkpoints'] = {
+                endpoint: {'next_offset': next_offset, 'last_id': last_id, 'stage': stage, 'updated_at': updated_at}
+                for endpoint, next_offset, last_id, stage, updated_at in conn.execute(
+                    f"SELECT endpoint, next_offset, {last_id}, stage, updated_at FROM sync_checkpoints ORDER BY endpoint")
+            }
+        if 'reconcile_queue' in tables:
+            # IDs en attente de récupération complète après une réconciliation
+            status['reconcile_queue'] = dict(conn.execute(
+                "SELECT endpoint, COUNT(*) FROM reconcile_queue GROUP BY endpoint ORDER BY endpoint").fetchall())
+        return status
+    finally:
+        conn.close()
+
+
+def cmd_status(args) -> int:
+    try:
+        status = read_status(args.database)
+    except (FileNotFoundError, sqlite3.Error) as err:
+        print(json.dumps({'database': args.database, 'error': str(err)}))
+        return 1
+    print(json.dumps(status, indent=2))
+    # Sain si les utilisateurs ont déjà été synchronisés au moins une fois
+    return 0 if 'users' in status['sync_state'] else 1
+
+
+def cmd_init_db(args) -> int:
+    _configure_logging()
+    from db_manager import create_sqlite_engine, initialize_db
+
+    initialize_db(create_sqlite_engine(args.database))
+    return 0
+
+
+def cmd_sync(args) -> int:
+    # main.py configure la journalisation à son import
+    import main
+
+    branches = main.SYNC_BRANCHES if args.branch == 'all' else (args.branch,)
+    main.main(database=args.database, branches=branches,
+              full_sync=True if args.full else None, stream=True if args.stream else None)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cli.py', description="Synchronisation des données Lucca.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sync = commands.add_parser('sync', help="Synchronise les utilisateurs et/ou les départements.")
+    sync.add_argument('branch', nargs='?', choices=['all', 'users', 'departments'], default='all')
+    sync.add_argument('--full', action='store_true', help="Ignorer le high-water mark (comme SYNC_FULL=1).")
+    sync.add_argument('--stream', action='store_true', help="Traiter les utilisateurs page par page (comme SYNC_STREAM=1).")
+    sync.add_argument('--database', default=DEFAULT_DATABASE)
+    sync.set_defaults(handler=cmd_sync)
+
+    init_db = commands.add_parser('init-db', help="Crée la base ou met à niveau son schéma.")
+    init_db.add_argument('--database', default=DEFAULT_DATABASE)
+    init_db.set_defaults(handler=cmd_init_db)
+
+    status = commands.add_parser('status', help="Affiche l'état de la base (code de sortie 1 si jamais synchronisée).")
+    status.add_argument('--database', default=DEFAULT_DATABASE)
+    status.set_defaults(handler=cmd_status)
+
+    for name, description in DELEGATED_COMMANDS.items():
+        # Options transmises telles quelles au module, y compris --help
+        commands.add_parser(name, help=description, add_help=False)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+
+    if args.command in DELEGATED_COMMANDS:
+        importlib.import_module(args.command).main(extra)
+        return 0
+    if extra:
+        parser.error(f"arguments non reconnus : {' '.join(extra)}")
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
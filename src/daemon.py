@@ -0,0 +1,231 @@
+from api_client import LuccaAPIClient
+from db_manager import initialize_db, create_sqlite_engine
+from main import run_sync
+from metrics import RunMetrics
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+import argparse
+import json
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+
+# Intervalle par défaut entre deux synchronisations, en secondes
+DEFAULT_INTERVAL = 3600
+# Variation aléatoire de l'intervalle (fraction), pour étaler les tenants et les instances
+DEFAULT_JITTER = 0.1
+
+
+class SyncDaemon:
+    """
+    Synchronisation planifiée dans un processus de longue durée.
+
+    Le client HTTP (et son pool de connexions), l'engine SQLite et les
+    empreintes des lignes déjà écrites restent en mémoire d'une synchronisation
+    à l'autre : un passage sans changement ne recharge ni les imports, ni les
+    connexions, ni les clés existantes. Le daemon doit être le seul à écrire
+    dans la base, sans quoi ses empreintes en mémoire ne seraient plus fiables.
+    """
+
+    def __init__(self, client=None, engine=None, interval: float = DEFAULT_INTERVAL, jitter: float = DEFAULT_JITTER,
+                 database: str = 'reflect_db.sqlite', profile_dir: Optional[str] = None):
+        """
+        Args:
+            client (LuccaAPIClient, optional): Le client de l'API Lucca. Par défaut, configuré par l'environnement.
+            engine (sqlalchemy.Engine, optional): L'engine de la base. Par défaut, ouvert sur `database`.
+            interval (float): Intervalle entre deux synchronisations, en secondes.
+            jitter (float): Variation aléatoire de l'intervalle, en fraction de celui-ci (0.1 pour ±10 %).
+            database (str): Chemin de la base SQLite.
+            profile_dir (str, optional): Répertoire des profils cProfile (voir `RunMetrics`).
+        """
+        if interval <= 0:
+            raise ValueError("L'intervalle de synchronisation doit être positif.")
+        if not 0 <= jitter < 1:
+            raise ValueError("La variation de l'intervalle doit être comprise entre 0 et 1.")
+        self.interval = interval
+        self.jitter = jitter
+        self.profile_dir = profile_dir
+        self.engine = engine or create_sqlite_engine(database)
+        initialize_db(self.engine)
+        self.client = client or LuccaAPIClient()
+        self.hash_caches: Dict[str, Dict[tuple, str]] = {}
+
+        self.runs = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.next_run_at: Optional[datetime] = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._control_server = None
+
+    def next_delay(self) -> float:
+        """Renvoie le délai avant la prochaine synchronisation, intervalle et variation aléatoire compris."""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Exécute une synchronisation avec l'état conservé en mémoire.
+
+        Returns:
+            Dict[str, Any]: Rapport de la synchronisation : statut ('ok' ou 'failed'), mesures et résultats.
+        """
+        metrics = RunMetrics(profile_dir=self.profile_dir)
+        try:
+            status = 'ok' if run_sync(self.client, self.engine, metrics, hash_caches=self.hash_caches) else 'failed'
+            error = None
+        except Exception as err:
+            # Une synchronisation en erreur n'arrête pas le daemon ; les empreintes sont rechargées au passage suivant
+            logging.error(f"Erreur lors de la synchronisation : {err}")
+            self.hash_caches.clear()
+            status, error = 'failed', str(err)
+
+        report = {**metrics.report(), 'status': status, 'error': error,
+                  'finished_at': datetime.now(timezone.utc).isoformat()}
+        with self._lock:
+            self.runs += 1
+            self.last_run = report
+        return report
+
+    def trigger(self) -> None:
+        """Demande une synchronisation immédiate."""
+        logging.info("Synchronisation immédiate demandée.")
+        self._wake.set()
+
+    def stop(self) -> None:
+        """Arrête le daemon après la synchronisation en cours."""
+        self._stopping.set()
+        self._wake.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Renvoie l'état du daemon et le rapport de la dernière synchronisation."""
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'interval': self.interval,
+                'jitter': self.jitter,
+                'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+                'cached_hashes': {table: len(cache) for table, cache in self.hash_caches.items()},
+                'last_run': self.last_run,
+            }
+
+    def serve_forever(self, run_immediately: bool = True) -> None:
+        """
+        Synchronise à intervalle régulier jusqu'à l'appel de `stop`.
+
+        Args:
+            run_immediately (bool): Synchroniser dès le démarrage plutôt qu'après un premier intervalle.
+        """
+        if run_immediately:
+            self._wake.set()
+        while not self._stopping.is_set():
+            delay = self.next_delay()
+            with self._lock:
+                self.next_run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            start = time.perf_counter()
+            report = self.run_once()
+            logging.info(f"Synchronisation n°{self.runs} terminée en {time.perf_counter() - start:.2f}s "
+                         f"(statut : {report['status']}).")
+        logging.info("Daemon arrêté.")
+
+    def start_control_server(self, port: int, host: str = '127.0.0.1') -> int:
+        """
+        Démarre le point de contrôle HTTP local : `GET /status` renvoie l'état du daemon
+        et `POST /sync` déclenche une synchronisation immédiate.
+
+        Args:
+            port (int): Port d'écoute, 0 pour un port libre.
+            host (str): Adresse d'écoute (locale par défaut).
+
+        Returns:
+            int: Port d'écoute effectif.
+        """
+        self._control_server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._control_server.daemon_threads = True
+        threading.Thread(target=self._control_server.serve_forever, daemon=True).start()
+        port = self._control_server.server_address[1]
+        logging.info(f"Point de contrôle à l'écoute sur http://{host}:{port}")
+        return port
+
+    def stop_control_server(self) -> None:
+        if self._control_server is not None:
+            self._control_server.shutdown()
+            self._control_server.server_close()
+            self._control_server = None
+
+    def install_signal_handlers(self) -> None:
+        """SIGUSR1 déclenche une synchronisation immédiate, SIGTERM et SIGINT arrêtent le daemon."""
+        if hasattr(signal, 'SIGUSR1'):  # Absent sous Windows
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.trigger())
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self.stop())
+
+    def _handler_class(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body):
+                payload = json.dumps(body, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == '/status':
+                    self._send(200, daemon.status())
+                else:
+                    self._send(404, {'message': 'Not found'})
+
+            def do_POST(self):
+                if self.path == '/sync':
+                    daemon.trigger()
+                    self._send(202, {'triggered': True})
+                else:
+                    self._send(404, {'message': 'Not found'})
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronise les données Lucca à intervalle régulier.")
+    parser.add_argument('--interval', type=float, default=float(os.getenv('SYNC_INTERVAL', DEFAULT_INTERVAL)),
+                        help="Intervalle entre deux synchronisations, en secondes.")
+    parser.add_argument('--jitter', type=float, default=float(os.getenv('SYNC_JITTER', DEFAULT_JITTER)),
+                        help="Variation aléatoire de l'intervalle, en fraction de celui-ci.")
+    parser.add_argument('--control-port', type=int,
+                        default=int(os.environ['SYNC_CONTROL_PORT']) if os.getenv('SYNC_CONTROL_PORT') else None,
+                        help="Port local du point de contrôle HTTP (GET /status, POST /sync).")
+    parser.add_argument('--database', default='reflect_db.sqlite', help="Base SQLite à synchroniser.")
+    args = parser.parse_args(argv)
+
+    try:
+        daemon = SyncDaemon(interval=args.interval, jitter=args.jitter, database=args.database,
+                            profile_dir=os.getenv('SYNC_PROFILE_DIR'))
+    except ValueError as err:
+        logging.error(err)
+        sys.exit(1)
+
+    daemon.install_signal_handlers()
+    if args.control_port is not None:
+        daemon.start_control_server(args.control_port)
+    try:
+        daemon.serve_forever()
+    finally:
+        daemon.stop_control_server()
+
+
+if __name__ == '__main__':
+    main()
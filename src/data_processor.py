@@ -1,6 +1,18 @@
 import pandas as pd
 import json
-from typing import List, Dict, Any
+import multiprocessing
+import multiprocessing.context
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # Optional dependency: pip install orjson
+    orjson = None
+
+# JSON decoder for serialized role/user/reference columns; orjson is several times faster when installed.
+# Both raise a json.JSONDecodeError subclass on malformed input.
+json_loads = orjson.loads if orjson is not None else json.loads
 
 def process_users(users: List[Dict[str, Any]]) -> pd.DataFrame:
     """
@@ -19,17 +31,20 @@ def process_users(users: List[Dict[str, Any]]) -> pd.DataFrame:
 
 def extract_role_ids(role_field: Any) -> List[int]:
     """
-    Extracts a list of role IDs from a JSON-formatted string or a list of role dicts.
+    Extracts a list of role names from a JSON-formatted string or a list of role dicts.
+
+    Despite its name, this returns the role names stored in the 'habilitedRoles'
+    column; `process_user_roles` extracts the role IDs.
 
     Args:
         role_field (str or list): JSON-formatted string or list of role dictionaries.
 
     Returns:
-        List[int]: List of role IDs.
+        List[str]: List of role names.
     """
     try:
         if isinstance(role_field, str):
-            roles = json.loads(role_field)
+            roles = json_loads(role_field)
         elif isinstance(role_field, list):
             roles = role_field
         elif role_field is None:
@@ -39,10 +54,96 @@ def extract_role_ids(role_field: Any) -> List[int]:
     except (json.JSONDecodeError, TypeError) as e:
         return []
 
+# Nested user fields flattened to their 'name' attribute by transform_user_data
+NESTED_NAME_COLUMNS = ['department', 'legalEntity', 'rolePrincipal', 'manager']
+# Low-cardinality user columns dictionary-encoded by transform_user_data
+CATEGORICAL_USER_COLUMNS = NESTED_NAME_COLUMNS + ['habilitedRoles']
+# Columns added to the raw user columns by transform_user_data, in order
+DERIVED_USER_COLUMNS = ['managerId', 'theoreticalRemuneration']
+# Largest share of distinct values for which a column is worth dictionary-encoding
+MAX_CATEGORICAL_RATIO = 0.5
+# Smallest batch split across a process pool. Experimental: no multi-core measurement backs this
+# threshold yet, and on a single core the transfers cost more than the serial transformation
+PARALLEL_MIN_ROWS = 20_000
+# Start method of the transformation workers (see `_pool_context`)
+PARALLEL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def _extract_nested(values: List[Any], key: str = 'name', default: Any = 'Unknown') -> List[Any]:
+    """
+    Extracts `key` from each dict of a column, falling back to `default` for non-dict values.
+
+    Args:
+        values (List[Any]): Raw column values.
+        key (str): Key to extract.
+        default (Any): Value used when the key or the dict is missing.
+
+    Returns:
+        List[Any]: Extracted values, in the same order.
+    """
+    return [value.get(key, default) if isinstance(value, dict) else default for value in values]
+
+def _serialize_role_names(values: List[Any]) -> List[str]:
+    """
+    Serializes the role names of each value as a JSON string, like
+    `json.dumps(extract_role_ids(value))`.
+
+    Role combinations repeat across users, so each distinct combination is
+    encoded only once.
+
+    Args:
+        values (List[Any]): Raw 'habilitedRoles' values.
+
+    Returns:
+        List[str]: JSON-serialized role names, in the same order.
+    """
+    encoded_by_names = {}
+    serialized = []
+    for roles in values:
+        if isinstance(roles, list):
+            names = tuple(role['name'] for role in roles if isinstance(role, dict) and 'name' in role)
+        else:
+            names = tuple(extract_role_ids(roles))
+        encoded = encoded_by_names.get(names)
+        if encoded is None:
+            encoded = encoded_by_names[names] = json.dumps(list(names))
+        serialized.append(encoded)
+    return serialized
+
+def compact_columns(df: pd.DataFrame, columns: List[str], max_ratio: float = MAX_CATEGORICAL_RATIO) -> pd.DataFrame:
+    """
+    Dictionary-encodes low-cardinality columns as pandas categoricals.
+
+    Each distinct value is stored once and every row keeps a small integer code
+    instead of a reference to its own string. Columns whose share of distinct
+    values exceeds `max_ratio` are left unchanged, since their dictionary would
+    cost as much as the values. Values read back (`tolist`, `astype(object)`)
+    are unchanged.
+
+    Args:
+        df (pd.DataFrame): DataFrame to compact in place.
+        columns (List[str]): Candidate columns; missing ones are ignored.
+        max_ratio (float): Largest distinct values / rows ratio to encode.
+
+    Returns:
+        pd.DataFrame: The same DataFrame.
+    """
+    for column in columns:
+        if column not in df.columns or isinstance(df[column].dtype, pd.CategoricalDtype) or df.empty:
+            continue
+        encoded = pd.Categorical(df[column])
+        if len(encoded.categories) <= max_ratio * len(df):
+            df[column] = encoded
+    return df
+
 def transform_user_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Transforms user data by extracting department names, legal entities, principal roles,
-    theoretical remunerations, and habilited role IDs.
+    theoretical remunerations, and habilited role IDs. The manager's ID is kept in
+    'managerId' next to the flattened manager name.
+
+    Each nested column is flattened column-wise from its raw values in a single
+    comprehension, instead of a row-wise `apply` per field. The flattened
+    low-cardinality columns are then dictionary-encoded (see `compact_columns`).
 
     Args:
         df (pd.DataFrame): DataFrame containing user data.
@@ -50,36 +151,26 @@ def transform_user_data(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Transformed DataFrame.
     """
-    # Extract department name
-    df['department'] = df['department'].apply(
-        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
-    )
-    
-    # Extract legal entity name
-    df['legalEntity'] = df['legalEntity'].apply(
-        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
-    )
-    
-    # Extract principal role name
-    df['rolePrincipal'] = df['rolePrincipal'].apply(
-        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
-    )
+    return compact_columns(_flatten_user_data(df), CATEGORICAL_USER_COLUMNS)
+
+def _flatten_user_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Flattens the nested user columns in place, without dictionary-encoding (see `transform_user_data`)."""
+    # Keep the manager's ID before flattening to a name, so reporting lines can be walked by ID
+    df['managerId'] = pd.array(_extract_nested(df['manager'].tolist(), key='id', default=None), dtype='Int64')
+
+    # Extract department, legal entity, principal role and manager names
+    for column in NESTED_NAME_COLUMNS:
+        df[column] = _extract_nested(df[column].tolist())
 
-    # Extract principal role name
-    df['manager'] = df['manager'].apply(
-        lambda x: x.get('name', 'Unknown') if isinstance(x, dict) else 'Unknown'
-    )
-    
     # Extract theoretical remuneration
-    df['theoreticalRemuneration'] = df['applicationData'].apply(
-        lambda x: x.get('theoreticalRemuneration', {}).get('value', 'Unknown') 
-        if isinstance(x, dict) else 'Unknown'
-    )
-    
+    df['theoreticalRemuneration'] = [
+        value.get('theoreticalRemuneration', {}).get('value', 'Unknown') if isinstance(value, dict) else 'Unknown'
+        for value in df['applicationData'].tolist()
+    ]
+
     # Extract habilited role IDs and serialize as JSON strings
-    df['habilitedRoles'] = df['habilitedRoles'].apply(extract_role_ids)
-    df['habilitedRoles'] = df['habilitedRoles'].apply(json.dumps)
-    
+    df['habilitedRoles'] = _serialize_role_names(df['habilitedRoles'].tolist())
+
     # Drop unnecessary columns
     df.drop(columns=['applicationData'], errors='ignore', inplace=True)
     return df
@@ -94,32 +185,132 @@ def process_contracts_from_users(users: List[Dict[str, Any]]) -> pd.DataFrame:
     Returns:
         pd.DataFrame: DataFrame contenant les données des contrats.
     """
-    contracts = []
-    for user in users:
-        contract = {
-            "user_id": user.get("id"),
-            "start_date": user.get("dtContractStart"),
-            "end_date": user.get("dtContractEnd"),
-            "theoretical_remuneration": user.get("applicationData", {}).get("theoreticalRemuneration", {}).get("value", "Unknown")
-        }
-        contracts.append(contract)
-    contracts_df = pd.DataFrame(contracts)
+    if not users:
+        return pd.DataFrame()
+    # Built column by column: no intermediate dict per contract
+    contracts_df = pd.DataFrame({
+        "user_id": [user.get("id") for user in users],
+        "start_date": [user.get("dtContractStart") for user in users],
+        "end_date": [user.get("dtContractEnd") for user in users],
+        "theoretical_remuneration": [
+            user.get("applicationData", {}).get("theoreticalRemuneration", {}).get("value", "Unknown")
+            for user in users
+        ],
+    })
     return contracts_df
 
 
+def _pool_context() -> multiprocessing.context.BaseContext:
+    """
+    Returns the multiprocessing context of the transformation workers.
+
+    Workers are never forked from the calling process: transformations run in
+    the `sync_all` writer thread while fetch and HTTP pool threads are alive,
+    and a forked child could inherit their locks in a held state. They are
+    forked from a single-threaded fork server instead, which imports this
+    module (and pandas) once, or started with `spawn` where no fork server exists.
+    """
+    if PARALLEL_START_METHOD == 'forkserver':
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates chunk frames into the frame a single pass over all the records would build.
+
+    A column whose dtype differs between chunks (for example all-null in one chunk,
+    strings in another) is re-inferred from its merged values.
+
+    Args:
+        frames (List[pd.DataFrame]): Frames built from consecutive chunks, in order.
+
+    Returns:
+        pd.DataFrame: Merged frame, with a fresh RangeIndex.
+    """
+    merged = pd.concat(frames, ignore_index=True)
+    for column in merged.columns:
+        dtypes = {str(frame[column].dtype) if column in frame.columns else None for frame in frames}
+        if len(dtypes) > 1:
+            merged[column] = pd.Series(merged[column].tolist(), index=merged.index)
+    return merged
+
+
+def _map_chunks(func: Callable[[Sequence[Any]], Any], records: Sequence[Any], workers: int) -> List[Any]:
+    """
+    Applies `func` to consecutive chunks of records across a process pool, one chunk per worker.
+
+    Each chunk is pickled to its worker (see `_pool_context`), and each result
+    is pickled back. Most user columns are of object dtype, so both transfers
+    cost one Python object per cell.
+
+    Args:
+        func (Callable): Module-level function applied to each chunk.
+        records (Sequence[Any]): Records to split.
+        workers (int): Number of worker processes.
+
+    Returns:
+        List[Any]: Results of each chunk, in record order.
+    """
+    size = -(-len(records) // workers)
+    chunks = [records[start:start + size] for start in range(0, len(records), size)]
+    with ProcessPoolExecutor(max_workers=len(chunks), mp_context=_pool_context()) as pool:
+        return list(pool.map(func, chunks))
+
+
+def _transform_user_chunk(users: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # Runs in a worker: user and contract frames of one chunk, before dictionary-encoding
+    return _flatten_user_data(process_users(users)), process_contracts_from_users(users)
+
+
+def transform_users(users: List[Dict[str, Any]], workers: int = 1,
+                    min_rows: int = PARALLEL_MIN_ROWS) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Builds the transformed user frame and the contract frame from raw users.
+
+    Equivalent to `transform_user_data(process_users(users))` and
+    `process_contracts_from_users(users)`. Batches of at least `min_rows` users
+    are split into chunks transformed in parallel by `workers` processes, and the
+    chunk frames are merged back (see `_concat_frames`) before dictionary-encoding,
+    so both paths produce the same frames. Smaller batches stay on the serial path.
+    The parallel path is experimental (see `_map_chunks` for its transfer costs).
+
+    Args:
+        users (List[Dict[str, Any]]): List of users, as returned by the API.
+        workers (int): Number of worker processes; 1 keeps the serial path.
+        min_rows (int): Smallest batch transformed in parallel.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Transformed users and contracts.
+    """
+    if workers <= 1 or len(users) < max(min_rows, 2):
+        return transform_user_data(process_users(users)), process_contracts_from_users(users)
+    results = _map_chunks(_transform_user_chunk, users, workers)
+    users_df = _concat_frames([users_df for users_df, _ in results])
+    # Columns added by `_flatten_user_data` follow the raw ones, even those only present in a later chunk
+    derived = [column for column in DERIVED_USER_COLUMNS if column in users_df.columns]
+    users_df = users_df[[column for column in users_df.columns if column not in derived] + derived]
+    return compact_columns(users_df, CATEGORICAL_USER_COLUMNS), _concat_frames([contracts_df for _, contracts_df in results])
+
+
 def extract_user_ids(user_field: Any) -> List[str]:
     """
-    Extracts a list of user IDs from a JSON-formatted string or a list of user dicts.
+    Extracts a list of user names from a JSON-formatted string or a list of user dicts.
+
+    Despite its name, this returns the user names stored in the 'users' and
+    'currentUsers' columns; `process_department_members` extracts the user IDs.
 
     Args:
         user_field (str or list): JSON-formatted string or list of user dictionaries.
 
     Returns:
-        List[int]: List of user IDs.
+        List[str]: List of user names.
     """
     try:
         if isinstance(user_field, str):
-            users = json.loads(user_field)
+            users = json_loads(user_field)
         elif isinstance(user_field, list):
             users = user_field
         elif user_field is None:
@@ -128,18 +319,26 @@ def extract_user_ids(user_field: Any) -> List[str]:
     except (json.JSONDecodeError, TypeError) as e:
         return []
 
-def process_departments(departments: List[Dict[str, Any]]) -> pd.DataFrame:
+def process_departments(departments: List[Dict[str, Any]], workers: int = 1,
+                        min_rows: int = PARALLEL_MIN_ROWS) -> pd.DataFrame:
     """
     Converts a list of department dictionaries into a pandas DataFrame and extracts user IDs.
 
+    Lists of at least `min_rows` departments are processed in chunks by `workers`
+    processes, as in `transform_users`.
+
     Args:
         departments (List[Dict[str, Any]]): List of department data.
+        workers (int): Number of worker processes; 1 keeps the serial path.
+        min_rows (int): Smallest list processed in parallel.
 
     Returns:
         pd.DataFrame: Processed DataFrame with user IDs extracted and serialized.
     """
     if not departments:
         return pd.DataFrame()
+    if workers > 1 and len(departments) >= max(min_rows, 2):
+        return _concat_frames(_map_chunks(process_departments, departments, workers))
     
     departments_df = pd.DataFrame(departments)
     
@@ -165,3 +364,129 @@ def clean_user_data(df: pd.DataFrame) -> pd.DataFrame:
     columns_to_drop = ['dtContractStart', 'dtContractEnd', 'theoreticalRemuneration']
     df_cleaned = df.drop(columns=columns_to_drop, errors='ignore')
     return df_cleaned
+
+
+def compute_watermark(df: pd.DataFrame, column: str = 'modifiedOn') -> Optional[str]:
+    """
+    Computes the high-water mark of a batch: the latest timestamp of `column`, in UTC ISO 8601.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the synchronized records.
+        column (str): Name of the modification timestamp column.
+
+    Returns:
+        Optional[str]: Latest timestamp, or None if the column is missing or empty.
+    """
+    if df.empty or column not in df.columns:
+        return None
+    latest = pd.to_datetime(df[column], utc=True, errors='coerce').max()
+    if pd.isna(latest):
+        return None
+    return latest.isoformat()
+
+
+def _refs(field: Any) -> List[Dict[str, Any]]:
+    """
+    Returns the referenced objects carrying an 'id' from a JSON-formatted string or a list of dicts.
+
+    Args:
+        field (str or list): JSON-formatted string or list of dictionaries.
+
+    Returns:
+        List[Dict[str, Any]]: Dictionaries having an 'id' key.
+    """
+    if isinstance(field, str):
+        try:
+            field = json_loads(field)
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(field, list):
+        return []
+    return [ref for ref in field if isinstance(ref, dict) and ref.get('id') is not None]
+
+
+def process_user_roles(users: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Builds the user/role junction rows and the role reference rows, keyed by ID.
+
+    Args:
+        users (List[Dict[str, Any]]): List of users, with their 'habilitedRoles'.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Links ('user_id', 'role_id') and roles ('id', 'name').
+    """
+    links = []
+    roles = {}
+    for user in users:
+        for role in _refs(user.get('habilitedRoles')):
+            links.append((user.get('id'), role['id']))
+            roles[role['id']] = role.get('name')
+    links_df = pd.DataFrame(links, columns=['user_id', 'role_id']).drop_duplicates()
+    roles_df = pd.DataFrame(list(roles.items()), columns=['id', 'name'])
+    return links_df, roles_df
+
+
+def process_department_members(departments: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Builds the department/user junction rows, keyed by ID.
+
+    Members are the union of 'users' and 'currentUsers'; 'is_current' flags the latter.
+
+    Args:
+        departments (List[Dict[str, Any]]): List of department data.
+
+    Returns:
+        pd.DataFrame: Links ('department_id', 'user_id', 'is_current').
+    """
+    members = {}
+    for department in departments:
+        department_id = department.get('id')
+        for user in _refs(department.get('users')):
+            members.setdefault((department_id, user['id']), 0)
+        for user in _refs(department.get('currentUsers')):
+            members[(department_id, user['id'])] = 1
+    return pd.DataFrame(
+        [(department_id, user_id, is_current) for (department_id, user_id), is_current in members.items()],
+        columns=['department_id', 'user_id', 'is_current'],
+    )
+
+
+def compute_department_closure(departments: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Computes the transitive closure of the department tree from each department's 'parentId'.
+
+    Every department is its own ancestor at depth 0, its parent at depth 1, and so
+    on up to the root. Each ancestor chain is computed once and reused by the
+    descendants. A parent missing from the list ends the chain, and a cycle is
+    cut where it loops back.
+
+    Args:
+        departments (List[Dict[str, Any]]): List of department data, with 'id' and 'parentId'.
+
+    Returns:
+        pd.DataFrame: Closure rows ('ancestor_id', 'descendant_id', 'depth').
+    """
+    parents = {department['id']: department.get('parentId') for department in departments
+               if department.get('id') is not None}
+    chains = {}
+
+    def chain(department_id):
+        # Ancestors of `department_id`, itself first, root last
+        path = []
+        current = department_id
+        while current in parents and current not in chains and current not in path:
+            path.append(current)
+            current = parents[current]
+        tail = chains.get(current, [])
+        for index in range(len(path) - 1, -1, -1):
+            tail = [path[index]] + tail
+            chains[path[index]] = tail
+        return chains[department_id]
+
+    rows = [
+        (ancestor_id, department_id, depth)
+        for department_id in parents
+        for depth, ancestor_id in enumerate(chain(department_id))
+    ]
+    return pd.DataFrame(rows, columns=['ancestor_id', 'descendant_id', 'depth'])
+
@@ -1,38 +1,577 @@
 import pandas as pd
-from sqlalchemy import inspect
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.pool import QueuePool
+from urllib.parse import quote
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+import hashlib
+import json
 import logging
+import os
+import sqlite3
+
+# Nombre de lignes envoyées par instruction executemany lors des upserts
+DEFAULT_BATCH_SIZE = 500
+
+# Colonne contenant l'empreinte du contenu de chaque ligne (tables suivies)
+ROW_HASH_COLUMN = 'row_hash'
+# Colonne horodatant la dernière écriture de chaque ligne (tables suivies)
+SYNCED_AT_COLUMN = 'synced_at'
+# Colonne datant la disparition d'une ligne de l'API (tombstone), nulle pour une ligne active
+DELETED_AT_COLUMN = 'deletedAt'
+# Tables dont les lignes supprimées en amont sont marquées plutôt qu'effacées
+TOMBSTONED_TABLES = ['users', 'departments']
+
+# PRAGMAs appliqués à chaque connexion SQLite. En mode WAL, les lecteurs ne sont
+# pas bloqués par l'écriture en cours ; synchronous=NORMAL ne synchronise le disque
+# qu'aux checkpoints ; cache de 64 Mio et lectures par mmap jusqu'à 256 Mio.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+# Sous-ensemble applicable à une connexion en lecture seule
+SQLITE_READ_ONLY_PRAGMAS = {
+    'cache_size': SQLITE_PRAGMAS['cache_size'],
+    'mmap_size': SQLITE_PRAGMAS['mmap_size'],
+    'busy_timeout': SQLITE_PRAGMAS['busy_timeout'],
+    'query_only': 'ON',
+}
+
+# Schéma déclaré : colonnes typées et clés primaires. `{name}` permet de créer
+# une copie de la table lors de la reconstruction d'une table existante.
+TABLE_DEFINITIONS = {
+    'users': """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            url TEXT,
+            displayName TEXT,
+            modifiedOn TEXT,
+            lastName TEXT,
+            firstName TEXT,
+            login TEXT,
+            mail TEXT,
+            birthDate TEXT,
+            department TEXT,
+            manager TEXT,
+            rolePrincipal TEXT,
+            habilitedRoles TEXT,
+            legalEntity TEXT,
+            theoreticalRemuneration REAL,
+            employeeNumber TEXT
+        )""",
+    'contracts': """
+        CREATE TABLE {name} (
+            user_id INTEGER PRIMARY KEY,
+            start_date TEXT,
+            end_date TEXT,
+            theoretical_remuneration REAL
+        )""",
+    'departments': """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            code TEXT,
+            hierarchy TEXT,
+            parentId INTEGER,
+            isActive INTEGER,
+            position INTEGER,
+            level INTEGER,
+            sortOrder INTEGER,
+            headID INTEGER,
+            users TEXT,
+            currentUsers TEXT,
+            currentUsersCount INTEGER
+        )""",
+    'sync_state': """
+        CREATE TABLE {name} (
+            table_name TEXT PRIMARY KEY,
+            watermark TEXT,
+            updated_at TEXT NOT NULL
+        )""",
+}
+
+def create_sqlite_engine(db_path: str, read_only: bool = False, pragmas: Optional[Dict[str, Any]] = None):
+    """
+    Crée un engine SQLAlchemy sur une base SQLite, en appliquant les PRAGMAs à chaque connexion.
+
+    En lecture seule, la base est ouverte avec `mode=ro` : un tableau de bord peut
+    l'interroger pendant une synchronisation, sans bloquer l'écrivain ni être bloqué
+    par lui (mode WAL).
+
+    Args:
+        db_path (str): Chemin du fichier de la base de données.
+        read_only (bool): Ouvrir la base en lecture seule.
+        pragmas (dict, optional): PRAGMAs à appliquer, par défaut `SQLITE_PRAGMAS`
+            ou `SQLITE_READ_ONLY_PRAGMAS`.
+
+    Returns:
+        sqlalchemy.Engine: L'engine configuré.
+    """
+    db_path = os.path.abspath(db_path)
+    # Le chemin n'est pas placé dans l'URL SQLAlchemy, qui interpréterait `?`, `#` ou `%` :
+    # les connexions sont ouvertes directement, avec une URI encodée en lecture seule
+    if read_only:
+        uri = f'file:{quote(db_path)}?mode=ro'
+        connect = lambda: sqlite3.connect(uri, uri=True, check_same_thread=False)
+        pragmas = SQLITE_READ_ONLY_PRAGMAS if pragmas is None else pragmas
+    else:
+        connect = lambda: sqlite3.connect(db_path, check_same_thread=False)
+        pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    engine = create_engine('sqlite://', creator=connect, poolclass=QueuePool)
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    return engine
+
+def _rebuild_table(conn, table: str) -> None:
+    """
+    Crée une table selon sa définition déclarée, ou reconstruit une table existante
+    (créée sans clé ni type) en conservant ses données.
+
+    En cas de doublons sur la clé primaire, la dernière ligne insérée est conservée.
+    """
+    if not inspect(conn).has_table(table):
+        conn.execute(text(TABLE_DEFINITIONS[table].format(name=_quote(table))))
+        logging.info(f"Création de la table '{table}'.")
+        return
+
+    tmp_table = f'{table}__migration'
+    conn.execute(text(f"DROP TABLE IF EXISTS {_quote(tmp_table)}"))
+    conn.execute(text(TABLE_DEFINITIONS[table].format(name=_quote(tmp_table))))
+    old_columns = {column['name'] for column in inspect(conn).get_columns(table)}
+    columns = ', '.join(
+        _quote(column['name']) for column in inspect(conn).get_columns(tmp_table) if column['name'] in old_columns
+    )
+    conn.execute(text(
+        f"INSERT OR REPLACE INTO {_quote(tmp_table)} ({columns}) "
+        f"SELECT {columns} FROM {_quote(table)} ORDER BY rowid"
+    ))
+    conn.execute(text(f"DROP TABLE {_quote(table)}"))
+    conn.execute(text(f"ALTER TABLE {_quote(tmp_table)} RENAME TO {_quote(table)}"))
+    logging.info(f"Table '{table}' reconstruite avec son schéma typé.")
+
+def _migration_typed_tables(conn) -> None:
+    for table in TABLE_DEFINITIONS:
+        _rebuild_table(conn, table)
+
+def compute_row_hash(record: Dict[str, Any]) -> str:
+    """
+    Calcule l'empreinte stable du contenu d'une ligne.
+
+    L'empreinte ne dépend ni de l'ordre des colonnes ni des colonnes nulles, et
+    les valeurs sont normalisées comme SQLite les restitue (booléens en entiers,
+    flottants entiers en entiers) : une ligne relue depuis la base a la même
+    empreinte que la ligne reçue de l'API.
+
+    Args:
+        record (Dict[str, Any]): La ligne, colonne par colonne. Les colonnes `row_hash`
+            et `synced_at` sont ignorées.
+
+    Returns:
+        str: Empreinte hexadécimale (BLAKE2b, 128 bits).
+    """
+    content = []
+    for column in sorted(record):
+        value = record[column]
+        if value is None or column in (ROW_HASH_COLUMN, SYNCED_AT_COLUMN):
+            continue
+        if isinstance(value, bool):
+            value = int(value)
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        content.append((column, value))
+    payload = json.dumps(content, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+HASHED_TABLES = ['users', 'contracts', 'departments']
+
+def _migration_row_hashes(conn) -> None:
+    # Ajoute la colonne d'empreinte et la calcule pour les lignes existantes
+    for table in HASHED_TABLES:
+        if ROW_HASH_COLUMN not in {column['name'] for column in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {_quote(table)} ADD COLUMN {ROW_HASH_COLUMN} TEXT"))
+        rows = conn.execute(text(f"SELECT rowid AS _rowid, * FROM {_quote(table)}")).mappings().all()
+        updates = [
+            {'h': compute_row_hash({k: v for k, v in row.items() if k != '_rowid'}), 'r': row['_rowid']}
+            for row in rows
+        ]
+        if updates:
+            conn.execute(text(f"UPDATE {_quote(table)} SET {ROW_HASH_COLUMN} = :h WHERE rowid = :r"), updates)
+
+def _migration_seed_contract_history(conn) -> None:
+    # Les contrats existants ouvrent chacun une première version
+    conn.execute(text(
+        "INSERT INTO contract_history (user_id, start_date, end_date, theoretical_remuneration, row_hash, valid_from) "
+        "SELECT user_id, start_date, end_date, theoretical_remuneration, row_hash, :now FROM contracts"
+    ), {'now': datetime.now(timezone.utc).isoformat()})
+
+def _migration_synced_at(conn) -> None:
+    # Les lignes existantes sont datées de la migration : le premier export incrémental les inclut
+    now = datetime.now(timezone.utc).isoformat()
+    for table in HASHED_TABLES:
+        if SYNCED_AT_COLUMN not in {column['name'] for column in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {_quote(table)} ADD COLUMN {SYNCED_AT_COLUMN} TEXT"))
+        conn.execute(text(f"UPDATE {_quote(table)} SET {SYNCED_AT_COLUMN} = :now WHERE {SYNCED_AT_COLUMN} IS NULL"),
+                     {'now': now})
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {_quote(f'ix_{table}_{SYNCED_AT_COLUMN}')} ON {_quote(table)} ({SYNCED_AT_COLUMN})"
+        ))
+
+def _migration_manager_ids(conn) -> None:
+    # L'ID du manager, absent du schéma typé, permet de parcourir la hiérarchie sans comparer des noms
+    if 'managerId' not in {column['name'] for column in inspect(conn).get_columns('users')}:
+        conn.execute(text('ALTER TABLE users ADD COLUMN "managerId" INTEGER'))
+
+def _migration_tombstones(conn) -> None:
+    for table in TOMBSTONED_TABLES:
+        if DELETED_AT_COLUMN not in {column['name'] for column in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(DELETED_AT_COLUMN)} TEXT"))
+
+def _migration_checkpoint_keys(conn) -> None:
+    # Reprise par clé : dernier ID validé et heure de début du passage interrompu
+    columns = {column['name'] for column in inspect(conn).get_columns('sync_checkpoints')}
+    if 'last_id' not in columns:
+        conn.execute(text("ALTER TABLE sync_checkpoints ADD COLUMN last_id INTEGER"))
+    if 'started_at' not in columns:
+        conn.execute(text("ALTER TABLE sync_checkpoints ADD COLUMN started_at TEXT"))
+    # Un point de contrôle par offset ne peut pas être repris par clé : le passage suivant repart du début
+    conn.execute(text("DELETE FROM sync_checkpoints"))
+
+# Migrations appliquées dans l'ordre. Chaque entrée : (version, description, étapes),
+# les étapes étant des instructions SQL ou des fonctions recevant la connexion.
+MIGRATIONS = [
+    (1, "Tables typées avec clés primaires", [_migration_typed_tables]),
+    (2, "Index secondaires", [
+        'CREATE INDEX IF NOT EXISTS ix_users_department ON users (department)',
+        'CREATE INDEX IF NOT EXISTS ix_users_manager ON users (manager)',
+        'CREATE INDEX IF NOT EXISTS ix_users_modifiedOn ON users ("modifiedOn")',
+        'CREATE INDEX IF NOT EXISTS ix_departments_parentId ON departments ("parentId")',
+    ]),
+    (3, "Tables de liaison utilisateurs/rôles et départements/membres", [
+        'CREATE TABLE IF NOT EXISTS roles (id INTEGER PRIMARY KEY, name TEXT)',
+        'CREATE TABLE IF NOT EXISTS user_roles ('
+        'user_id INTEGER NOT NULL, role_id INTEGER NOT NULL, '
+        'PRIMARY KEY (user_id, role_id)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS ix_user_roles_role ON user_roles (role_id, user_id)',
+        'CREATE TABLE IF NOT EXISTS department_members ('
+        'department_id INTEGER NOT NULL, user_id INTEGER NOT NULL, is_current INTEGER NOT NULL DEFAULT 0, '
+        'PRIMARY KEY (department_id, user_id)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS ix_department_members_user ON department_members (user_id, department_id)',
+        # Les liaisons ne peuvent pas être déduites des colonnes JSON (qui contiennent des noms) :
+        # la prochaine synchronisation des utilisateurs est complète
+        "DELETE FROM sync_state WHERE table_name = 'users'",
+    ]),
+    (4, "Table de fermeture de l'arborescence des départements", [
+        'CREATE TABLE IF NOT EXISTS department_closure ('
+        'ancestor_id INTEGER NOT NULL, descendant_id INTEGER NOT NULL, depth INTEGER NOT NULL, '
+        'PRIMARY KEY (ancestor_id, descendant_id)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS ix_department_closure_descendant ON department_closure (descendant_id, depth)',
+    ]),
+    (5, "Empreintes de contenu et historique des contrats", [
+        _migration_row_hashes,
+        'CREATE TABLE IF NOT EXISTS contract_history ('
+        'user_id INTEGER NOT NULL, start_date TEXT, end_date TEXT, theoretical_remuneration REAL, '
+        'row_hash TEXT NOT NULL, valid_from TEXT NOT NULL, valid_to TEXT, '
+        'PRIMARY KEY (user_id, valid_from))',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_contract_history_current ON contract_history (user_id) WHERE valid_to IS NULL',
+        _migration_seed_contract_history,
+    ]),
+    (6, "Horodatage des écritures", [
+        _migration_synced_at,
+    ]),
+    (7, "Points de contrôle des synchronisations", [
+        'CREATE TABLE IF NOT EXISTS sync_checkpoints ('
+        'endpoint TEXT PRIMARY KEY, since TEXT, next_offset INTEGER NOT NULL, watermark TEXT, '
+        'stage TEXT NOT NULL, updated_at TEXT NOT NULL)',
+    ]),
+    (8, "Identifiants des managers et génération des données", [
+        _migration_manager_ids,
+        'CREATE INDEX IF NOT EXISTS ix_users_managerId ON users ("managerId")',
+        'CREATE TABLE IF NOT EXISTS sync_generation (id INTEGER PRIMARY KEY CHECK (id = 1), generation INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO sync_generation (id, generation) VALUES (1, 0)',
+        # Les IDs des managers ne sont connus qu'à l'ingestion : la prochaine synchronisation des utilisateurs est complète
+        "DELETE FROM sync_state WHERE table_name = 'users'",
+    ]),
+    (9, "Marquage des suppressions et file de réconciliation", [
+        _migration_tombstones,
+        'CREATE TABLE IF NOT EXISTS reconcile_queue ('
+        'endpoint TEXT NOT NULL, id INTEGER NOT NULL, queued_at TEXT NOT NULL, '
+        'PRIMARY KEY (endpoint, id)) WITHOUT ROWID',
+    ]),
+    (10, "Reprise des synchronisations par clé", [
+        _migration_checkpoint_keys,
+    ]),
+]
+
+def get_schema_version(engine) -> int:
+    """
+    Récupère la version du schéma appliquée à la base de données.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+
+    Returns:
+        int: La dernière version appliquée, 0 pour une base vierge ou antérieure aux migrations.
+    """
+    with engine.connect() as conn:
+        if not inspect(conn).has_table('schema_version'):
+            return 0
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+def migrate(engine) -> int:
+    """
+    Applique les migrations en attente, chacune dans sa propre transaction.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+
+    Returns:
+        int: La version du schéma après migration.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, "
+            "description TEXT NOT NULL, "
+            "applied_at TEXT NOT NULL)"
+        ))
+
+    current = get_schema_version(engine)
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info(f"Migration du schéma vers la version {version} : {description}.")
+        with engine.begin() as conn:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+                {'version': version, 'description': description, 'applied_at': datetime.now(timezone.utc).isoformat()}
+            )
+        current = version
+    return current
 
 def initialize_db(engine):
     """
-    Initialise la base de données en créant les tables si elles n'existent pas.
-    
+    Initialise la base de données : crée les tables si elles n'existent pas et
+    met à niveau le schéma des bases existantes.
+
     Args:
         engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
     """
-    inspector = inspect(engine)
+    version = migrate(engine)
+    logging.info(f"Schéma de la base de données à jour (version {version}).")
 
-    # Créer la table 'users' si elle n'existe pas
-    if not inspector.has_table("users"):
-        pd.DataFrame(columns=[
-            'id', 'name', 'url', 'displayName', 'modifiedOn', 'lastName', 'firstName', 'login', 'mail', 'birthDate', 'department','manager',
-            'rolePrincipal', 'habilitedRoles','legalEntity', 'theoreticalRemuneration', 'employeeNumber'
-        ]).to_sql('users', engine, if_exists='replace', index=False)
-        logging.info("Création de la table 'users'.")
+def get_sync_watermark(engine, table: str) -> Optional[str]:
+    """
+    Récupère le high-water mark enregistré pour une table.
 
-    # Créer la table 'contracts' si elle n'existe pas
-    if not inspector.has_table("contracts"):
-        pd.DataFrame(columns=[
-            'user_id', 'start_date', 'end_date', 'theoretical_remuneration'
-        ]).to_sql('contracts', engine, if_exists='replace', index=False)
-        logging.info("Création de la table 'contracts'.")
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Le nom de la table synchronisée.
+
+    Returns:
+        Optional[str]: Le dernier `modifiedOn` appliqué, ou None si aucune synchronisation n'a eu lieu.
+    """
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT watermark FROM sync_state WHERE table_name = :table"),
+            {'table': table}
+        ).scalar()
+
+def set_sync_watermark(engine, table: str, watermark: str) -> None:
+    """
+    Enregistre le high-water mark d'une table après une synchronisation réussie.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Le nom de la table synchronisée.
+        watermark (str): Le plus grand `modifiedOn` appliqué.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO sync_state (table_name, watermark, updated_at) VALUES (:table, :watermark, :updated_at) "
+                "ON CONFLICT(table_name) DO UPDATE SET watermark = excluded.watermark, updated_at = excluded.updated_at"
+            ),
+            {'table': table, 'watermark': watermark, 'updated_at': datetime.now(timezone.utc).isoformat()}
+        )
+
+def get_sync_generation(engine) -> int:
+    """
+    Récupère la génération des données, incrémentée par chaque transaction qui modifie les tables synchronisées.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+
+    Returns:
+        int: La génération courante.
+    """
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT generation FROM sync_generation WHERE id = 1")).scalar()
+
+def _bump_sync_generation(conn) -> None:
+    # Appelée dans la transaction d'écriture : les caches de lecture (voir queries.py) sont invalidés à sa validation
+    if inspect(conn).has_table('sync_generation'):
+        conn.execute(text("UPDATE sync_generation SET generation = generation + 1 WHERE id = 1"))
+
+def get_checkpoint(engine, endpoint: str) -> Optional[Dict[str, Any]]:
+    """
+    Récupère le point de contrôle d'une synchronisation interrompue.
 
-    # Créer la table 'departments' si elle n'existe pas
-    if not inspector.has_table("departments"):
-        pd.DataFrame(columns=[
-            'id', 'name','code', 'hierarchy', 'parentId', 'isActive','position','level','sortOrder','headID',
-            'users', 'currentUsers', 'currentUsersCount'
-        ]).to_sql('departments', engine, if_exists='replace', index=False)
-        logging.info("Création de la table 'departments'.")
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        endpoint (str): L'endpoint synchronisé (par exemple 'users').
+
+    Returns:
+        Optional[Dict[str, Any]]: 'since' (filtre `modifiedOn` de la synchronisation), 'next_offset'
+        (nombre d'éléments validés), 'last_id' (plus grand ID validé), 'watermark' (plus grand
+        `modifiedOn` validé), 'started_at' (début du passage interrompu), 'stage' et 'updated_at',
+        ou None si la dernière synchronisation s'est terminée.
+    """
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT since, next_offset, last_id, watermark, started_at, stage, updated_at "
+                 "FROM sync_checkpoints WHERE endpoint = :endpoint"),
+            {'endpoint': endpoint}
+        ).mappings().first()
+    return dict(row) if row else None
+
+def save_checkpoint(engine, endpoint: str, since: Optional[str], next_offset: int, watermark: Optional[str],
+                    stage: str, last_id: Optional[int] = None, started_at: Optional[str] = None) -> None:
+    """
+    Enregistre la progression d'une synchronisation, après la validation d'une page.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        endpoint (str): L'endpoint synchronisé.
+        since (str, optional): Filtre `modifiedOn` de la synchronisation, None pour une synchronisation complète.
+        next_offset (int): Nombre d'éléments déjà validés.
+        watermark (str, optional): Plus grand `modifiedOn` validé.
+        stage (str): Étape en cours ('running') ou étape en échec ('fetch', 'write').
+        last_id (int, optional): Plus grand ID validé, à partir duquel la synchronisation reprend.
+        started_at (str, optional): Heure de début du passage, qui plafonne le high-water mark après reprise.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO sync_checkpoints (endpoint, since, next_offset, last_id, watermark, started_at, "
+                "stage, updated_at) "
+                "VALUES (:endpoint, :since, :next_offset, :last_id, :watermark, :started_at, :stage, :updated_at) "
+                "ON CONFLICT(endpoint) DO UPDATE SET since = excluded.since, next_offset = excluded.next_offset, "
+                "last_id = excluded.last_id, watermark = excluded.watermark, started_at = excluded.started_at, "
+                "stage = excluded.stage, updated_at = excluded.updated_at"
+            ),
+            {'endpoint': endpoint, 'since': since, 'next_offset': next_offset, 'last_id': last_id,
+             'watermark': watermark, 'started_at': started_at, 'stage': stage,
+             'updated_at': datetime.now(timezone.utc).isoformat()}
+        )
+
+def clear_checkpoint(engine, endpoint: str) -> None:
+    """Supprime le point de contrôle d'un endpoint, une fois sa synchronisation terminée."""
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM sync_checkpoints WHERE endpoint = :endpoint"), {'endpoint': endpoint})
+
+def get_live_index(engine, table: str, timestamp_column: Optional[str] = None) -> Dict[int, Optional[str]]:
+    """
+    Récupère l'index des lignes actives d'une table : ID et, le cas échéant, date de modification.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Table à tombstones (voir `TOMBSTONED_TABLES`).
+        timestamp_column (str, optional): Colonne de date de modification (par exemple 'modifiedOn').
+
+    Returns:
+        Dict[int, Optional[str]]: Date de modification par ID (None sans `timestamp_column`),
+        hors lignes marquées supprimées.
+    """
+    selected = _quote(timestamp_column) if timestamp_column else 'NULL'
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            f"SELECT id, {selected} FROM {_quote(table)} WHERE {_quote(DELETED_AT_COLUMN)} IS NULL"
+        )).fetchall())
+
+def _set_deleted_at(engine, table: str, ids: Sequence[int], deleted: bool, batch_size: int) -> int:
+    now = datetime.now(timezone.utc).isoformat()
+    column = _quote(DELETED_AT_COLUMN)
+    ids = list(ids)
+    changed = 0
+    with engine.begin() as conn:
+        for start in range(0, len(ids), batch_size):
+            bind = {f'i{i}': record_id for i, record_id in enumerate(ids[start:start + batch_size])}
+            # La date d'écriture change aussi : l'export incrémental transmet la suppression ou la restauration
+            changed += conn.execute(text(
+                f"UPDATE {_quote(table)} SET {column} = :deleted_at, {SYNCED_AT_COLUMN} = :now "
+                f"WHERE {column} IS {'' if deleted else 'NOT '}NULL AND id IN ({', '.join(':' + name for name in bind)})"
+            ), {**bind, 'deleted_at': now if deleted else None, 'now': now}).rowcount
+        if changed:
+            _bump_sync_generation(conn)
+    return changed
+
+def mark_deleted(engine, table: str, ids: Sequence[int], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Marque comme supprimées (tombstones) des lignes disparues de l'API, sans les effacer.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Table à tombstones (voir `TOMBSTONED_TABLES`).
+        ids (Sequence[int]): IDs des lignes supprimées en amont.
+        batch_size (int): Nombre d'IDs par instruction.
+
+    Returns:
+        int: Nombre de lignes nouvellement marquées.
+    """
+    return _set_deleted_at(engine, table, ids, True, batch_size)
+
+def restore_deleted(engine, table: str, ids: Sequence[int], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Retire la marque de suppression des lignes de nouveau renvoyées par l'API.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Table à tombstones (voir `TOMBSTONED_TABLES`).
+        ids (Sequence[int]): IDs des lignes reçues.
+        batch_size (int): Nombre d'IDs par instruction.
+
+    Returns:
+        int: Nombre de lignes restaurées.
+    """
+    return _set_deleted_at(engine, table, ids, False, batch_size)
+
+def enqueue_refetch(engine, endpoint: str, ids: Sequence[int]) -> None:
+    """Ajoute des IDs à la file des récupérations complètes d'un endpoint (voir reconcile.py)."""
+    now = datetime.now(timezone.utc).isoformat()
+    with engine.begin() as conn:
+        if ids:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO reconcile_queue (endpoint, id, queued_at) VALUES (:endpoint, :id, :now)"
+            ), [{'endpoint': endpoint, 'id': record_id, 'now': now} for record_id in ids])
+
+def get_refetch_queue(engine, endpoint: str) -> List[int]:
+    """Renvoie les IDs en attente de récupération complète pour un endpoint, par ID croissant."""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT id FROM reconcile_queue WHERE endpoint = :endpoint ORDER BY id"),
+                            {'endpoint': endpoint}).scalars().all()
+
+def dequeue_refetch(engine, endpoint: str, ids: Sequence[int]) -> None:
+    """Retire de la file des IDs dont la récupération complète est terminée."""
+    with engine.begin() as conn:
+        if ids:
+            conn.execute(text("DELETE FROM reconcile_queue WHERE endpoint = :endpoint AND id = :id"),
+                         [{'endpoint': endpoint, 'id': record_id} for record_id in ids])
 
 def get_existing_ids(engine, table, id_column='id'):
     """
@@ -50,16 +589,376 @@ def get_existing_ids(engine, table, id_column='id'):
     df = pd.read_sql(query, engine)
     return set(df[id_column].tolist())
 
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convertit un DataFrame en dictionnaires de types Python natifs (NaN -> None)."""
+    return df.astype(object).where(pd.notna(df), None).to_dict('records')
+
+def _insert_statement(table: str, columns: List[str], params: Dict[str, str]) -> str:
+    return (
+        f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) "
+        f"VALUES ({', '.join(':' + params[c] for c in columns)}) "
+    )
+
+def _batches(records: List[Dict[str, Any]], columns: List[str], params: Dict[str, str], batch_size: int):
+    # Un executemany par lot : la mémoire des paramètres liés reste bornée par `batch_size`
+    for start in range(0, len(records), batch_size):
+        yield [{params[c]: record[c] for c in columns} for record in records[start:start + batch_size]]
+
+def bulk_load(df: pd.DataFrame, engine, table: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Charge des enregistrements en masse par `executemany`, lot par lot, dans une seule transaction.
+
+    Sans détection de conflit : destiné au chargement initial d'une table vide
+    ou d'une table sans clé. Utiliser `upsert_records` pour une synchronisation.
+
+    Args:
+        df (pd.DataFrame): DataFrame contenant les enregistrements.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Nom de la table cible.
+        batch_size (int): Nombre de lignes par lot.
+
+    Returns:
+        int: Nombre d'enregistrements insérés.
+    """
+    if df.empty:
+        return 0
+    columns = list(df.columns)
+    params = {column: f'p{i}' for i, column in enumerate(columns)}
+    statement = text(_insert_statement(table, columns, params))
+    inserted = 0
+    with engine.begin() as conn:
+        for batch in _batches(_to_records(df), columns, params, batch_size):
+            inserted += conn.execute(statement, batch).rowcount
+        if inserted:
+            _bump_sync_generation(conn)
+    return inserted
+
+def upsert_records(df: pd.DataFrame, engine, table: str, key_columns: Sequence[str] = ('id',),
+                   batch_size: int = DEFAULT_BATCH_SIZE, history_table: Optional[str] = None,
+                   hash_cache: Optional[Dict[tuple, str]] = None) -> Dict[str, int]:
+    """
+    Insère ou met à jour des enregistrements via `INSERT ... ON CONFLICT DO UPDATE`.
+
+    Les lignes sont envoyées par lots dans une seule transaction. Pour les tables
+    dotées d'une colonne `row_hash`, l'empreinte du contenu de chaque ligne est
+    calculée et comparée, lot par lot, à celle enregistrée : les lignes inchangées
+    sont écartées avant toute écriture. Pour les autres tables, seules les lignes
+    dont au moins une colonne a changé sont réécrites. Si la table est vide
+    (chargement initial), les lots sont insérés directement, sans détection de conflit.
+
+    Args:
+        df (pd.DataFrame): DataFrame contenant les enregistrements.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Nom de la table cible.
+        key_columns (Sequence[str]): Colonnes formant la clé primaire ou unique.
+        batch_size (int): Nombre de lignes par lot.
+        history_table (str, optional): Table d'historique recevant une version
+            (`valid_from`/`valid_to`) par ligne insérée ou modifiée.
+        hash_cache (Dict[tuple, str], optional): Empreintes enregistrées de la table, par clé,
+            conservées d'un appel à l'autre par un processus qui est le seul à écrire dans la
+            base : seules les clés absentes du cache sont recherchées dans la table. Le cache
+            n'est mis à jour qu'une fois la transaction validée.
+
+    Returns:
+        Dict[str, int]: Nombre d'enregistrements 'inserted', 'updated' et 'unchanged'.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    if df.empty:
+        return counts
+
+    key_columns = list(key_columns)
+    # Pour une même clé, seule la dernière occurrence du lot est conservée
+    df = df.drop_duplicates(subset=key_columns, keep='last')
+    records = _to_records(df)
+    columns = [c for c in df.columns if c not in (ROW_HASH_COLUMN, SYNCED_AT_COLUMN)]
+    synced_at = datetime.now(timezone.utc).isoformat()
+
+    with engine.begin() as conn:
+        table_columns = {column['name'] for column in inspect(conn).get_columns(table)}
+        hashed = ROW_HASH_COLUMN in table_columns
+        if hashed:
+            for record in records:
+                record[ROW_HASH_COLUMN] = compute_row_hash({c: record[c] for c in columns})
+            columns.append(ROW_HASH_COLUMN)
+        elif history_table:
+            raise ValueError(f"La table '{table}' n'a pas de colonne {ROW_HASH_COLUMN} : historique impossible.")
+        if SYNCED_AT_COLUMN in table_columns:
+            # Seules les lignes effectivement écrites prennent la nouvelle date (voir la clause WHERE)
+            for record in records:
+                record[SYNCED_AT_COLUMN] = synced_at
+            columns.append(SYNCED_AT_COLUMN)
+
+        params = {column: f'p{i}' for i, column in enumerate(columns)}
+        update_columns = [c for c in columns if c not in key_columns]
+        compared_columns = [c for c in update_columns if c != SYNCED_AT_COLUMN]
+        insert_sql = _insert_statement(table, columns, params) + f"ON CONFLICT ({', '.join(_quote(c) for c in key_columns)}) "
+        if compared_columns:
+            insert_sql += (
+                f"DO UPDATE SET {', '.join(f'{_quote(c)} = excluded.{_quote(c)}' for c in update_columns)} "
+                f"WHERE {' OR '.join(f'{_quote(table)}.{_quote(c)} IS NOT excluded.{_quote(c)}' for c in compared_columns)}"
+            )
+        else:
+            insert_sql += "DO NOTHING"
+
+        # Table vide : ni conflit possible, ni clé existante à rechercher
+        empty = conn.execute(text(f"SELECT 1 FROM {_quote(table)} LIMIT 1")).first() is None
+        statement = text(_insert_statement(table, columns, params) if empty else insert_sql)
+
+        use_cache = hashed and hash_cache is not None
+        cache_updates = {}
+        for batch in _batches(records, columns, params, batch_size):
+            keys = [tuple(row[params[k]] for k in key_columns) for row in batch]
+            if empty:
+                existing = {}
+            elif use_cache:
+                existing = {key: hash_cache[key] for key in keys if key in hash_cache}
+                missing = [key for key in keys if key not in existing]
+                if missing:
+                    existing.update(_existing_hashes(conn, table, key_columns, missing, hashed))
+            else:
+                existing = _existing_hashes(conn, table, key_columns, keys, hashed)
+            if hashed:
+                # Écarter les lignes dont l'empreinte n'a pas changé
+                batch = [row for row, key in zip(batch, keys)
+                         if key not in existing or existing[key] != row[params[ROW_HASH_COLUMN]]]
+                keys = [tuple(row[params[k]] for k in key_columns) for row in batch]
+            written = conn.execute(statement, batch).rowcount if batch else 0
+            if use_cache:
+                cache_updates.update(existing)
+                cache_updates.update((key, row[params[ROW_HASH_COLUMN]]) for row, key in zip(batch, keys))
+
+            inserted = sum(1 for key in keys if key not in existing)
+            counts['inserted'] += inserted
+            counts['updated'] += written - inserted
+            if history_table and batch:
+                _record_history(conn, history_table, key_columns, columns, params, batch, synced_at)
+
+        counts['unchanged'] = len(records) - counts['inserted'] - counts['updated']
+        if counts['inserted'] or counts['updated']:
+            _bump_sync_generation(conn)
+
+    if use_cache:
+        hash_cache.update(cache_updates)
+    return counts
+
+def _existing_hashes(conn, table: str, key_columns: List[str], keys: List[tuple], hashed: bool) -> Dict[tuple, Optional[str]]:
+    """Recherche, via l'index des clés, les clés d'un lot déjà présentes dans la table et leur empreinte."""
+    bind = {}
+    rows = []
+    for i, key in enumerate(keys):
+        names = []
+        for j, value in enumerate(key):
+            bind[f'k{i}_{j}'] = value
+            names.append(f':k{i}_{j}')
+        rows.append(names[0] if len(names) == 1 else f"({', '.join(names)})")
+
+    if len(key_columns) == 1:
+        condition = f"{_quote(key_columns[0])} IN ({', '.join(rows)})"
+    else:
+        condition = f"({', '.join(_quote(c) for c in key_columns)}) IN (VALUES {', '.join(rows)})"
+    selected = ', '.join([_quote(c) for c in key_columns] + [ROW_HASH_COLUMN if hashed else 'NULL'])
+    return {
+        tuple(row[:-1]): row[-1]
+        for row in conn.execute(text(f"SELECT {selected} FROM {_quote(table)} WHERE {condition}"), bind)
+    }
+
+def _record_history(conn, history_table: str, key_columns: List[str], columns: List[str],
+                    params: Dict[str, str], batch: List[Dict[str, Any]], valid_from: str) -> None:
+    """Clôt la version courante des lignes modifiées et ouvre leur nouvelle version."""
+    columns = [c for c in columns if c != SYNCED_AT_COLUMN]
+    key_condition = ' AND '.join(f"{_quote(k)} = :{params[k]}" for k in key_columns)
+    conn.execute(text(
+        f"UPDATE {_quote(history_table)} SET valid_to = :valid_from "
+        f"WHERE {key_condition} AND valid_to IS NULL AND {ROW_HASH_COLUMN} IS NOT :{params[ROW_HASH_COLUMN]}"
+    ), [{**row, 'valid_from': valid_from} for row in batch])
+    conn.execute(text(
+        f"INSERT INTO {_quote(history_table)} ({', '.join(_quote(c) for c in columns)}, valid_from) "
+        f"SELECT {', '.join(':' + params[c] for c in columns)}, :valid_from "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {_quote(history_table)} WHERE {key_condition} AND valid_to IS NULL)"
+    ), [{**row, 'valid_from': valid_from} for row in batch])
+
+def replace_links(df: pd.DataFrame, engine, table: str, owner_column: str, owner_ids: Sequence[Any],
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Remplace, dans une table de liaison, l'ensemble des liens des propriétaires donnés.
+
+    Les liens enregistrés des propriétaires sont comparés à ceux du DataFrame,
+    dans une seule transaction : seuls les liens disparus sont supprimés et les
+    liens nouveaux insérés. Un propriétaire présent dans `owner_ids` mais absent
+    du DataFrame perd tous ses liens.
+
+    Args:
+        df (pd.DataFrame): Liens à écrire, avec la colonne `owner_column`.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Nom de la table de liaison.
+        owner_column (str): Colonne identifiant le propriétaire des liens (par exemple 'user_id').
+        owner_ids (Sequence[Any]): Propriétaires synchronisés.
+        batch_size (int): Nombre de lignes par lot.
+
+    Returns:
+        Dict[str, int]: Nombre de liens 'deleted' et 'inserted'.
+    """
+    owner_ids = list(dict.fromkeys(owner_ids))
+    columns = list(df.columns)
+    params = {column: f'p{i}' for i, column in enumerate(columns)}
+    wanted = {tuple(record[c] for c in columns) for record in _to_records(df)}
+
+    with engine.begin() as conn:
+        stored = set()
+        for start in range(0, len(owner_ids), batch_size):
+            chunk = owner_ids[start:start + batch_size]
+            bind = {f'o{i}': owner_id for i, owner_id in enumerate(chunk)}
+            stored.update(tuple(row) for row in conn.execute(text(
+                f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_quote(table)} "
+                f"WHERE {_quote(owner_column)} IN ({', '.join(':' + name for name in bind)})"
+            ), bind))
+
+        removed = [dict(zip(params.values(), link)) for link in stored - wanted]
+        added = [dict(zip(params.values(), link)) for link in wanted - stored]
+        condition = ' AND '.join(f"{_quote(c)} = :{params[c]}" for c in columns)
+        for start in range(0, len(removed), batch_size):
+            conn.execute(text(f"DELETE FROM {_quote(table)} WHERE {condition}"), removed[start:start + batch_size])
+        statement = text(_insert_statement(table, columns, params))
+        for start in range(0, len(added), batch_size):
+            conn.execute(statement, added[start:start + batch_size])
+        if removed or added:
+            _bump_sync_generation(conn)
+    return {'deleted': len(removed), 'inserted': len(added)}
+
+def write_department_closure(df: pd.DataFrame, engine, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Met à jour la table de fermeture des départements de manière incrémentale.
+
+    La fermeture calculée est comparée à celle enregistrée : seules les paires
+    (ancêtre, descendant) apparues, disparues ou dont la profondeur a changé sont
+    écrites. Un département déplacé ne réécrit donc que les lignes de son sous-arbre.
+
+    Args:
+        df (pd.DataFrame): Fermeture complète ('ancestor_id', 'descendant_id', 'depth'),
+            voir `compute_department_closure`.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        batch_size (int): Nombre de lignes par lot.
+
+    Returns:
+        Dict[str, int]: Nombre de paires 'inserted', 'updated' et 'deleted'.
+    """
+    wanted = {(int(a), int(d)): int(depth) for a, d, depth in df[['ancestor_id', 'descendant_id', 'depth']].itertuples(index=False)}
+    with engine.begin() as conn:
+        stored = {(a, d): depth for a, d, depth in conn.execute(
+            text("SELECT ancestor_id, descendant_id, depth FROM department_closure")
+        )}
+        removed = [{'a': a, 'd': d} for (a, d) in stored.keys() - wanted.keys()]
+        changed = [{'a': a, 'd': d, 'depth': depth} for (a, d), depth in wanted.items() if stored.get((a, d)) != depth]
+
+        for start in range(0, len(removed), batch_size):
+            conn.execute(text("DELETE FROM department_closure WHERE ancestor_id = :a AND descendant_id = :d"),
+                         removed[start:start + batch_size])
+        for start in range(0, len(changed), batch_size):
+            conn.execute(text(
+                "INSERT INTO department_closure (ancestor_id, descendant_id, depth) VALUES (:a, :d, :depth) "
+                "ON CONFLICT (ancestor_id, descendant_id) DO UPDATE SET depth = excluded.depth"
+            ), changed[start:start + batch_size])
+        if removed or changed:
+            _bump_sync_generation(conn)
+
+    updated = sum(1 for row in changed if (row['a'], row['d']) in stored)
+    return {'inserted': len(changed) - updated, 'updated': updated, 'deleted': len(removed)}
+
+def get_department_subtree(engine, department_id: int, max_depth: Optional[int] = None) -> List[int]:
+    """
+    Récupère un département et tous ses descendants, via la table de fermeture.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        department_id (int): Racine du sous-arbre.
+        max_depth (int, optional): Profondeur maximale (1 pour les enfants directs).
+
+    Returns:
+        List[int]: IDs des départements, par profondeur croissante.
+    """
+    query = "SELECT descendant_id FROM department_closure WHERE ancestor_id = :id"
+    if max_depth is not None:
+        query += " AND depth <= :max_depth"
+    with engine.connect() as conn:
+        return conn.execute(text(query + " ORDER BY depth, descendant_id"),
+                            {'id': department_id, 'max_depth': max_depth}).scalars().all()
+
+def get_department_ancestors(engine, department_id: int) -> List[int]:
+    """
+    Récupère les ancêtres d'un département, du parent direct jusqu'à la racine.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        department_id (int): Le département.
+
+    Returns:
+        List[int]: IDs des ancêtres, par profondeur croissante.
+    """
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT ancestor_id FROM department_closure WHERE descendant_id = :id AND depth > 0 ORDER BY depth"),
+            {'id': department_id}
+        ).scalars().all()
+
+def get_subtree_user_ids(engine, department_id: int, current_only: bool = True) -> List[int]:
+    """
+    Récupère les utilisateurs d'un département et de tous ses descendants.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        department_id (int): Racine du sous-arbre.
+        current_only (bool): Ne retenir que les membres actuels ('currentUsers').
+
+    Returns:
+        List[int]: IDs des utilisateurs, triés.
+    """
+    query = (
+        "SELECT DISTINCT m.user_id FROM department_closure c "
+        "JOIN department_members m ON m.department_id = c.descendant_id "
+        "WHERE c.ancestor_id = :id"
+    )
+    if current_only:
+        query += " AND m.is_current = 1"
+    with engine.connect() as conn:
+        return conn.execute(text(query + " ORDER BY m.user_id"), {'id': department_id}).scalars().all()
+
+def get_department_headcounts(engine, current_only: bool = True) -> Dict[int, int]:
+    """
+    Calcule l'effectif cumulé de chaque département (lui-même et ses descendants).
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        current_only (bool): Ne compter que les membres actuels ('currentUsers').
+
+    Returns:
+        Dict[int, int]: Effectif par ID de département, un utilisateur n'étant compté qu'une fois.
+        Les départements sans aucun membre sont absents.
+    """
+    query = (
+        "SELECT c.ancestor_id, COUNT(DISTINCT m.user_id) FROM department_closure c "
+        "JOIN department_members m ON m.department_id = c.descendant_id"
+    )
+    if current_only:
+        query += " WHERE m.is_current = 1"
+    with engine.connect() as conn:
+        return dict(conn.execute(text(query + " GROUP BY c.ancestor_id")).fetchall())
+
 def insert_new_records(df: pd.DataFrame, engine, table: str, id_column: str = 'id') -> int:
     """
     Insère de nouveaux enregistrements dans une table SQL en évitant les doublons basés sur une colonne d'identifiant.
-    
+
+    Conservée pour compatibilité : délègue à `upsert_records`, qui met aussi à jour
+    les enregistrements existants modifiés.
+
     Args:
         df (pd.DataFrame): DataFrame contenant les enregistrements à insérer.
         engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
         table (str): Nom de la table dans laquelle insérer les enregistrements.
         id_column (str): Nom de la colonne utilisée pour identifier les doublons.
-        
+
     Returns:
         int: Nombre d'enregistrements insérés.
     """
@@ -68,25 +967,7 @@ def insert_new_records(df: pd.DataFrame, engine, table: str, id_column: str = 'i
         return 0
 
     try:
-        # Récupérer les identifiants existants dans la table
-        existing_ids = pd.read_sql(f"SELECT {id_column} FROM {table}", engine)[id_column].tolist()
-    except Exception as e:
-        logging.error(f"Erreur lors de la récupération des IDs existants dans la table '{table}': {e}")
-        return 0
-
-    # Filtrer les nouveaux enregistrements
-    new_df = df[~df[id_column].isin(existing_ids)]
-
-    if new_df.empty:
-        logging.info(f"Aucun nouvel enregistrement à insérer dans la table '{table}'.")
-        return 0
-
-    try:
-        # Insérer les nouveaux enregistrements
-        new_df.to_sql(table, engine, if_exists='append', index=False)
-        inserted_count = len(new_df)
-        return inserted_count
-        print("inserted_count")
+        return upsert_records(df, engine, table, key_columns=[id_column])['inserted']
     except Exception as e:
         logging.error(f"Erreur lors de l'insertion des enregistrements dans la table '{table}': {e}")
-        return 0
\ No newline at end of file
+        return 0
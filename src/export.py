@@ -0,0 +1,292 @@
+from db_manager import (get_sync_watermark, set_sync_watermark, create_sqlite_engine, ROW_HASH_COLUMN,
+                        SYNCED_AT_COLUMN)
+from datetime import datetime, timezone
+from sqlalchemy import inspect, text
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import argparse
+import logging
+import os
+import shutil
+import sys
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Dépendance optionnelle : pip install pyarrow
+    pa = None
+
+# Tables exportées par défaut
+EXPORT_TABLES = ['users', 'contracts', 'departments']
+# Formats de fichier : Parquet (compressé, colonnes élaguables) ou Arrow IPC (projetable en mémoire sans copie)
+EXPORT_FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+# Nombre de lignes lues dans SQLite et écrites par groupe de lignes
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("L'export en colonnes nécessite pyarrow : pip install pyarrow")
+
+
+def _export_columns(engine, table: str, columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    # Colonnes exportées avec leur type déclaré ; l'empreinte de contenu est interne à la synchronisation
+    table_columns = [column for column in inspect(engine).get_columns(table) if column['name'] != ROW_HASH_COLUMN]
+    if columns is None:
+        return table_columns
+    by_name = {column['name']: column for column in table_columns}
+    unknown = [name for name in columns if name not in by_name]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues dans la table '{table}' : {', '.join(unknown)}.")
+    selected = list(dict.fromkeys(list(columns) + [SYNCED_AT_COLUMN]))
+    return [by_name[name] for name in selected]
+
+
+def iter_changed_rows(engine, table: str, since: Optional[str] = None, columns: Optional[Sequence[str]] = None,
+                      chunksize: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Parcourt, par blocs, les lignes d'une table écrites après `since`, par date d'écriture croissante.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Nom de la table.
+        since (str, optional): Date d'écriture (`synced_at`) exclue. Par défaut, toutes les lignes.
+        columns (Sequence[str], optional): Colonnes à lire (`synced_at` est toujours incluse).
+        chunksize (int): Nombre de lignes par bloc.
+
+    Yields:
+        pd.DataFrame: Bloc de lignes.
+    """
+    names = ', '.join(f'"{column["name"]}"' for column in _export_columns(engine, table, columns))
+    query = f'SELECT {names} FROM "{table}"'
+    if since is not None:
+        query += f" WHERE {SYNCED_AT_COLUMN} > :since"
+    query += f" ORDER BY {SYNCED_AT_COLUMN}"
+    with engine.connect() as conn:
+        yield from pd.read_sql(text(query), conn, params={'since': since}, chunksize=chunksize)
+
+
+def _arrow_schema(columns: List[Dict[str, Any]]):
+    # Types déclarés par le schéma (voir TABLE_DEFINITIONS) : INTEGER, REAL, TEXT
+    fields = []
+    for column in columns:
+        declared = str(column['type']).upper()
+        if 'INT' in declared:
+            arrow_type = pa.int64()
+        elif 'REAL' in declared or 'FLOA' in declared or 'DOUB' in declared:
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column['name'], arrow_type))
+    return pa.schema(fields)
+
+
+def _to_arrow(df: pd.DataFrame, schema):
+    df = df.copy()
+    for field in schema:
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            # Les valeurs non numériques (par exemple 'Unknown') deviennent nulles
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce')
+            if pa.types.is_integer(field.type):
+                df[field.name] = df[field.name].astype('Int64')
+        else:
+            df[field.name] = df[field.name].astype(object).where(df[field.name].notna(), None)
+            df[field.name] = [value if value is None or isinstance(value, str) else str(value)
+                              for value in df[field.name]]
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+class _PartitionWriter:
+    """Écrit les blocs d'une partition dans un fichier temporaire, renommé à la validation."""
+
+    def __init__(self, path: str, schema, fmt: str):
+        self.path = path
+        self.tmp_path = f'{path}.tmp'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(self.tmp_path, schema, compression='zstd')
+        else:
+            self._sink = pa.OSFile(self.tmp_path, 'wb')
+            self._writer = ipc.new_file(self._sink, schema)
+        self.fmt = fmt
+        self.rows = 0
+
+    def write(self, table) -> None:
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        self._writer.close()
+        if self.fmt != 'parquet':
+            self._sink.close()
+
+    def commit(self) -> None:
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def _replace_directory(new_dir: str, target_dir: str) -> None:
+    # L'ancien répertoire est mis de côté avant la substitution, puis supprimé
+    os.makedirs(new_dir, exist_ok=True)
+    old_dir = f'{new_dir}.old'
+    if os.path.exists(target_dir):
+        os.replace(target_dir, old_dir)
+    os.replace(new_dir, target_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def export_table(engine, table: str, output_dir: str, fmt: str = 'parquet', columns: Optional[Sequence[str]] = None,
+                 full: bool = False, chunksize: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Exporte les lignes d'une table écrites depuis le dernier export, partitionnées par date de synchronisation.
+
+    Les fichiers sont écrits sous `<output_dir>/<table>/sync_date=AAAA-MM-JJ/` (partitionnement
+    Hive). Chaque export ajoute un fichier par partition, avec les lignes insérées ou modifiées
+    depuis l'export précédent : pour l'état courant d'une ligne, un lecteur retient la version
+    de plus grand `synced_at`. La progression est enregistrée dans `sync_state` sous
+    `export:<table>`, une fois tous les fichiers validés.
+
+    Un export complet (`full=True`) remplace le répertoire de la table : il est écrit
+    dans un répertoire temporaire, substitué à l'ancien une fois tous les fichiers
+    validés, sans quoi les lignes déjà exportées seraient dupliquées.
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        table (str): Nom de la table.
+        output_dir (str): Répertoire racine de l'export.
+        fmt (str): 'parquet' ou 'arrow' (Arrow IPC).
+        columns (Sequence[str], optional): Colonnes à exporter. Par défaut, toutes sauf `row_hash`.
+        full (bool): Réexporter toutes les lignes, sans tenir compte du dernier export.
+        chunksize (int): Nombre de lignes par bloc de lecture et par groupe de lignes.
+
+    Returns:
+        Dict[str, Any]: Nombre de lignes exportées, fichiers écrits et nouvelle progression.
+    """
+    _require_pyarrow()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt}.")
+
+    state_key = f'export:{table}'
+    since = None if full else get_sync_watermark(engine, state_key)
+    schema = _arrow_schema(_export_columns(engine, table, columns))
+    run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    table_dir = os.path.join(output_dir, table)
+    target_dir = f'{table_dir}.{run_id}.tmp' if full else table_dir
+
+    writers: Dict[str, _PartitionWriter] = {}
+    watermark = since
+    try:
+        for chunk in iter_changed_rows(engine, table, since=since, columns=columns, chunksize=chunksize):
+            if chunk.empty:
+                continue
+            sync_dates = chunk[SYNCED_AT_COLUMN].str.slice(0, 10)
+            for sync_date, rows in chunk.groupby(sync_dates, sort=False):
+                writer = writers.get(sync_date)
+                if writer is None:
+                    path = os.path.join(target_dir, f'sync_date={sync_date}', f'part-{run_id}.{EXPORT_FORMATS[fmt]}')
+                    writer = writers[sync_date] = _PartitionWriter(path, schema, fmt)
+                writer.write(_to_arrow(rows, schema))
+            watermark = chunk[SYNCED_AT_COLUMN].max()
+        for writer in writers.values():
+            writer.close()
+    except Exception:
+        for writer in writers.values():
+            writer.abort()
+        if full:
+            shutil.rmtree(target_dir, ignore_errors=True)
+        raise
+
+    for writer in writers.values():
+        writer.commit()
+    files = sorted(os.path.join(table_dir, os.path.relpath(writer.path, target_dir)) for writer in writers.values())
+    if full:
+        _replace_directory(target_dir, table_dir)
+    if watermark is not None and watermark != since:
+        set_sync_watermark(engine, state_key, watermark)
+
+    rows = sum(writer.rows for writer in writers.values())
+    logging.info(f"Table '{table}' : {rows} lignes exportées dans {len(writers)} partition(s).")
+    return {'rows': rows, 'files': files, 'watermark': watermark}
+
+
+def export_snapshot(engine, output_dir: str, tables: Sequence[str] = EXPORT_TABLES, fmt: str = 'parquet',
+                    columns: Optional[Dict[str, Sequence[str]]] = None, full: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Exporte plusieurs tables (voir `export_table`).
+
+    Args:
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        output_dir (str): Répertoire racine de l'export.
+        tables (Sequence[str]): Tables à exporter.
+        fmt (str): 'parquet' ou 'arrow' (Arrow IPC).
+        columns (Dict[str, Sequence[str]], optional): Colonnes à exporter, par table.
+        full (bool): Réexporter toutes les lignes.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Résultat de l'export de chaque table.
+    """
+    return {
+        table: export_table(engine, table, output_dir, fmt=fmt, columns=(columns or {}).get(table), full=full)
+        for table in tables
+    }
+
+
+def open_snapshot(output_dir: str, table: str, fmt: str = 'parquet'):
+    """
+    Ouvre l'export d'une table comme un dataset Arrow, partitionné par `sync_date`.
+
+    Les lecteurs ne lisent que les colonnes et partitions demandées, par exemple
+    `open_snapshot(d, 'users').to_table(columns=['id', 'department'], filter=ds.field('sync_date') >= '2024-01-01')`.
+    Les fichiers Arrow IPC sont projetés en mémoire sans copie.
+
+    Args:
+        output_dir (str): Répertoire racine de l'export.
+        table (str): Nom de la table.
+        fmt (str): 'parquet' ou 'arrow'.
+
+    Returns:
+        pyarrow.dataset.Dataset: Le dataset de la table.
+    """
+    _require_pyarrow()
+    file_format = 'parquet' if fmt == 'parquet' else ds.IpcFileFormat()
+    return ds.dataset(os.path.join(output_dir, table), format=file_format, partitioning='hive')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporte les tables synchronisées en Parquet ou Arrow IPC.")
+    parser.add_argument('output_dir', help="Répertoire racine de l'export.")
+    parser.add_argument('--database', default='reflect_db.sqlite', help="Base SQLite à exporter.")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='parquet')
+    parser.add_argument('--tables', nargs='+', default=EXPORT_TABLES)
+    parser.add_argument('--full', action='store_true', help="Réexporter toutes les lignes.")
+    parser.add_argument('--columns', nargs='+', default=[], metavar='TABLE:COL,...',
+                        help="Colonnes à exporter pour une table, par exemple users:id,department.")
+    args = parser.parse_args(argv)
+
+    columns = {}
+    for spec in args.columns:
+        table, _, names = spec.partition(':')
+        if not table or not names:
+            parser.error(f"--columns attend TABLE:COL,... : {spec}")
+        columns[table] = [name for name in names.split(',') if name]
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+    try:
+        _require_pyarrow()
+    except ImportError as err:
+        logging.error(err)
+        sys.exit(1)
+
+    engine = create_sqlite_engine(args.database)
+    export_snapshot(engine, args.output_dir, tables=args.tables, fmt=args.format, columns=columns, full=args.full)
+
+
+if __name__ == '__main__':
+    main()
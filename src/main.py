@@ -1,11 +1,10 @@
 from api_client import LuccaAPIClient
-from data_processor import (process_users,process_departments,process_contracts_from_users,transform_user_data,clean_user_data)
-from db_manager import initialize_db, insert_new_records
+from db_manager import initialize_db, create_sqlite_engine
+from metrics import RunMetrics
+from sync import sync_all, sync_failed, SYNC_BRANCHES
 import os
 import sys
 import logging
-import pandas as pd
-from sqlalchemy import create_engine
 
 # Configurer le logger
 logging.basicConfig(
@@ -16,18 +15,90 @@ logging.basicConfig(
     ]
 )
 
-def main():
-    # Définir le chemin absolu pour la base de données
-    db_path = os.path.abspath('reflect_db.sqlite')
-    DATABASE_URI = f'sqlite:///{db_path}'
-    engine = create_engine(DATABASE_URI)
-
-    # Initialiser la base de données uniquement si le fichier n'existe pas
-    if not os.path.exists(db_path):
-        logging.info("Initialisation de la base de données...")
-        initialize_db(engine)
-    else:
-        logging.info("La base de données existe déjà. Aucune initialisation nécessaire.")
+def export_metrics(metrics):
+    """Journalise les mesures de la synchronisation et les exporte si demandé."""
+    metrics.log_summary()
+
+    report_path = os.getenv('SYNC_REPORT_PATH')
+    if report_path:
+        metrics.write_json(report_path)
+        logging.info(f"Rapport de synchronisation écrit dans {report_path}")
+
+    prom_path = os.getenv('SYNC_PROM_PATH')
+    if prom_path:
+        metrics.write_prometheus(prom_path)
+        logging.info(f"Métriques Prometheus écrites dans {prom_path}")
+
+    profile_path = metrics.dump_slowest_profile()
+    if profile_path:
+        logging.info(f"Profil de l'étape la plus lente écrit dans {profile_path}")
+
+
+def run_sync(client, engine, metrics, hash_caches=None, branches=SYNC_BRANCHES, full_sync=None, stream=None) -> bool:
+    """
+    Exécute une synchronisation complète, journalise son résultat et exporte ses mesures.
+
+    Args:
+        client (LuccaAPIClient): Le client de l'API Lucca.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        metrics (RunMetrics): Instrumentation de la synchronisation.
+        hash_caches (Dict[str, Dict[tuple, str]], optional): Empreintes déjà connues, par table.
+        branches (Sequence[str]): Branches à synchroniser ('users', 'departments').
+        full_sync (bool, optional): Synchronisation complète. Par défaut, `SYNC_FULL=1`.
+        stream (bool, optional): Mode streaming. Par défaut, `SYNC_STREAM=1`.
+
+    Returns:
+        bool: True si les branches demandées ont été synchronisées.
+    """
+    # Synchroniser les utilisateurs et les départements en parallèle
+    # (mode streaming page par page avec SYNC_STREAM=1)
+    results = sync_all(
+        client, engine,
+        full_sync=os.getenv('SYNC_FULL') == '1' if full_sync is None else full_sync,
+        stream=os.getenv('SYNC_STREAM') == '1' if stream is None else stream,
+        metrics=metrics,
+        hash_caches=hash_caches,
+        branches=branches,
+    )
+
+    failed = sync_failed(results)
+    if 'departments' in failed:
+        # Une erreur de l'API ou d'écriture fait échouer la synchronisation, sans être masquée
+        logging.error("Échec de la synchronisation des départements.")
+    summary = results.get('users')
+    if 'users' in failed:
+        if summary is not None and summary['failed']:
+            logging.error("Échec de la synchronisation des utilisateurs : reprise au point de contrôle au prochain passage.")
+        else:
+            logging.error("Aucun utilisateur récupéré. Vérifiez le token API et les permissions.")
+    if failed:
+        export_metrics(metrics)
+        return False
+    if summary is None:
+        # Départements seuls : 'sync_departments' a déjà journalisé ses compteurs
+        export_metrics(metrics)
+        return True
+
+    logging.info(
+        f"Utilisateurs : {summary['fetched']} récupérés, {summary['users']['inserted']} insérés, "
+        f"{summary['users']['updated']} mis à jour ; contrats : {summary['contracts']['inserted']} insérés, "
+        f"{summary['contracts']['updated']} mis à jour."
+    )
+
+    export_metrics(metrics)
+    return True
+
+
+def main(database='reflect_db.sqlite', branches=SYNC_BRANCHES, full_sync=None, stream=None):
+    # Instrumentation par étape (profilage cProfile avec SYNC_PROFILE_DIR)
+    metrics = RunMetrics(profile_dir=os.getenv('SYNC_PROFILE_DIR'))
+
+    # Ouvrir la base de données (mode WAL : les lecteurs ne sont pas bloqués pendant la synchronisation)
+    engine = create_sqlite_engine(database)
+
+    # Initialiser la base de données ou mettre à niveau son schéma
+    logging.info("Initialisation de la base de données...")
+    initialize_db(engine)
 
     # Créer une instance du client API
     try:
@@ -36,55 +107,8 @@ def main():
         logging.error(ve)
         sys.exit(1)
 
-    # Récupérer les utilisateurs depuis l'API
-    logging.info("Récupération des utilisateurs...")
-    users = client.get_users(params={
-        'fields': 'id,name,url,displayName,modifiedOn,lastName,firstName,login,mail,birthDate,department,manager,rolePrincipal,legalEntity,employeeNumber,dtContractStart,dtContractEnd,applicationData,habilitedRoles'})
-
-    if not users:
-        logging.error("Aucun utilisateur récupéré. Vérifiez le token API et les permissions.")
+    if not run_sync(client, engine, metrics, branches=branches, full_sync=full_sync, stream=stream):
         sys.exit(1)
-
-    # Traiter les données des utilisateurs
-    users_df = process_users(users)
-    users_df = transform_user_data(users_df)
-
-    # Extraire les contrats et insérer dans la base de données
-    logging.info("Extraction des contrats depuis les utilisateurs...")
-    contracts_df = process_contracts_from_users(users)
-    if not contracts_df.empty:
-        logging.info("Insertion des nouveaux contrats dans la base de données...")
-        inserted_contracts = insert_new_records(contracts_df, engine, 'contracts', id_column='user_id')
-        logging.info(f"Nouveaux contrats insérés dans la base de données.")
-    else:
-        logging.warning("Aucun contrat extrait des utilisateurs.")
-
-    # Nettoyer les données des utilisateurs en supprimant les colonnes liées aux contrats
-    users_df_cleaned = clean_user_data(users_df)
-
-    # Insérer uniquement les nouveaux utilisateurs
-    logging.info("Insertion des nouveaux utilisateurs dans la base de données...")
-    #to_csv = users_df_cleaned.to_csv('data/users.csv', index=False)
-    inserted_users = insert_new_records(users_df_cleaned, engine, 'users', id_column='id')
-    logging.info(f"Nouveaux utilisateurs insérés dans la base de données.")
-
-    # Récupérer les départements depuis l'API
-    logging.info("Récupération des départements...")
-    departments = client.get_departments(params={
-        'fields': 'id,name,code,hierarchy,parentId,isActive,position,level,sortOrder,headID,users,currentUsers,currentUsersCount',
-    })
-
-    if not departments:
-        logging.warning("Aucun département récupéré.")
-
-    # Traiter les données des départements
-    departments_df = process_departments(departments)
-    
-    # Insérer uniquement les nouveaux départements
-    logging.info("Insertion des nouveaux départements dans la base de données...")
-    inserted_departments = insert_new_records(departments_df, engine, 'departments', id_column='id')
-    logging.info(f"Nouveaux départements insérés dans la base de données.")
-
     logging.info("Terminé.")
 
 
@@ -0,0 +1,208 @@
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Renvoie le pic de mémoire résidente (RSS) du processus depuis son démarrage.
+
+    Returns:
+        Optional[int]: Pic RSS en octets, ou None si la plateforme ne le fournit pas.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sur macOS et en kilo-octets sur Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _write_atomically(path: str, content: str) -> None:
+    # Le collecteur textfile de node_exporter ne doit jamais lire un fichier partiel
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class RunMetrics:
+    """
+    Instrumentation d'une synchronisation, étape par étape.
+
+    Chaque étape mesure le temps réel, le temps CPU, les lignes en entrée et en
+    sortie, les octets téléchargés et les nouvelles tentatives HTTP, ainsi que le
+    pic RSS atteint à sa fin. Les étapes de même nom (une par page en mode
+    streaming) sont cumulées.
+
+    Les étapes pouvant s'exécuter en même temps (voir `sync.sync_all`), chacune ne
+    compte que son propre travail : le temps CPU est celui du thread qui l'exécute
+    (`time.thread_time`), plus celui des threads du pool de pages travaillant pour
+    elle, et les compteurs HTTP sont ceux des requêtes qu'elle a émises (voir
+    `LuccaAPIClient.observe_requests`). Pour un client sans `observe_requests`,
+    les compteurs HTTP sont la différence de ses compteurs `stats` partagés, exacte
+    seulement si aucune autre étape ne l'utilise en même temps. Le temps CPU des
+    processus de transformation n'est pas compté.
+    """
+
+    def __init__(self, profile_dir: Optional[str] = None):
+        self.started_at = datetime.now(timezone.utc)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Any] = {}
+        self.profile_dir = profile_dir
+        self._slowest_profile = None
+        self._slowest_wall = 0.0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None, client=None) -> Iterator[Dict[str, Any]]:
+        """
+        Mesure une étape. Le dictionnaire renvoyé permet de renseigner `rows_out`.
+
+        Args:
+            name (str): Nom de l'étape.
+            rows_in (int, optional): Nombre de lignes en entrée.
+            client (LuccaAPIClient, optional): Client dont les compteurs HTTP sont suivis.
+
+        Yields:
+            Dict[str, Any]: Mesures de l'appel en cours.
+        """
+        current = {'rows_in': rows_in, 'rows_out': None}
+        observe_requests = getattr(client, 'observe_requests', None)
+        client_stats = getattr(client, 'stats', None) if observe_requests is None else None
+        http_before = dict(client_stats) if client_stats is not None else None
+        profiler = cProfile.Profile() if self.profile_dir else None
+        observing = observe_requests(lambda counts: self._add_observed(name, counts)) if observe_requests else nullcontext()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Un autre profileur est actif (étape concurrente) : pas de profil pour celle-ci
+                profiler = None
+        try:
+            with observing:
+                yield current
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+
+            http = {}
+            if http_before is not None:
+                http = {key: client_stats.get(key, 0) - http_before.get(key, 0)
+                        for key in ('bytes_downloaded', 'retries', 'requests')}
+            with self._lock:
+                self._add(name, wall, cpu, current, http)
+                if profiler is not None and wall > self._slowest_wall:
+                    self._slowest_wall = wall
+                    self._slowest_profile = (name, profiler)
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        return self.stages.setdefault(name, {
+            'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+            'bytes_downloaded': 0, 'http_requests': 0, 'http_retries': 0, 'peak_rss_bytes': None,
+        })
+
+    def _add_observed(self, name: str, counts: Dict[str, Any]) -> None:
+        # Appelée par le client pour chaque requête de l'étape, éventuellement depuis un thread du pool de pages
+        with self._lock:
+            stage = self._entry(name)
+            stage['http_requests'] += counts.get('requests', 0)
+            stage['http_retries'] += counts.get('retries', 0)
+            stage['bytes_downloaded'] += counts.get('bytes_downloaded', 0)
+            stage['cpu_seconds'] += counts.get('cpu_seconds', 0.0)
+
+    def _add(self, name: str, wall: float, cpu: float, current: Dict[str, Any], http: Dict[str, int]) -> None:
+        stage = self._entry(name)
+        stage['calls'] += 1
+        stage['wall_seconds'] += wall
+        stage['cpu_seconds'] += cpu
+        stage['rows_in'] += current['rows_in'] or 0
+        stage['rows_out'] += current['rows_out'] or 0
+        stage['bytes_downloaded'] += http.get('bytes_downloaded', 0)
+        stage['http_requests'] += http.get('requests', 0)
+        stage['http_retries'] += http.get('retries', 0)
+        stage['peak_rss_bytes'] = peak_rss_bytes()
+
+    def report(self) -> Dict[str, Any]:
+        """Construit le rapport de la synchronisation, sérialisable en JSON."""
+        return {
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(time.perf_counter() - self._start, 6),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': self.stages,
+            'results': self.results,
+        }
+
+    def write_json(self, path: str) -> None:
+        """Écrit le rapport de la synchronisation dans un fichier JSON."""
+        _write_atomically(path, json.dumps(self.report(), indent=2, default=str))
+
+    def write_prometheus(self, path: str, prefix: str = 'reflect_sync') -> None:
+        """
+        Écrit les métriques au format texte Prometheus, pour le collecteur textfile de node_exporter.
+
+        Args:
+            path (str): Chemin du fichier `.prom`.
+            prefix (str): Préfixe des noms de métriques.
+        """
+        metrics = [
+            ('wall_seconds', 'Temps réel passé dans l\'étape'),
+            ('cpu_seconds', 'Temps CPU des threads de l\'étape'),
+            ('rows_in', 'Lignes en entrée de l\'étape'),
+            ('rows_out', 'Lignes en sortie de l\'étape'),
+            ('bytes_downloaded', 'Octets téléchargés pendant l\'étape'),
+            ('http_retries', 'Nouvelles tentatives HTTP pendant l\'étape'),
+            ('peak_rss_bytes', 'Pic RSS du processus à la fin de l\'étape'),
+        ]
+        lines = []
+        for metric, description in metrics:
+            lines.append(f'# HELP {prefix}_stage_{metric} {description}.')
+            lines.append(f'# TYPE {prefix}_stage_{metric} gauge')
+            for name, stage in self.stages.items():
+                if stage[metric] is not None:
+                    lines.append(f'{prefix}_stage_{metric}{{stage="{name}"}} {stage[metric]}')
+        lines.append(f'# HELP {prefix}_last_run_timestamp_seconds Date de fin de la dernière synchronisation.')
+        lines.append(f'# TYPE {prefix}_last_run_timestamp_seconds gauge')
+        lines.append(f'{prefix}_last_run_timestamp_seconds {time.time():.0f}')
+        _write_atomically(path, '\n'.join(lines) + '\n')
+
+    def dump_slowest_profile(self) -> Optional[str]:
+        """
+        Enregistre le profil cProfile de l'appel le plus lent, si le profilage est activé.
+
+        Returns:
+            Optional[str]: Chemin du fichier `.prof` écrit, lisible avec `pstats` ou snakeviz.
+        """
+        if self._slowest_profile is None:
+            return None
+        name, profiler = self._slowest_profile
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name.replace('[', '_').replace(']', '')}.prof")
+        profiler.dump_stats(path)
+        return path
+
+    def log_summary(self) -> None:
+        """Journalise la durée et le volume de chaque étape."""
+        for name, stage in self.stages.items():
+            logging.info(
+                f"Étape '{name}' : {stage['wall_seconds']:.2f}s (CPU {stage['cpu_seconds']:.2f}s), "
+                f"{stage['rows_in']} lignes en entrée, {stage['rows_out']} en sortie, "
+                f"{stage['bytes_downloaded']} octets téléchargés, {stage['http_retries']} nouvelles tentatives."
+            )
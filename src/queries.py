@@ -0,0 +1,183 @@
+"""
+Requêtes de lecture sur la base synchronisée, pour les outils internes.
+
+Les résultats sont conservés dans un cache LRU en mémoire, invalidé dès que la
+génération des données (table `sync_generation`, incrémentée par chaque
+écriture de la synchronisation) change : une requête ne renvoie jamais un
+résultat antérieur à la dernière synchronisation validée.
+
+Usage :
+    queries = OrgQueries(create_sqlite_engine('reflect_db.sqlite', read_only=True))
+    queries.manager_chain(42)
+"""
+from db_manager import get_sync_generation, ROW_HASH_COLUMN
+from collections import OrderedDict
+from sqlalchemy import text
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import threading
+
+# Nombre de résultats conservés par défaut dans le cache
+DEFAULT_CACHE_SIZE = 4096
+# Longueur maximale d'une chaîne hiérarchique : borne le parcours si les données contiennent un cycle
+MAX_MANAGER_DEPTH = 64
+
+
+def _user(row) -> Dict[str, Any]:
+    # L'empreinte de contenu est interne à la synchronisation
+    return {column: value for column, value in row.items() if column != ROW_HASH_COLUMN}
+
+
+class OrgQueries:
+    """
+    Consultation des utilisateurs, des départements et de la hiérarchie, avec cache.
+
+    Les utilisateurs sont renvoyés comme dictionnaires des colonnes de la table
+    `users` ; chaque appel renvoie des copies, que l'appelant peut modifier.
+    `get_user` et `manager_chain` renvoient aussi les utilisateurs marqués
+    supprimés (`deletedAt` renseigné), écartés des listes de collaborateurs et de membres.
+    La hiérarchie est parcourue par la colonne indexée `managerId` : une chaîne
+    de managers coûte une recherche par clé primaire par niveau.
+    """
+
+    def __init__(self, engine, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base (en lecture seule de préférence).
+            cache_size (int): Nombre maximal de résultats conservés.
+        """
+        if cache_size < 1:
+            raise ValueError("La taille du cache doit être positive.")
+        self.engine = engine
+        self.cache_size = cache_size
+        self.generation: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        # La génération est relue à chaque appel : une écriture validée depuis le dernier appel vide le cache
+        generation = get_sync_generation(self.engine)
+        with self._lock:
+            if generation != self.generation:
+                self._cache.clear()
+                self.generation = generation
+            elif key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            # Un résultat calculé pendant un changement de génération n'est pas conservé
+            if self.generation == generation:
+                self._cache[key] = value
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return value
+
+    def _select_users(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            return [_user(row) for row in conn.execute(text(query), params).mappings()]
+
+    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Récupère un utilisateur par son ID.
+
+        Args:
+            user_id (int): ID de l'utilisateur.
+
+        Returns:
+            Optional[Dict[str, Any]]: L'utilisateur, ou None s'il est inconnu.
+        """
+        users = self._cached(('user', user_id), lambda: self._select_users(
+            "SELECT * FROM users WHERE id = :id", {'id': user_id}
+        ))
+        return dict(users[0]) if users else None
+
+    def manager_chain(self, user_id: int, max_depth: int = MAX_MANAGER_DEPTH) -> List[Dict[str, Any]]:
+        """
+        Récupère la chaîne hiérarchique d'un utilisateur, du manager direct jusqu'au sommet.
+
+        La chaîne s'arrête à un manager absent de la base, et avant le premier
+        utilisateur qui y figure déjà (cycle dans les données).
+
+        Args:
+            user_id (int): ID de l'utilisateur.
+            max_depth (int): Nombre maximal de niveaux parcourus.
+
+        Returns:
+            List[Dict[str, Any]]: Managers, du plus proche au plus éloigné.
+        """
+        def compute():
+            chain = self._select_users(
+                "WITH RECURSIVE chain(id, depth) AS ("
+                ' SELECT "managerId", 1 FROM users WHERE id = :id AND "managerId" IS NOT NULL'
+                ' UNION ALL'
+                ' SELECT u."managerId", c.depth + 1 FROM chain c JOIN users u ON u.id = c.id'
+                ' WHERE u."managerId" IS NOT NULL AND c.depth < :max_depth'
+                ") SELECT u.* FROM chain c JOIN users u ON u.id = c.id ORDER BY c.depth",
+                {'id': user_id, 'max_depth': max_depth}
+            )
+            seen = {user_id}
+            for depth, manager in enumerate(chain):
+                if manager['id'] in seen:
+                    return chain[:depth]
+                seen.add(manager['id'])
+            return chain
+
+        return [dict(user) for user in self._cached(('manager_chain', user_id, max_depth), compute)]
+
+    def direct_reports(self, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Récupère les collaborateurs directs d'un manager.
+
+        Args:
+            user_id (int): ID du manager.
+
+        Returns:
+            List[Dict[str, Any]]: Utilisateurs dont il est le manager, par ID croissant,
+            hors utilisateurs supprimés.
+        """
+        return [dict(user) for user in self._cached(('direct_reports', user_id), lambda: self._select_users(
+            'SELECT * FROM users WHERE "managerId" = :id AND "deletedAt" IS NULL ORDER BY id', {'id': user_id}
+        ))]
+
+    def department_members(self, department_id: int, current_only: bool = True,
+                           include_subdepartments: bool = False) -> List[Dict[str, Any]]:
+        """
+        Récupère les membres d'un département.
+
+        Args:
+            department_id (int): ID du département.
+            current_only (bool): Ne retenir que les membres actuels ('currentUsers').
+            include_subdepartments (bool): Inclure les membres de tous les départements descendants.
+
+        Returns:
+            List[Dict[str, Any]]: Utilisateurs membres, par ID croissant, chacun une seule fois,
+            hors utilisateurs supprimés.
+        """
+        if include_subdepartments:
+            departments = "SELECT descendant_id FROM department_closure WHERE ancestor_id = :id"
+        else:
+            departments = ":id"
+        query = (
+            'SELECT * FROM users WHERE "deletedAt" IS NULL AND id IN ('
+            f"SELECT user_id FROM department_members WHERE department_id IN ({departments})"
+            f"{' AND is_current = 1' if current_only else ''}) ORDER BY id"
+        )
+        key = ('department_members', department_id, current_only, include_subdepartments)
+        return [dict(user) for user in self._cached(key, lambda: self._select_users(query, {'id': department_id}))]
+
+    def cache_info(self) -> Dict[str, Any]:
+        """Renvoie les compteurs du cache : succès, échecs, taille et génération des résultats conservés."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache),
+                    'max_size': self.cache_size, 'generation': self.generation}
+
+    def clear(self) -> None:
+        """Vide le cache."""
+        with self._lock:
+            self._cache.clear()
+            self.generation = None
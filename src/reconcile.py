@@ -0,0 +1,241 @@
+from api_client import LuccaAPIClient
+from db_manager import (initialize_db, create_sqlite_engine, get_live_index, mark_deleted, enqueue_refetch,
+                        get_refetch_queue, dequeue_refetch, DEFAULT_BATCH_SIZE)
+from metrics import RunMetrics
+from sync import apply_user_batch, sync_departments, USER_FIELDS, SYNC_BRANCHES
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import logging
+import os
+import sys
+
+# Champs des sondes : l'ID et la date de modification suffisent à détecter les écarts
+USER_PROBE_FIELDS = 'id,modifiedOn'
+DEPARTMENT_PROBE_FIELDS = 'id'
+# Nombre d'IDs par requête de récupération ciblée (filtre `id=1,2,...`)
+REFETCH_BATCH_SIZE = 100
+# Part maximale des lignes actives marquées supprimées par une réconciliation : au-delà,
+# une réponse anormale de l'API est plus probable qu'une suppression massive
+MAX_DELETED_RATIO = 0.5
+
+
+def diff_index(remote: Dict[int, Optional[str]], local: Dict[int, Optional[str]]) -> Tuple[List[int], List[int]]:
+    """
+    Compare l'index renvoyé par une sonde à l'index local.
+
+    Args:
+        remote (Dict[int, Optional[str]]): Date de modification par ID, selon l'API.
+        local (Dict[int, Optional[str]]): Date de modification par ID des lignes actives de la base.
+
+    Returns:
+        Tuple[List[int], List[int]]: IDs à récupérer en entier (absents de la base ou
+        modifiés) et IDs disparus de l'API, triés.
+    """
+    changed = sorted(record_id for record_id, modified_on in remote.items()
+                     if record_id not in local or local[record_id] != modified_on)
+    deleted = sorted(local.keys() - remote.keys())
+    return changed, deleted
+
+
+def _mark_deleted(engine, table: str, deleted: List[int], live: int, max_deleted_ratio: float) -> Optional[int]:
+    # None si la part des suppressions dépasse le seuil : rien n'est marqué
+    if deleted and len(deleted) > max_deleted_ratio * live:
+        logging.error(
+            f"Table '{table}' : {len(deleted)} lignes sur {live} absentes de l'API, au-delà du seuil de "
+            f"{max_deleted_ratio:.0%}. Aucune suppression n'est marquée."
+        )
+        return None
+    return mark_deleted(engine, table, deleted, batch_size=int(os.getenv('SYNC_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+
+
+def reconcile_users(client, engine, metrics: Optional[RunMetrics] = None,
+                    hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None,
+                    max_deleted_ratio: float = MAX_DELETED_RATIO,
+                    refetch_batch_size: int = REFETCH_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Réconcilie la table 'users' avec l'API à l'aide d'une sonde `id,modifiedOn`.
+
+    La sonde parcourt tous les utilisateurs (anciens collaborateurs compris) en ne
+    demandant que leur ID et leur date de modification. Les utilisateurs absents
+    de l'API sont marqués supprimés (`deletedAt`) ; ceux qui manquent dans la base
+    ou dont la date diffère sont placés dans la file `reconcile_queue`, puis
+    récupérés en entier par lots d'IDs et écrits comme lors d'une synchronisation.
+    La file est persistante : les IDs restant après une erreur sont repris à la
+    réconciliation suivante. Une sonde interrompue ne marque aucune suppression.
+
+    Args:
+        client (LuccaAPIClient): Le client de l'API Lucca.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        metrics (RunMetrics, optional): Instrumentation de la réconciliation.
+        hash_caches (Dict[str, Dict[tuple, str]], optional): Empreintes déjà connues, par table.
+        max_deleted_ratio (float): Part maximale des utilisateurs actifs marqués supprimés.
+        refetch_batch_size (int): Nombre d'IDs par requête de récupération.
+
+    Returns:
+        Dict[str, Any]: Utilisateurs sondés ('probed'), marqués supprimés ('deleted'), mis en file
+        ('queued'), récupérés ('refetched'), restant en file ('remaining') et 'failed'.
+    """
+    metrics = metrics or RunMetrics()
+    summary = {'probed': 0, 'deleted': 0, 'queued': 0, 'refetched': 0, 'remaining': 0, 'failed': False}
+    metrics.results['reconcile:users'] = summary
+
+    try:
+        with metrics.stage('probe_users', client=client) as stage:
+            remote = {
+                user['id']: user.get('modifiedOn')
+                for page in client.iter_user_pages(params={'fields': USER_PROBE_FIELDS}) for user in page
+            }
+            stage['rows_out'] = summary['probed'] = len(remote)
+    except Exception as err:
+        logging.error(f"Erreur lors de la sonde des utilisateurs : {err}")
+        summary['failed'] = True
+        return summary
+
+    local = get_live_index(engine, 'users', 'modifiedOn')
+    changed, deleted = diff_index(remote, local)
+    marked = _mark_deleted(engine, 'users', deleted, len(local), max_deleted_ratio)
+    if marked is None:
+        summary['failed'] = True
+    else:
+        summary['deleted'] = marked
+    enqueue_refetch(engine, 'users', changed)
+    summary['queued'] = len(changed)
+    logging.info(f"Utilisateurs : {len(remote)} sondés, {summary['deleted']} marqués supprimés, "
+                 f"{len(changed)} à récupérer.")
+
+    queue = get_refetch_queue(engine, 'users')
+    for start in range(0, len(queue), refetch_batch_size):
+        ids = queue[start:start + refetch_batch_size]
+        try:
+            with metrics.stage('refetch_users', client=client) as stage:
+                params = {'fields': USER_FIELDS, 'id': ','.join(str(record_id) for record_id in ids)}
+                users = [user for page in client.iter_user_pages(params=params) for user in page]
+                stage['rows_out'] = len(users)
+        except Exception as err:
+            logging.error(f"Erreur lors de la récupération des utilisateurs en file : {err}")
+            summary['failed'] = True
+            break
+        if users and apply_user_batch(users, engine, metrics=metrics, hash_caches=hash_caches) is None:
+            summary['failed'] = True
+            break
+        # Un ID absent de la réponse a disparu depuis la sonde : la prochaine sonde le marquera
+        dequeue_refetch(engine, 'users', ids)
+        summary['refetched'] += len(users)
+
+    summary['remaining'] = len(get_refetch_queue(engine, 'users'))
+    return summary
+
+
+def reconcile_departments(client, engine, metrics: Optional[RunMetrics] = None,
+                          hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None,
+                          max_deleted_ratio: float = MAX_DELETED_RATIO) -> Dict[str, Any]:
+    """
+    Réconcilie la table 'departments' avec l'API à l'aide d'une sonde `id`.
+
+    Les départements n'ayant pas de date de modification, seuls les départements
+    disparus (marqués supprimés) et nouveaux sont détectés. Un département nouveau
+    déclenche une synchronisation complète des départements, seule à même de
+    recalculer l'arborescence.
+
+    Args:
+        client (LuccaAPIClient): Le client de l'API Lucca.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        metrics (RunMetrics, optional): Instrumentation de la réconciliation.
+        hash_caches (Dict[str, Dict[tuple, str]], optional): Empreintes déjà connues, par table.
+        max_deleted_ratio (float): Part maximale des départements actifs marqués supprimés.
+
+    Returns:
+        Dict[str, Any]: Départements sondés ('probed'), marqués supprimés ('deleted'),
+        nouveaux ('queued'), insérés ou mis à jour par la synchronisation ('written') et 'failed'.
+    """
+    metrics = metrics or RunMetrics()
+    summary = {'probed': 0, 'deleted': 0, 'queued': 0, 'written': 0, 'failed': False}
+    metrics.results['reconcile:departments'] = summary
+
+    try:
+        with metrics.stage('probe_departments', client=client) as stage:
+            remote = {department['id']: None
+                      for page in client.iter_department_pages(params={'fields': DEPARTMENT_PROBE_FIELDS})
+                      for department in page}
+            stage['rows_out'] = summary['probed'] = len(remote)
+    except Exception as err:
+        logging.error(f"Erreur lors de la sonde des départements : {err}")
+        summary['failed'] = True
+        return summary
+
+    local = get_live_index(engine, 'departments')
+    changed, deleted = diff_index(remote, local)
+    marked = _mark_deleted(engine, 'departments', deleted, len(local), max_deleted_ratio)
+    if marked is None:
+        summary['failed'] = True
+    else:
+        summary['deleted'] = marked
+    summary['queued'] = len(changed)
+    logging.info(f"Départements : {len(remote)} sondés, {summary['deleted']} marqués supprimés, "
+                 f"{len(changed)} nouveaux.")
+
+    if changed:
+        try:
+            counts = sync_departments(client, engine, metrics=metrics, hash_caches=hash_caches)
+        except Exception as err:
+            logging.error(f"Erreur lors de la récupération des départements : {err}")
+            counts = None
+        if counts is None:
+            summary['failed'] = True
+        else:
+            summary['written'] = counts['inserted'] + counts['updated']
+    return summary
+
+
+def reconcile_all(client, engine, metrics: Optional[RunMetrics] = None,
+                  hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None,
+                  branches: Sequence[str] = SYNC_BRANCHES,
+                  max_deleted_ratio: float = MAX_DELETED_RATIO) -> Dict[str, Dict[str, Any]]:
+    """
+    Réconcilie les branches demandées, l'une après l'autre.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Résultat de chaque branche (voir `reconcile_users`, `reconcile_departments`).
+    """
+    unknown = set(branches) - set(SYNC_BRANCHES)
+    if unknown:
+        raise ValueError(f"Branches inconnues : {', '.join(sorted(unknown))}.")
+    metrics = metrics or RunMetrics()
+    results = {}
+    # Les départements d'abord : un utilisateur peut référencer un département nouveau
+    if 'departments' in branches:
+        results['departments'] = reconcile_departments(client, engine, metrics, hash_caches, max_deleted_ratio)
+    if 'users' in branches:
+        results['users'] = reconcile_users(client, engine, metrics, hash_caches, max_deleted_ratio)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Réconcilie la base avec l'API : suppressions et écarts détectés par des sondes d'IDs.")
+    parser.add_argument('branch', nargs='?', choices=['all', *SYNC_BRANCHES], default='all')
+    parser.add_argument('--database', default='reflect_db.sqlite', help="Base SQLite à réconcilier.")
+    parser.add_argument('--max-deleted-ratio', type=float, default=MAX_DELETED_RATIO,
+                        help="Part maximale des lignes actives marquées supprimées.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+    metrics = RunMetrics(profile_dir=os.getenv('SYNC_PROFILE_DIR'))
+    engine = create_sqlite_engine(args.database)
+    initialize_db(engine)
+    try:
+        client = LuccaAPIClient()
+    except ValueError as err:
+        logging.error(err)
+        sys.exit(1)
+
+    branches = SYNC_BRANCHES if args.branch == 'all' else (args.branch,)
+    results = reconcile_all(client, engine, metrics, branches=branches, max_deleted_ratio=args.max_deleted_ratio)
+    metrics.log_summary()
+    if any(summary['failed'] for summary in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+from data_processor import (process_users, process_departments, process_contracts_from_users, transform_user_data,
+                            transform_users, clean_user_data, compute_watermark, process_user_roles,
+                            process_department_members, compute_department_closure, PARALLEL_MIN_ROWS)
+from db_manager import (upsert_records, replace_links, write_department_closure, get_sync_watermark, set_sync_watermark,
+                        get_checkpoint, save_checkpoint, clear_checkpoint, restore_deleted, DEFAULT_BATCH_SIZE)
+from metrics import RunMetrics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+import logging
+import os
+
+# Champs demandés à l'API Lucca
+USER_FIELDS = 'id,name,url,displayName,modifiedOn,lastName,firstName,login,mail,birthDate,department,manager,rolePrincipal,legalEntity,employeeNumber,dtContractStart,dtContractEnd,applicationData,habilitedRoles'
+DEPARTMENT_FIELDS = 'id,name,code,hierarchy,parentId,isActive,position,level,sortOrder,headID,users,currentUsers,currentUsersCount'
+# Branches synchronisées par `sync_all`
+SYNC_BRANCHES = ('users', 'departments')
+# Tri des utilisateurs : l'ID croissant sert de clé de reprise après une interruption
+USER_ORDER_BY = 'id,asc'
+# Marge (en secondes) retranchée de l'heure de début d'une synchronisation pour plafonner le
+# high-water mark : un utilisateur modifié pendant le parcours des pages, ou daté par une
+# horloge serveur en avance, est de nouveau demandé au passage suivant
+WATERMARK_MARGIN_SECONDS = 300
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+
+def _add_counts(total: Dict[str, int], counts: Optional[Dict[str, int]]) -> None:
+    for key, value in (counts or {}).items():
+        total[key] += value
+
+
+def cap_watermark(watermark: Optional[str], started_at: datetime) -> Optional[str]:
+    """
+    Plafonne un high-water mark à l'heure de début de la synchronisation, moins la marge de sécurité.
+
+    Le plus grand `modifiedOn` reçu ne garantit pas que les pages déjà parcourues
+    sont à jour : un utilisateur modifié après la récupération de sa page a une
+    date antérieure à celles des pages suivantes, et serait sinon écarté par le
+    filtre `modifiedOn=since,...` des passages suivants.
+
+    Args:
+        watermark (str, optional): Plus grand `modifiedOn` validé.
+        started_at (datetime): Heure de début de la synchronisation (UTC).
+
+    Returns:
+        Optional[str]: Le high-water mark à enregistrer.
+    """
+    if not watermark:
+        return watermark
+    ceiling = started_at - timedelta(seconds=int(os.getenv('SYNC_WATERMARK_MARGIN', WATERMARK_MARGIN_SECONDS)))
+    if datetime.fromisoformat(watermark) <= ceiling:
+        return watermark
+    return ceiling.isoformat()
+
+
+def restore_records(engine, table, ids, metrics: Optional[RunMetrics] = None):
+    """
+    Retire la marque de suppression des enregistrements de nouveau renvoyés par l'API.
+
+    Returns:
+        int: Nombre d'enregistrements restaurés, ou None en cas d'erreur.
+    """
+    metrics = metrics or RunMetrics()
+    batch_size = int(os.getenv('SYNC_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    try:
+        with metrics.stage(f'restore_deleted[{table}]', rows_in=len(ids)) as stage:
+            restored = stage['rows_out'] = restore_deleted(engine, table, ids, batch_size=batch_size)
+    except Exception as e:
+        logging.error(f"Erreur lors de la restauration des enregistrements de la table '{table}': {e}")
+        return None
+    if restored:
+        logging.info(f"Table '{table}' : {restored} enregistrements supprimés restaurés.")
+    return restored
+
+
+def _transform_settings() -> Dict[str, int]:
+    # Nombre de processus de transformation (1 : transformation en série) et taille minimale d'un lot parallélisé
+    return {
+        'workers': int(os.getenv('SYNC_TRANSFORM_WORKERS', 1)),
+        'min_rows': int(os.getenv('SYNC_PARALLEL_MIN_ROWS', PARALLEL_MIN_ROWS)),
+    }
+
+
+def _run(writer: Optional[ThreadPoolExecutor], func: Callable, *args, **kwargs):
+    # Exécute `func` sur le thread d'écriture s'il existe, sinon sur le thread courant
+    if writer is None:
+        return func(*args, **kwargs)
+    return writer.submit(func, *args, **kwargs).result()
+
+
+def write_records(df, engine, table, key_column='id', metrics: Optional[RunMetrics] = None,
+                  history_table: Optional[str] = None, hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None):
+    """
+    Applique les enregistrements dans la table (insertion ou mise à jour) et journalise les compteurs.
+
+    `hash_caches` conserve, table par table, les empreintes déjà connues d'un
+    processus de longue durée (voir `upsert_records`).
+
+    Returns:
+        dict: Compteurs 'inserted', 'updated' et 'unchanged', ou None en cas d'erreur.
+    """
+    metrics = metrics or RunMetrics()
+    batch_size = int(os.getenv('SYNC_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    try:
+        with metrics.stage(f'insert_new_records[{table}]', rows_in=len(df)) as stage:
+            counts = upsert_records(df, engine, table, key_columns=[key_column], batch_size=batch_size,
+                                    history_table=history_table,
+                                    hash_cache=hash_caches.setdefault(table, {}) if hash_caches is not None else None)
+            stage['rows_out'] = counts['inserted'] + counts['updated']
+    except Exception as e:
+        logging.error(f"Erreur lors de l'écriture dans la table '{table}': {e}")
+        return None
+    logging.info(
+        f"Table '{table}' : {counts['inserted']} insérés, {counts['updated']} mis à jour, "
+        f"{counts['unchanged']} inchangés."
+    )
+    return counts
+
+
+def write_links(df, engine, table, owner_column, owner_ids, metrics: Optional[RunMetrics] = None):
+    """
+    Remplace les liens des propriétaires synchronisés dans une table de liaison et journalise les compteurs.
+
+    Returns:
+        dict: Compteurs 'deleted' et 'inserted', ou None en cas d'erreur.
+    """
+    metrics = metrics or RunMetrics()
+    batch_size = int(os.getenv('SYNC_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    try:
+        with metrics.stage(f'replace_links[{table}]', rows_in=len(df)) as stage:
+            counts = replace_links(df, engine, table, owner_column, owner_ids, batch_size=batch_size)
+            stage['rows_out'] = counts['inserted']
+    except Exception as e:
+        logging.error(f"Erreur lors de l'écriture dans la table '{table}': {e}")
+        return None
+    logging.info(f"Table '{table}' : {counts['inserted']} liens écrits, {counts['deleted']} supprimés.")
+    return counts
+
+
+def apply_user_batch(users: List[Dict[str, Any]], engine, metrics: Optional[RunMetrics] = None,
+                     hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Transforme un lot d'utilisateurs bruts et l'écrit dans les tables 'contracts' et 'users',
+    ainsi que leurs rôles dans les tables 'roles' et 'user_roles'.
+
+    Args:
+        users (List[Dict[str, Any]]): Utilisateurs tels que renvoyés par l'API.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        metrics (RunMetrics, optional): Instrumentation de la synchronisation.
+        hash_caches (Dict[str, Dict[tuple, str]], optional): Empreintes déjà connues, par table.
+
+    Returns:
+        Optional[Dict[str, Any]]: Compteurs 'users' et 'contracts' et high-water mark du lot,
+        ou None si une écriture a échoué.
+    """
+    metrics = metrics or RunMetrics()
+    settings = _transform_settings()
+
+    if settings['workers'] > 1 and len(users) >= settings['min_rows']:
+        # Gros lot : utilisateurs et contrats transformés ensemble, par blocs, dans un pool de processus
+        with metrics.stage('transform_user_data', rows_in=len(users)) as stage:
+            users_df, contracts_df = transform_users(users, **settings)
+            stage['rows_out'] = len(users_df)
+    else:
+        # Traiter les données des utilisateurs
+        with metrics.stage('transform_user_data', rows_in=len(users)) as stage:
+            users_df = process_users(users)
+            users_df = transform_user_data(users_df)
+            stage['rows_out'] = len(users_df)
+
+        # Extraire les contrats
+        with metrics.stage('process_contracts_from_users', rows_in=len(users)) as stage:
+            contracts_df = process_contracts_from_users(users)
+            stage['rows_out'] = len(contracts_df)
+
+    # Insérer les contrats dans la base de données
+    contract_counts = _empty_counts()
+    if not contracts_df.empty:
+        # Chaque contrat nouveau ou modifié ouvre une version dans 'contract_history'
+        contract_counts = write_records(contracts_df, engine, 'contracts', key_column='user_id', metrics=metrics,
+                                        history_table='contract_history', hash_caches=hash_caches)
+    else:
+        logging.warning("Aucun contrat extrait des utilisateurs.")
+
+    # Nettoyer les données des utilisateurs en supprimant les colonnes liées aux contrats
+    users_df_cleaned = clean_user_data(users_df)
+
+    # Insérer les nouveaux utilisateurs et mettre à jour ceux qui ont changé
+    user_counts = write_records(users_df_cleaned, engine, 'users', key_column='id', metrics=metrics,
+                                hash_caches=hash_caches)
+
+    # Remplacer les rôles des utilisateurs du lot dans la table de liaison, par ID
+    with metrics.stage('process_user_roles', rows_in=len(users)) as stage:
+        user_roles_df, roles_df = process_user_roles(users)
+        stage['rows_out'] = len(user_roles_df)
+    role_counts = write_records(roles_df, engine, 'roles', key_column='id', metrics=metrics) if not roles_df.empty else _empty_counts()
+    link_counts = write_links(user_roles_df, engine, 'user_roles', 'user_id',
+                              [user.get('id') for user in users], metrics=metrics)
+    restored = restore_records(engine, 'users', [user.get('id') for user in users], metrics=metrics)
+
+    if contract_counts is None or user_counts is None or role_counts is None or link_counts is None or restored is None:
+        return None
+    return {
+        'users': user_counts,
+        'contracts': contract_counts,
+        'watermark': compute_watermark(users_df_cleaned),
+    }
+
+
+def _timed_pages(pages: Iterable[List[Dict[str, Any]]], metrics: RunMetrics, client) -> Iterator[List[Dict[str, Any]]]:
+    """Mesure l'attente de chaque page comme une étape 'get_users'."""
+    iterator = iter(pages)
+    while True:
+        with metrics.stage('get_users', client=client) as stage:
+            try:
+                page = next(iterator)
+            except StopIteration:
+                return
+            stage['rows_out'] = len(page)
+        yield page
+
+
+def sync_users(client, engine, full_sync: bool = False, stream: bool = False,
+               metrics: Optional[RunMetrics] = None, writer: Optional[ThreadPoolExecutor] = None,
+               hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None) -> Dict[str, Any]:
+    """
+    Synchronise les utilisateurs modifiés depuis le dernier high-water mark.
+
+    En mode streaming, chaque page de l'API est transformée et écrite dès sa
+    réception puis libérée : la mémoire est bornée par la taille de page, et
+    les pages suivantes se téléchargent pendant l'écriture de la page courante.
+
+    Les utilisateurs sont parcourus par ID croissant. Après chaque écriture
+    validée, un point de contrôle (`sync_checkpoints`) enregistre le plus grand
+    ID écrit. Une synchronisation interrompue (erreur de l'API, échec d'écriture,
+    arrêt du processus) reprend au passage suivant après cet ID (`id=greaterthan,...`),
+    tant que son filtre `modifiedOn` est le même : contrairement à un offset, la
+    clé de reprise ne se décale pas si des utilisateurs sont modifiés entre-temps.
+    Ceux-ci, déjà parcourus, sont rattrapés au passage suivant, le high-water mark
+    restant plafonné au début du passage interrompu. Une page rejouée après un
+    arrêt entre son écriture et son point de contrôle est réécrite sans effet,
+    les écritures étant idempotentes par clé.
+
+    Args:
+        client (LuccaAPIClient): Le client de l'API Lucca.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        full_sync (bool): Ignorer le high-water mark et tout récupérer.
+        stream (bool): Traiter les utilisateurs page par page.
+        metrics (RunMetrics, optional): Instrumentation de la synchronisation.
+        writer (ThreadPoolExecutor, optional): Thread unique chargé des transformations et des écritures.
+        hash_caches (Dict[str, Dict[tuple, str]], optional): Empreintes déjà connues, par table.
+
+    Returns:
+        Dict[str, Any]: Résumé de la synchronisation : nombre d'utilisateurs récupérés,
+        compteurs d'écriture, high-water marks précédent et nouveau, nombre d'utilisateurs
+        validés avant la reprise, échec éventuel.
+    """
+    metrics = metrics or RunMetrics()
+    started_at = datetime.now(timezone.utc)
+
+    # Synchronisation incrémentale : ne demander que les utilisateurs modifiés depuis le dernier passage
+    params = {'fields': USER_FIELDS, 'orderBy': USER_ORDER_BY}
+    watermark = None if full_sync else get_sync_watermark(engine, 'users')
+    if watermark:
+        logging.info(f"Synchronisation incrémentale des utilisateurs modifiés depuis {watermark}...")
+        params['modifiedOn'] = f'since,{watermark}'
+
+    summary = {
+        'fetched': 0,
+        'users': _empty_counts(),
+        'contracts': _empty_counts(),
+        'previous_watermark': watermark,
+        'watermark': None,
+        'resumed_from': 0,
+        'failed': False,
+    }
+
+    # Reprendre après le dernier utilisateur validé d'une synchronisation interrompue de même filtre
+    offset, last_id, latest = 0, None, None
+    checkpoint = _run(writer, get_checkpoint, engine, 'users')
+    if checkpoint is not None and checkpoint['since'] == watermark:
+        offset, last_id, latest = checkpoint['next_offset'], checkpoint['last_id'], checkpoint['watermark']
+        if checkpoint['started_at']:
+            started_at = datetime.fromisoformat(checkpoint['started_at'])
+        summary['resumed_from'] = offset
+        if last_id is not None:
+            params['id'] = f'greaterthan,{last_id}'
+            logging.info(f"Reprise de la synchronisation des utilisateurs après l'ID {last_id} "
+                         f"(interrompue à l'étape '{checkpoint['stage']}').")
+
+    def save(stage: str) -> None:
+        _run(writer, save_checkpoint, engine, 'users', watermark, offset, latest, stage,
+             last_id=last_id, started_at=started_at.isoformat())
+
+    def commit(users: List[Dict[str, Any]]) -> bool:
+        # Écrit un lot puis avance le point de contrôle
+        nonlocal offset, last_id, latest
+        result = _run(writer, apply_user_batch, users, engine, metrics=metrics, hash_caches=hash_caches)
+        if result is None:
+            return False
+        _add_counts(summary['users'], result['users'])
+        _add_counts(summary['contracts'], result['contracts'])
+        if result['watermark'] and (latest is None or result['watermark'] > latest):
+            latest = result['watermark']
+        offset += len(users)
+        last_id = max([last_id or 0, *(user['id'] for user in users)])
+        save('running')
+        return True
+
+    # Récupérer les utilisateurs depuis l'API ; les erreurs sont propagées, jamais converties en liste vide
+    logging.info("Récupération des utilisateurs...")
+    failed_stage = None
+    buffered: List[Dict[str, Any]] = []
+    try:
+        for users in _timed_pages(client.iter_user_pages(params=params), metrics, client):
+            summary['fetched'] += len(users)
+            if not stream:
+                buffered.extend(users)
+                continue
+            if users and not commit(users):
+                failed_stage = 'write'
+                break
+            logging.info(f"{summary['fetched']} utilisateurs traités...")
+    except Exception as err:
+        logging.error(f'Erreur lors de la récupération des utilisateurs : {err}')
+        failed_stage = 'fetch'
+
+    # Hors streaming, les pages reçues avant une erreur de l'API sont tout de même écrites
+    if buffered and not commit(buffered):
+        failed_stage = 'write'
+    del buffered
+
+    if failed_stage is not None:
+        summary['failed'] = True
+        # Le point de contrôle conserve la progression validée pour le passage suivant
+        save(failed_stage)
+        logging.error(f"Synchronisation des utilisateurs interrompue après {offset} utilisateurs validés "
+                      f"(étape '{failed_stage}').")
+    elif summary['fetched'] == 0 and not summary['resumed_from']:
+        logging.info("Aucun utilisateur modifié depuis la dernière synchronisation.")
+
+    # Avancer le high-water mark une fois toutes les modifications appliquées, sans dépasser le début du passage
+    if failed_stage is None:
+        latest = cap_watermark(latest, started_at)
+        if latest:
+            _run(writer, set_sync_watermark, engine, 'users', latest)
+            summary['watermark'] = latest
+            logging.info(f"High-water mark des utilisateurs : {latest}")
+        _run(writer, clear_checkpoint, engine, 'users')
+
+    metrics.results['users'] = summary
+    return summary
+
+
+def _write_departments(departments: List[Dict[str, Any]], engine, metrics: RunMetrics,
+                       hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None) -> Optional[Dict[str, int]]:
+    # Traiter les données des départements
+    with metrics.stage('process_departments', rows_in=len(departments)) as stage:
+        departments_df = process_departments(departments, **_transform_settings())
+        stage['rows_out'] = len(departments_df)
+
+    # Insérer les nouveaux départements et mettre à jour ceux qui ont changé
+    logging.info("Insertion des départements dans la base de données...")
+    counts = write_records(departments_df, engine, 'departments', key_column='id', metrics=metrics,
+                           hash_caches=hash_caches)
+    if counts is None or restore_records(engine, 'departments', [department.get('id') for department in departments],
+                                         metrics=metrics) is None:
+        return None
+
+    # Remplacer les membres des départements dans la table de liaison, par ID
+    with metrics.stage('process_department_members', rows_in=len(departments)) as stage:
+        members_df = process_department_members(departments)
+        stage['rows_out'] = len(members_df)
+    if write_links(members_df, engine, 'department_members', 'department_id',
+                   [department.get('id') for department in departments], metrics=metrics) is None:
+        return None
+
+    # Mettre à jour la table de fermeture de l'arborescence (seules les paires modifiées sont écrites)
+    try:
+        with metrics.stage('department_closure', rows_in=len(departments)) as stage:
+            closure_counts = write_department_closure(compute_department_closure(departments), engine)
+            stage['rows_out'] = closure_counts['inserted'] + closure_counts['updated']
+        logging.info(
+            f"Table 'department_closure' : {closure_counts['inserted']} insérés, "
+            f"{closure_counts['updated']} mis à jour, {closure_counts['deleted']} supprimés."
+        )
+    except Exception as e:
+        logging.error(f"Erreur lors de l'écriture dans la table 'department_closure': {e}")
+        return None
+    return counts
+
+
+def sync_departments(client, engine, metrics: Optional[RunMetrics] = None,
+                     writer: Optional[ThreadPoolExecutor] = None,
+                     hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None) -> Optional[Dict[str, int]]:
+    """
+    Synchronise les départements.
+
+    Les erreurs de l'API sont propagées à l'appelant (voir `sync_all`).
+
+    Args:
+        client (LuccaAPIClient): Le client de l'API Lucca.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        metrics (RunMetrics, optional): Instrumentation de la synchronisation.
+        writer (ThreadPoolExecutor, optional): Thread unique chargé des transformations et des écritures.
+        hash_caches (Dict[str, Dict[tuple, str]], optional): Empreintes déjà connues, par table.
+
+    Returns:
+        Optional[Dict[str, int]]: Compteurs d'écriture, ou None si une écriture a échoué.
+    """
+    metrics = metrics or RunMetrics()
+
+    # Récupérer les départements depuis l'API
+    logging.info("Récupération des départements...")
+    with metrics.stage('get_departments', client=client) as stage:
+        departments = [department for page in client.iter_department_pages(params={'fields': DEPARTMENT_FIELDS})
+                       for department in page]
+        stage['rows_out'] = len(departments)
+
+    if not departments:
+        logging.warning("Aucun département récupéré.")
+        metrics.results['departments'] = _empty_counts()
+        return metrics.results['departments']
+
+    counts = _run(writer, _write_departments, departments, engine, metrics, hash_caches)
+    metrics.results['departments'] = counts
+    return counts
+
+
+def sync_failed(results: Dict[str, Any]) -> List[str]:
+    """
+    Liste les branches en échec d'un résultat de `sync_all`.
+
+    Une branche est en échec si elle a levé une erreur (résultat None). Les
+    utilisateurs le sont aussi si leur synchronisation a été interrompue, ou si
+    une première synchronisation (sans high-water mark ni reprise) n'a récupéré
+    aucun utilisateur : le token ou les permissions sont alors invalides.
+
+    Args:
+        results (Dict[str, Any]): Résultats de `sync_all`, par branche.
+
+    Returns:
+        List[str]: Branches en échec, triées.
+    """
+    failed = {branch for branch, result in results.items() if result is None}
+    users = results.get('users')
+    if users is not None and (users['failed'] or (users['fetched'] == 0 and not users['previous_watermark']
+                                                  and not users['resumed_from'])):
+        failed.add('users')
+    return sorted(failed)
+
+
+def sync_all(client, engine, full_sync: bool = False, stream: bool = False,
+             metrics: Optional[RunMetrics] = None,
+             hash_caches: Optional[Dict[str, Dict[tuple, str]]] = None,
+             branches: Sequence[str] = SYNC_BRANCHES) -> Dict[str, Any]:
+    """
+    Synchronise les utilisateurs et les départements en parallèle.
+
+    Chaque endpoint est récupéré dans son propre thread, de sorte que le
+    téléchargement des départements n'attend plus l'écriture des utilisateurs.
+    Les transformations et les écritures SQLite passent par un thread d'écriture
+    unique, qui les sérialise. L'échec d'une branche n'interrompt pas l'autre.
+
+    Args:
+        client (LuccaAPIClient): Le client de l'API Lucca.
+        engine (sqlalchemy.Engine): L'engine SQLAlchemy connecté à la base de données.
+        full_sync (bool): Ignorer le high-water mark et tout récupérer.
+        stream (bool): Traiter les utilisateurs page par page.
+        metrics (RunMetrics, optional): Instrumentation de la synchronisation.
+        hash_caches (Dict[str, Dict[tuple, str]], optional): Empreintes déjà connues, par table,
+            conservées d'une synchronisation à l'autre (voir `daemon.py`).
+        branches (Sequence[str]): Branches à synchroniser, parmi `SYNC_BRANCHES`.
+
+    Returns:
+        Dict[str, Any]: Résultats 'users' (voir `sync_users`) et 'departments'
+        (voir `sync_departments`) des branches synchronisées, None pour une branche en erreur.
+    """
+    unknown = set(branches) - set(SYNC_BRANCHES)
+    if unknown:
+        raise ValueError(f"Branches inconnues : {', '.join(sorted(unknown))}.")
+    metrics = metrics or RunMetrics()
+    results = {}
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='writer') as writer, \
+            ThreadPoolExecutor(max_workers=2, thread_name_prefix='sync') as pool:
+        futures = {}
+        if 'users' in branches:
+            futures['users'] = pool.submit(sync_users, client, engine, full_sync=full_sync, stream=stream,
+                                           metrics=metrics, writer=writer, hash_caches=hash_caches)
+        if 'departments' in branches:
+            futures['departments'] = pool.submit(sync_departments, client, engine, metrics=metrics, writer=writer,
+                                                 hash_caches=hash_caches)
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as err:
+                logging.error(f"Erreur lors de la synchronisation de '{name}' : {err}")
+                results[name] = None
+    return results
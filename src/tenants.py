@@ -0,0 +1,225 @@
+from api_client import LuccaAPIClient, RateLimiter, DEFAULT_RATE
+from db_manager import initialize_db, create_sqlite_engine
+from metrics import RunMetrics
+from sync import sync_all, sync_failed
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+# Nombre minimal de tenants synchronisés simultanément par défaut
+DEFAULT_MAX_PROCESSES = 4
+
+# Options d'un tenant reconnues dans le manifeste, avec leur valeur par défaut
+TENANT_DEFAULTS = {
+    'api_url': None,
+    'token': None,
+    'token_env': None,
+    'database': None,
+    'max_workers': None,
+    'page_size': None,
+    'rate_limit': DEFAULT_RATE,
+    'full_sync': False,
+    'stream': False,
+}
+
+
+def load_manifest(path: str, db_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Charge le manifeste des tenants à synchroniser.
+
+    Le manifeste est un fichier JSON contenant une liste `tenants`. Chaque tenant
+    a un `name` unique et une `api_url` ; son token est lu dans la variable
+    d'environnement `token_env` (à privilégier) ou directement dans `token`.
+    `database` vaut par défaut `<name>.sqlite` dans `db_dir`. `max_workers`,
+    `page_size` et `rate_limit` fixent le budget de concurrence et de débit du tenant.
+
+    Args:
+        path (str): Chemin du manifeste.
+        db_dir (str, optional): Répertoire des bases de données. Par défaut, celui du manifeste.
+
+    Returns:
+        List[Dict[str, Any]]: Configuration complète de chaque tenant.
+
+    Raises:
+        ValueError: Si le manifeste est invalide.
+    """
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    db_dir = db_dir or os.path.dirname(os.path.abspath(path))
+
+    tenants = []
+    names = set()
+    for entry in manifest.get('tenants', []):
+        name = entry.get('name')
+        if not name:
+            raise ValueError("Chaque tenant du manifeste doit avoir un 'name'.")
+        if name in names:
+            raise ValueError(f"Tenant '{name}' déclaré plusieurs fois dans le manifeste.")
+        unknown = set(entry) - set(TENANT_DEFAULTS) - {'name'}
+        if unknown:
+            raise ValueError(f"Options inconnues pour le tenant '{name}' : {', '.join(sorted(unknown))}.")
+        if not entry.get('api_url'):
+            raise ValueError(f"Le tenant '{name}' n'a pas d'api_url.")
+        names.add(name)
+
+        tenant = {'name': name, **TENANT_DEFAULTS, **entry}
+        tenant['database'] = os.path.join(db_dir, tenant['database'] or f'{name}.sqlite')
+        tenants.append(tenant)
+
+    if not tenants:
+        raise ValueError(f"Aucun tenant déclaré dans le manifeste {path}.")
+    return tenants
+
+
+def sync_tenant(tenant: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Synchronise un tenant dans sa propre base de données.
+
+    Args:
+        tenant (Dict[str, Any]): Configuration du tenant (voir `load_manifest`).
+
+    Returns:
+        Dict[str, Any]: Rapport du tenant : statut ('ok' ou 'failed'), erreur éventuelle,
+        résultats de la synchronisation et mesures par étape.
+    """
+    report = {'tenant': tenant['name'], 'database': tenant['database'], 'status': 'ok', 'error': None}
+    start = time.perf_counter()
+    metrics = RunMetrics()
+    try:
+        token = tenant['token'] or (os.getenv(tenant['token_env']) if tenant['token_env'] else None)
+        if not token:
+            # Pas de repli sur LUCCA_API_TOKEN : un tenant ne doit jamais utiliser le token d'un autre
+            raise ValueError("Le token API du tenant est manquant.")
+        client = LuccaAPIClient(
+            base_url=tenant['api_url'],
+            api_token=token,
+            page_size=tenant['page_size'],
+            max_workers=tenant['max_workers'],
+            rate_limiter=RateLimiter(rate=float(tenant['rate_limit'])),
+        )
+        engine = create_sqlite_engine(tenant['database'])
+        initialize_db(engine)
+        results = sync_all(client, engine, full_sync=tenant['full_sync'], stream=tenant['stream'], metrics=metrics)
+
+        failed = sync_failed(results)
+        if failed:
+            report['status'] = 'failed'
+            report['error'] = f"Échec de la synchronisation : {', '.join(failed)}"
+    except Exception as err:
+        logging.error(f"Erreur lors de la synchronisation du tenant : {err}")
+        report['status'] = 'failed'
+        report['error'] = str(err)
+
+    report['wall_seconds'] = round(time.perf_counter() - start, 3)
+    report['results'] = metrics.results
+    report['stages'] = metrics.stages
+    logging.info(f"Tenant synchronisé en {report['wall_seconds']}s (statut : {report['status']}).")
+    return report
+
+
+def _sync_tenant_in_worker(tenant: Dict[str, Any]) -> Dict[str, Any]:
+    # Chaque processus du pool préfixe ses journaux par le nom du tenant
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s [%(levelname)s] [{tenant['name']}] %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+        force=True,
+    )
+    return sync_tenant(tenant)
+
+
+def run_tenants(tenants: List[Dict[str, Any]], max_processes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Synchronise plusieurs tenants en parallèle, un processus par tenant.
+
+    Chaque tenant a sa base de données, son client et son budget de débit : la
+    durée totale tend vers celle du tenant le plus long plutôt que vers la somme.
+    L'échec d'un tenant n'interrompt pas les autres.
+
+    Args:
+        tenants (List[Dict[str, Any]]): Tenants à synchroniser (voir `load_manifest`).
+        max_processes (int, optional): Nombre maximal de tenants synchronisés simultanément.
+            Par défaut, le nombre de CPU, et au moins `DEFAULT_MAX_PROCESSES` : une
+            synchronisation attend surtout l'API.
+
+    Returns:
+        Dict[str, Any]: Rapport agrégé : durée totale, nombre de tenants réussis et en échec,
+        totaux par table et rapport de chaque tenant.
+    """
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    max_processes = min(max_processes or max(DEFAULT_MAX_PROCESSES, os.cpu_count() or 1), len(tenants))
+
+    reports = []
+    with ProcessPoolExecutor(max_workers=max_processes) as pool:
+        futures = {pool.submit(_sync_tenant_in_worker, tenant): tenant['name'] for tenant in tenants}
+        for future in as_completed(futures):
+            try:
+                reports.append(future.result())
+            except Exception as err:
+                # Processus interrompu (mémoire, signal...) : les autres tenants continuent
+                logging.error(f"Erreur lors de la synchronisation du tenant '{futures[future]}' : {err}")
+                reports.append({'tenant': futures[future], 'status': 'failed', 'error': str(err), 'results': {}})
+    reports.sort(key=lambda report: report['tenant'])
+
+    return {
+        'started_at': started_at.isoformat(),
+        'wall_seconds': round(time.perf_counter() - start, 3),
+        'tenants': len(reports),
+        'succeeded': sum(report['status'] == 'ok' for report in reports),
+        'failed': [report['tenant'] for report in reports if report['status'] != 'ok'],
+        'totals': _aggregate_totals(reports),
+        'reports': reports,
+    }
+
+
+def _aggregate_totals(reports: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    totals = {}
+    for report in reports:
+        users = report['results'].get('users') or {}
+        for table, counts in [('users', users.get('users')), ('contracts', users.get('contracts')),
+                              ('departments', report['results'].get('departments'))]:
+            for key, value in (counts or {}).items():
+                table_totals = totals.setdefault(table, {})
+                table_totals[key] = table_totals.get(key, 0) + value
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synchronise en parallèle les tenants Lucca d'un manifeste.")
+    parser.add_argument('manifest', help="Manifeste JSON des tenants.")
+    parser.add_argument('--processes', type=int, help="Nombre de tenants synchronisés simultanément.")
+    parser.add_argument('--db-dir', help="Répertoire des bases de données (par défaut, celui du manifeste).")
+    parser.add_argument('--report', help="Écrit le rapport agrégé dans ce fichier JSON.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+    try:
+        tenants = load_manifest(args.manifest, db_dir=args.db_dir)
+    except (OSError, ValueError) as err:
+        logging.error(f"Manifeste invalide : {err}")
+        sys.exit(1)
+
+    report = run_tenants(tenants, max_processes=args.processes)
+    logging.info(
+        f"{report['succeeded']}/{report['tenants']} tenants synchronisés en {report['wall_seconds']}s."
+        + (f" Échecs : {', '.join(report['failed'])}." if report['failed'] else '')
+    )
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        logging.info(f"Rapport agrégé écrit dans {args.report}")
+    if report['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,3 +5,6 @@ import os
 
 # Ajouter le répertoire racine du projet au PYTHONPATH
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Ajouter le répertoire src, d'où les modules s'importent entre eux (comme avec `python src/main.py`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
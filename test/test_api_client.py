@@ -1,18 +1,36 @@
 import pytest
 import os
-from unittest.mock import patch
-from src.api_client import LuccaAPIClient
+import json
+from unittest.mock import MagicMock, patch
+from src.api_client import LuccaAPIClient, LuccaAPIError, RateLimiter, ResponseCache, iter_json_items, parse_retry_after
 from dotenv import load_dotenv
 
 
 # Charger les variables d'environnement pour les tests
 load_dotenv(dotenv_path='tests/.env.test')
 
+class FakeClock:
+    # Horloge simulée : les attentes de l'ordonnanceur avancent le temps sans bloquer
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
 @pytest.fixture
-def api_client():
-    return LuccaAPIClient()
+def clock():
+    return FakeClock()
 
-@patch('src.api_client.requests.get')
+@pytest.fixture
+def api_client(clock):
+    return LuccaAPIClient(rate_limiter=RateLimiter(clock=clock.monotonic, sleep=clock.sleep))
+
+@patch('src.api_client.requests.Session.get')
 def test_get_users_success(mock_get, api_client):
     mock_response = mock_get.return_value
     mock_response.status_code = 200
@@ -28,7 +46,7 @@ def test_get_users_success(mock_get, api_client):
     assert len(users) == 1
     assert users[0]['name'] == "John Doe"
 
-@patch('src.api_client.requests.get')
+@patch('src.api_client.requests.Session.get')
 def test_get_users_rate_limit(mock_get, api_client):
     # Simuler une réponse de limite de taux
     mock_response = mock_get.return_value
@@ -39,7 +57,7 @@ def test_get_users_rate_limit(mock_get, api_client):
     users = api_client.get_users()
     assert users == []
 
-@patch('src.api_client.requests.get')
+@patch('src.api_client.requests.Session.get')
 def test_get_departments_success(mock_get, api_client):
     # Simuler une réponse API réussie pour les départements
     mock_response = mock_get.return_value
@@ -56,7 +74,7 @@ def test_get_departments_success(mock_get, api_client):
     assert len(departments) == 1
     assert departments[0]['name'] == "Engineering"
 
-@patch('src.api_client.requests.get')
+@patch('src.api_client.requests.Session.get')
 def test_get_departments_rate_limit(mock_get, api_client):
     # Simuler une réponse de limite de taux pour les départements
     mock_response = mock_get.return_value
@@ -74,3 +92,253 @@ def test_api_client_initialization_missing_token(monkeypatch):
     with pytest.raises(ValueError) as excinfo:
         LuccaAPIClient()
     assert "Le token API est manquant." in str(excinfo.value)
+
+def test_api_client_does_not_log_token(caplog):
+    with caplog.at_level('INFO'):
+        LuccaAPIClient(api_token='secret-token-42', base_url='http://lucca.test')
+    assert 'secret-token-42' not in caplog.text
+
+def _paged_response(total):
+    # Simule un endpoint paginé renvoyant `total` éléments selon le paramètre 'paging'
+    def fake_get(endpoint, params=None, **kwargs):
+        offset, limit = (int(v) for v in params['paging'].split(','))
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {
+            "data": {"items": [{"id": i} for i in range(offset, min(offset + limit, total))]}
+        }
+        return response
+    return fake_get
+
+@patch('src.api_client.requests.Session.get')
+def test_get_users_paginated_in_order(mock_get):
+    mock_get.side_effect = _paged_response(23)
+    client = LuccaAPIClient(page_size=5, max_workers=3)
+
+    users = client.get_users()
+    assert [user['id'] for user in users] == list(range(23))
+    assert all(call.kwargs['params']['formerEmployees'] == 'true' for call in mock_get.call_args_list)
+    assert all(call.kwargs['params']['orderBy'] == 'id,asc' for call in mock_get.call_args_list)
+
+@patch('src.api_client.requests.Session.get')
+def test_get_departments_single_page_makes_one_request(mock_get):
+    mock_get.side_effect = _paged_response(3)
+    client = LuccaAPIClient(page_size=5, max_workers=3)
+
+    departments = client.get_departments()
+    assert len(departments) == 3
+    assert mock_get.call_count == 1
+
+@patch('src.api_client.requests.Session.get')
+def test_get_users_exact_multiple_of_page_size(mock_get):
+    mock_get.side_effect = _paged_response(10)
+    client = LuccaAPIClient(page_size=5, max_workers=2)
+
+    users = client.get_users()
+    assert [user['id'] for user in users] == list(range(10))
+    assert {call.kwargs['params']['orderBy'] for call in mock_get.call_args_list} == {'id,asc'}
+
+@patch('src.api_client.requests.Session.get')
+def test_iter_pages_keeps_caller_order(mock_get):
+    mock_get.side_effect = _paged_response(12)
+    client = LuccaAPIClient(page_size=5, max_workers=2)
+
+    assert len([department for page in client.iter_department_pages(params={'orderBy': 'name,asc'})
+                for department in page]) == 12
+    assert {call.kwargs['params']['orderBy'] for call in mock_get.call_args_list} == {'name,asc'}
+
+@patch('src.api_client.requests.Session.get')
+def test_iter_user_pages_resumes_from_offset(mock_get):
+    mock_get.side_effect = _paged_response(23)
+    client = LuccaAPIClient(page_size=5, max_workers=2)
+
+    users = [user for page in client.iter_user_pages(start_offset=12) for user in page]
+    assert [user['id'] for user in users] == list(range(12, 23))
+    assert min(int(call.kwargs['params']['paging'].split(',')[0]) for call in mock_get.call_args_list) == 12
+    assert all(call.kwargs['params']['orderBy'] == 'id,asc' for call in mock_get.call_args_list)
+
+def _response(status_code, body=None, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = body or {}
+    return response
+
+@patch('src.api_client.requests.Session.get')
+def test_get_users_retries_after_rate_limit(mock_get, api_client, clock):
+    mock_get.side_effect = [
+        _response(429, headers={'Retry-After': '3'}),
+        _response(200, {"message": "Rate limit exceeded"}),
+        _response(200, {"data": {"items": [{"id": 1}]}}),
+    ]
+
+    users = api_client.get_users()
+    assert users == [{"id": 1}]
+    assert mock_get.call_count == 3
+    assert api_client.stats['rate_limited'] == 2
+    assert api_client.stats['retries'] == 2
+    # Le Retry-After est respecté avant la deuxième tentative
+    assert clock.now >= 3
+    assert api_client.stats['queue_wait_seconds'] >= 3
+
+@patch('src.api_client.requests.Session.get')
+def test_get_users_does_not_retry_client_errors(mock_get, api_client):
+    mock_get.return_value = _response(403)
+
+    assert api_client.get_users() == []
+    assert mock_get.call_count == 1
+
+@pytest.mark.parametrize('status', [401, 404])
+@patch('src.api_client.requests.Session.get')
+def test_client_errors_raise_lucca_api_error(mock_get, api_client, status):
+    mock_get.return_value = _response(status)
+
+    with pytest.raises(LuccaAPIError, match=f"Statut HTTP {status}"):
+        list(api_client.iter_user_pages())
+    assert mock_get.call_count == 1
+
+def test_rate_limiter_learns_quota_from_headers(clock):
+    limiter = RateLimiter(rate=10.0, max_rate=100.0, clock=clock.monotonic, sleep=clock.sleep)
+
+    limiter.on_success({'X-RateLimit-Remaining': '50', 'X-RateLimit-Reset': '10'})
+    assert limiter.rate == 5.0
+
+    limiter.on_throttle()
+    assert limiter.rate == 2.5
+
+def test_rate_limiter_blocks_until_quota_reset(clock):
+    limiter = RateLimiter(rate=10.0, clock=clock.monotonic, sleep=clock.sleep)
+
+    limiter.on_success({'RateLimit-Remaining': '0', 'RateLimit-Reset': '7'})
+    waited = limiter.acquire()
+    assert waited >= 7
+
+def test_parse_retry_after():
+    assert parse_retry_after('12') == 12.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:10 GMT', now=1445412480.0) == 10.0
+    assert parse_retry_after('invalid') is None
+    assert parse_retry_after(None) is None
+
+def _json_response(status_code, body=None, headers=None):
+    response = _response(status_code, body, headers)
+    response.content = json.dumps(body).encode('utf-8') if body is not None else b''
+    return response
+
+@patch('src.api_client.requests.Session.get')
+def test_get_departments_revalidates_cached_pages(mock_get, clock, tmp_path):
+    body = {"data": {"items": [{"id": 1, "name": "Engineering"}]}}
+    mock_get.side_effect = [
+        _json_response(200, body, {'ETag': '"v1"'}),
+        _json_response(304, headers={'ETag': '"v1"'}),
+    ]
+    cache = ResponseCache(str(tmp_path), ttl=0)
+    client = LuccaAPIClient(rate_limiter=RateLimiter(clock=clock.monotonic, sleep=clock.sleep), cache=cache)
+
+    assert client.get_departments() == body['data']['items']
+    assert client.get_departments() == body['data']['items']
+
+    assert mock_get.call_args_list[1].kwargs['headers'] == {'If-None-Match': '"v1"'}
+    assert (cache.hits, cache.misses, cache.revalidations) == (1, 1, 1)
+
+@patch('src.api_client.requests.Session.get')
+def test_get_departments_serves_fresh_cache_without_request(mock_get, clock, tmp_path):
+    body = {"data": {"items": [{"id": 1, "name": "Engineering"}]}}
+    mock_get.return_value = _json_response(200, body)
+    cache = ResponseCache(str(tmp_path), ttl=3600)
+    client = LuccaAPIClient(rate_limiter=RateLimiter(clock=clock.monotonic, sleep=clock.sleep), cache=cache)
+
+    client.get_departments()
+    assert client.get_departments() == body['data']['items']
+    assert mock_get.call_count == 1
+    assert cache.hits == 1
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=250)
+    body = json.dumps({"data": {"items": [{"id": 1}]}}).encode('utf-8')
+
+    cache.put('a', body, {})
+    cache.put('b', body, {})
+    cache.load('a')
+    os.utime(tmp_path / 'b.body', (0, 0))
+    cache.put('c', body, {})
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+def test_response_cache_load_after_concurrent_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=150)
+    body = json.dumps({"data": {"items": [{"id": 1}]}}).encode('utf-8')
+
+    cache.put('a', body, {})
+    assert cache.get('a') is not None
+    os.utime(tmp_path / 'a.body', (0, 0))
+    # Un autre worker enregistre une page et évince 'a' entre `get` et `load`
+    cache.put('b', body, {})
+
+    assert cache.load('a') is None
+
+class EvictingCache(ResponseCache):
+    # Évince l'entrée juste après l'avoir déclarée présente, comme un `put` concurrent
+    def get(self, key):
+        meta = super().get(key)
+        if meta is not None:
+            os.remove(self._path(key, 'body'))
+        return meta
+
+@pytest.mark.parametrize("ttl", [3600, 0])
+@patch('src.api_client.requests.Session.get')
+def test_evicted_cache_entry_falls_through_to_network(mock_get, clock, tmp_path, ttl):
+    body = {"data": {"items": [{"id": 1, "name": "Engineering"}]}}
+    # Entrée fraîche : requête directe ; entrée expirée : 304, puis requête sans validateurs
+    mock_get.side_effect = [_json_response(304, headers={'ETag': '"v1"'}), _json_response(200, body)] if ttl == 0 \
+        else [_json_response(200, body)]
+    cache = EvictingCache(str(tmp_path), ttl=ttl)
+    cache.put(cache.key('http://lucca.test/api/v3/departments', {'orderBy': 'id,asc', 'paging': '0,500'}),
+              json.dumps(body).encode('utf-8'), {'ETag': '"v1"'})
+    client = LuccaAPIClient(rate_limiter=RateLimiter(clock=clock.monotonic, sleep=clock.sleep), cache=cache,
+                            page_size=500, base_url='http://lucca.test')
+
+    assert list(client.iter_department_pages()) == [body['data']['items']]
+    assert mock_get.call_args_list[-1].kwargs['headers'] == {}
+
+def _chunked(body, size):
+    encoded = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    return [encoded[i:i + size] for i in range(0, len(encoded), size)]
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_iter_json_items_decodes_across_chunk_boundaries(size):
+    items = [{"id": 12345, "name": "Élodie Müller", "habilitedRoles": [{"id": 1, "name": "Admin"}]}, {"id": 2.5e3}]
+    body = {"meta": {"count": 2, "tags": ["a", "]"]}, "data": {"total": 1234, "items": items, "next": None}}
+
+    assert list(iter_json_items(_chunked(body, size))) == items
+
+def test_iter_json_items_raises_on_message_envelope():
+    with pytest.raises(LuccaAPIError, match="Invalid token"):
+        list(iter_json_items(_chunked({"message": "Invalid token"}, 3)))
+
+@patch('src.api_client.requests.Session.get')
+def test_stream_json_mode_decodes_pages_from_response_stream(mock_get, clock, tmp_path):
+    body = {"data": {"items": [{"id": 1, "name": "Engineering"}, {"id": 2, "name": "Sales"}]}}
+    response = _response(200, headers={'ETag': '"v1"'})
+    response.iter_content.side_effect = lambda chunk_size: iter(_chunked(body, 5))
+    mock_get.return_value = response
+    cache = ResponseCache(str(tmp_path))
+    client = LuccaAPIClient(rate_limiter=RateLimiter(clock=clock.monotonic, sleep=clock.sleep),
+                            cache=cache, stream_json=True)
+
+    assert client.get_departments() == body['data']['items']
+    assert mock_get.call_args.kwargs['stream'] is True
+    response.json.assert_not_called()
+    assert client.stats['bytes_downloaded'] == len(json.dumps(body).encode('utf-8'))
+    assert cache.load(cache.key(mock_get.call_args.args[0], mock_get.call_args.kwargs['params'])) == body
+
+@patch('src.api_client.requests.Session.get')
+def test_stream_json_mode_propagates_message_envelope(mock_get, clock):
+    response = _response(200)
+    response.iter_content.side_effect = lambda chunk_size: iter(_chunked({"message": "Invalid token"}, 4))
+    mock_get.return_value = response
+    client = LuccaAPIClient(rate_limiter=RateLimiter(clock=clock.monotonic, sleep=clock.sleep), stream_json=True)
+
+    with pytest.raises(LuccaAPIError, match="Invalid token"):
+        next(client.iter_user_pages())
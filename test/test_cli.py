@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+from sqlalchemy import text
+from src.cli import main
+from src.db_manager import create_sqlite_engine, initialize_db, set_sync_watermark
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+
+def test_status_imports_no_heavy_dependency(tmp_path):
+    database = str(tmp_path / 'test.sqlite')
+    initialize_db(create_sqlite_engine(database))
+    script = (
+        "import json, sys\n"
+        "import cli\n"
+        f"code = cli.main(['status', '--database', {database!r}])\n"
+        "print(json.dumps([m for m in ('pandas', 'sqlalchemy', 'requests') if m in sys.modules]))\n"
+    )
+
+    result = subprocess.run([sys.executable, '-c', script], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+
+    # Le démarrage à froid des contrôles de santé ne paie pas l'import de pandas ni de SQLAlchemy
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+
+def test_status_reports_sync_state(tmp_path, capsys):
+    database = str(tmp_path / 'test.sqlite')
+    engine = create_sqlite_engine(database)
+    initialize_db(engine)
+    assert main(['status', '--database', database]) == 1
+
+    set_sync_watermark(engine, 'users', '2023-10-01T12:00:00+00:00')
+    capsys.readouterr()
+
+    assert main(['status', '--database', database]) == 0
+    status = json.loads(capsys.readouterr().out)
+    assert status['tables'] == {'users': 0, 'contracts': 0, 'departments': 0}
+    assert status['sync_state']['users']['watermark'] == '2023-10-01T12:00:00+00:00'
+    assert main(['status', '--database', str(tmp_path / 'absente.sqlite')]) == 1
+
+def test_status_quotes_database_path(tmp_path, capsys):
+    directory = tmp_path / 'base?v=1#50%'
+    directory.mkdir()
+    database = str(directory / 'test.sqlite')
+    engine = create_sqlite_engine(database)
+    initialize_db(engine)
+    set_sync_watermark(engine, 'users', '2023-10-01T12:00:00+00:00')
+
+    assert main(['status', '--database', database]) == 0
+    assert json.loads(capsys.readouterr().out)['sync_state']['users']['watermark'] == '2023-10-01T12:00:00+00:00'
+
+def _fake_get(url, params=None, **kwargs):
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {}
+    response.content = b''
+    assert url.endswith('/departments'), "seuls les départements doivent être demandés"
+    response.json.return_value = {"data": {"items": [
+        {"id": 1, "name": "Engineering", "parentId": None, "users": [], "currentUsers": []},
+    ]}}
+    return response
+
+@patch('src.api_client.requests.Session.get', side_effect=_fake_get)
+def test_sync_departments_only(mock_get, tmp_path):
+    database = str(tmp_path / 'test.sqlite')
+
+    assert main(['sync', 'departments', '--database', database]) == 0
+
+    with create_sqlite_engine(database).connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM departments")).scalar() == 1
+        assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 0
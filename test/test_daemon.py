@@ -0,0 +1,73 @@
+import json
+import time
+import threading
+import urllib.request
+import pytest
+from sqlalchemy import create_engine, event
+from src.db_manager import initialize_db
+from src.daemon import SyncDaemon
+
+
+def make_user(user_id):
+    return {
+        "id": user_id, "name": f"User {user_id}", "modifiedOn": "2023-10-01T12:00:00Z",
+        "department": {"name": "Engineering"}, "manager": None, "rolePrincipal": {"name": "Developer"},
+        "legalEntity": {"name": "Company A"}, "dtContractStart": "2023-01-01", "dtContractEnd": None,
+        "applicationData": {}, "habilitedRoles": [],
+    }
+
+
+class FakeClient:
+    def iter_user_pages(self, params=None, start_offset=0):
+        yield [make_user(1), make_user(2)][start_offset:]
+
+    def iter_department_pages(self, params=None):
+        yield [{"id": 1, "name": "Engineering", "parentId": None, "users": [], "currentUsers": []}]
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    initialize_db(engine)
+    return SyncDaemon(client=FakeClient(), engine=engine, interval=3600, jitter=0.1)
+
+def test_next_delay_stays_within_jitter(daemon):
+    delays = [daemon.next_delay() for _ in range(100)]
+    assert all(3240 <= delay <= 3960 for delay in delays)
+    with pytest.raises(ValueError):
+        SyncDaemon(client=FakeClient(), engine=daemon.engine, interval=0)
+
+def test_run_once_keeps_row_hashes_warm(daemon):
+    assert daemon.run_once()['status'] == 'ok'
+    assert len(daemon.hash_caches['users']) == 2
+
+    statements = []
+    event.listen(daemon.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    report = daemon.run_once()
+
+    assert report['status'] == 'ok'
+    assert report['results']['users']['users'] == {'inserted': 0, 'updated': 0, 'unchanged': 2}
+    # Les empreintes connues ne sont plus relues dans la table
+    assert not [statement for statement in statements if 'row_hash FROM "users"' in statement]
+
+def test_control_endpoint_triggers_sync_and_reports_status(daemon):
+    port = daemon.start_control_server(0)
+    thread = threading.Thread(target=daemon.serve_forever, kwargs={'run_immediately': False})
+    thread.start()
+    try:
+        request = urllib.request.Request(f'http://127.0.0.1:{port}/sync', method='POST')
+        assert urllib.request.urlopen(request).status == 202
+        deadline = time.monotonic() + 10
+        while daemon.runs == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        status = json.load(urllib.request.urlopen(f'http://127.0.0.1:{port}/status'))
+        assert status['runs'] == 1
+        assert status['last_run']['status'] == 'ok'
+        assert status['last_run']['results']['users']['fetched'] == 2
+    finally:
+        daemon.stop()
+        thread.join(timeout=10)
+        daemon.stop_control_server()
+    assert not thread.is_alive()
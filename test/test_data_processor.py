@@ -1,6 +1,10 @@
 import pytest
 import pandas as pd
-from src.data_processor import process_users, process_departments, process_contracts_from_users, transform_user_data
+from src.data_processor import (process_users, process_departments, process_contracts_from_users, transform_user_data,
+                                compute_watermark, process_user_roles, process_department_members,
+                                compute_department_closure, compact_columns, extract_role_ids, extract_user_ids,
+                                transform_users)
+from src.db_manager import compute_row_hash
 import json
 
 def test_process_users_empty():
@@ -112,3 +116,127 @@ def test_process_contracts_from_users_non_empty():
     assert df.loc[0, 'start_date'] == "2023-01-01"
     assert df.loc[0, 'end_date'] == "2023-12-31"
     assert df.loc[0, 'theoretical_remuneration'] == 50000
+
+def test_compute_watermark_uses_latest_timestamp():
+    df = pd.DataFrame({"modifiedOn": ["2023-10-01T12:00:00Z", "2023-10-02T09:30:00+02:00", None]})
+    assert compute_watermark(df) == "2023-10-02T07:30:00+00:00"
+
+def test_compute_watermark_empty():
+    assert compute_watermark(pd.DataFrame()) is None
+    assert compute_watermark(pd.DataFrame({"id": [1]})) is None
+
+def test_transform_user_data_missing_nested_values():
+    df_input = pd.DataFrame({
+        "id": [1, 2],
+        "department": [None, {"id": 3}],
+        "legalEntity": [{"name": "Company A"}, None],
+        "rolePrincipal": [{"id": 5}, "invalid"],
+        "manager": [None, {"id": 2, "name": "Jane Smith"}],
+        "applicationData": [{}, None],
+        "habilitedRoles": [None, [{"id": 101, "name": "Role A"}, {"id": 102}]],
+    })
+
+    transformed_df = transform_user_data(df_input)
+
+    assert transformed_df['department'].tolist() == ["Unknown", "Unknown"]
+    assert transformed_df['legalEntity'].tolist() == ["Company A", "Unknown"]
+    assert transformed_df['rolePrincipal'].tolist() == ["Unknown", "Unknown"]
+    assert transformed_df['manager'].tolist() == ["Unknown", "Jane Smith"]
+    assert transformed_df['managerId'].tolist() == [pd.NA, 2]
+    assert transformed_df['theoreticalRemuneration'].tolist() == ["Unknown", "Unknown"]
+    assert transformed_df['habilitedRoles'].tolist() == ["[]", json.dumps(["Role A"])]
+
+def test_process_user_roles_keys_by_id():
+    users = [
+        {"id": 1, "habilitedRoles": [{"id": 10, "name": "Admin"}, {"id": 11, "name": "User"}]},
+        {"id": 2, "habilitedRoles": json.dumps([{"id": 11, "name": "User"}, {"name": "Sans id"}])},
+        {"id": 3, "habilitedRoles": None},
+    ]
+    links, roles = process_user_roles(users)
+    assert links.values.tolist() == [[1, 10], [1, 11], [2, 11]]
+    assert roles.set_index('id')['name'].to_dict() == {10: "Admin", 11: "User"}
+
+def test_process_department_members_flags_current_users():
+    departments = [{
+        "id": 5,
+        "users": [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}],
+        "currentUsers": [{"id": 2, "name": "Bob"}],
+    }]
+    members = process_department_members(departments)
+    assert members.values.tolist() == [[5, 1, 0], [5, 2, 1]]
+
+def test_compute_department_closure():
+    departments = [
+        {"id": 1, "parentId": None},
+        {"id": 2, "parentId": 1},
+        {"id": 3, "parentId": 2},
+        {"id": 4, "parentId": 99},  # parent inconnu : racine
+    ]
+    closure = compute_department_closure(departments)
+    rows = sorted(map(tuple, closure.values.tolist()))
+    assert rows == [(1, 1, 0), (1, 2, 1), (1, 3, 2), (2, 2, 0), (2, 3, 1), (3, 3, 0), (4, 4, 0)]
+
+
+def test_transform_user_data_encodes_low_cardinality_columns():
+    users = [
+        {"id": user_id, "department": {"name": "Engineering" if user_id % 2 else "Sales"},
+         "legalEntity": {"name": "Company A"}, "rolePrincipal": {"name": "Developer"}, "manager": None,
+         "applicationData": {}, "habilitedRoles": [{"id": 10, "name": "Admin"}]}
+        for user_id in range(10)
+    ]
+    df = transform_user_data(process_users(users))
+    plain = pd.DataFrame({column: df[column].tolist() for column in df.columns})
+
+    assert isinstance(df['department'].dtype, pd.CategoricalDtype)
+    assert isinstance(df['habilitedRoles'].dtype, pd.CategoricalDtype)
+    assert df['department'].tolist()[:2] == ["Sales", "Engineering"]
+    # L'encodage ne change ni les valeurs écrites, ni leur empreinte
+    assert [compute_row_hash(row) for row in df.astype(object).to_dict('records')] == \
+        [compute_row_hash(row) for row in plain.astype(object).to_dict('records')]
+
+def test_compact_columns_skips_high_cardinality_columns():
+    df = pd.DataFrame({"manager": ["A", "B", "C", "A"], "entity": ["X", "X", "X", "X"]})
+
+    compact_columns(df, ["manager", "entity", "missing"])
+
+    assert not isinstance(df['manager'].dtype, pd.CategoricalDtype)
+    assert isinstance(df['entity'].dtype, pd.CategoricalDtype)
+
+@pytest.mark.parametrize("codec", ["json", "orjson"])
+def test_extract_ids_with_either_json_codec(codec, monkeypatch):
+    loads = pytest.importorskip(codec).loads
+    monkeypatch.setattr('src.data_processor.json_loads', loads)
+
+    assert extract_role_ids('[{"id": 1, "name": "Admin"}, {"id": 2}]') == ['Admin']
+    assert extract_user_ids('[{"id": 3, "name": "Zoé"}]') == ['Zoé']
+    assert extract_role_ids('not json') == []
+    assert extract_user_ids('') == []
+
+def test_transform_users_parallel_matches_serial():
+    users = [{
+        "id": user_id,
+        "name": f"User {user_id}",
+        "department": {"name": "Engineering" if user_id % 2 else "Sales"},
+        "legalEntity": {"name": "Company A"},
+        "rolePrincipal": None,
+        "manager": {"id": user_id - 1, "name": f"User {user_id - 1}"} if user_id > 1 else None,
+        "dtContractStart": "2023-01-01",
+        # Colonne entièrement nulle dans le premier bloc, et clé présente dans le dernier seulement
+        "dtContractEnd": "2024-01-01" if user_id > 6 else None,
+        "applicationData": {"theoreticalRemuneration": {"value": 1000 * user_id}},
+        "habilitedRoles": [{"id": 1, "name": "Admin"}],
+        **({"employeeNumber": "E9"} if user_id == 9 else {}),
+    } for user_id in range(1, 10)]
+
+    serial = transform_users(users)
+    parallel = transform_users(users, workers=3, min_rows=2)
+
+    pd.testing.assert_frame_equal(parallel[0], serial[0])
+    pd.testing.assert_frame_equal(parallel[1], serial[1])
+
+def test_process_departments_parallel_matches_serial():
+    departments = [{"id": i, "name": f"Dept {i}", "users": [{"id": 1, "name": "User 1"}] if i > 3 else None}
+                   for i in range(6)]
+
+    pd.testing.assert_frame_equal(process_departments(departments, workers=2, min_rows=2),
+                                  process_departments(departments))
@@ -0,0 +1,225 @@
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from src.db_manager import (initialize_db, get_schema_version, get_sync_watermark, set_sync_watermark,
+                            upsert_records, insert_new_records, bulk_load, create_sqlite_engine, replace_links,
+                            write_department_closure, get_department_subtree, get_department_ancestors,
+                            get_subtree_user_ids, get_department_headcounts, MIGRATIONS)
+from src.data_processor import compute_department_closure
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    initialize_db(engine)
+    return engine
+
+def test_sync_watermark_roundtrip(engine):
+    assert get_sync_watermark(engine, 'users') is None
+
+    set_sync_watermark(engine, 'users', '2023-10-01T12:00:00+00:00')
+    set_sync_watermark(engine, 'users', '2023-10-02T12:00:00+00:00')
+
+    assert get_sync_watermark(engine, 'users') == '2023-10-02T12:00:00+00:00'
+    assert get_sync_watermark(engine, 'departments') is None
+
+def test_upsert_records_counts(engine):
+    contracts = pd.DataFrame({
+        'user_id': [1, 2],
+        'start_date': ['2023-01-01', '2023-02-01'],
+        'end_date': [None, None],
+        'theoretical_remuneration': [50000, 60000],
+    })
+    assert upsert_records(contracts, engine, 'contracts', key_columns=['user_id']) == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+
+    changed = pd.DataFrame({
+        'user_id': [1, 2, 3],
+        'start_date': ['2023-01-01', '2023-02-01', '2023-03-01'],
+        'end_date': [None, '2024-01-31', None],
+        'theoretical_remuneration': [50000, 60000, 70000],
+    })
+    counts = upsert_records(changed, engine, 'contracts', key_columns=['user_id'], batch_size=2)
+    assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT user_id, end_date FROM contracts ORDER BY user_id")).fetchall()
+    assert [tuple(row) for row in rows] == [(1, None), (2, '2024-01-31'), (3, None)]
+
+def test_initialize_db_creates_keyed_and_indexed_schema(engine):
+    assert get_schema_version(engine) == MIGRATIONS[-1][0]
+
+    inspector = inspect(engine)
+    assert inspector.get_pk_constraint('users')['constrained_columns'] == ['id']
+    assert inspector.get_pk_constraint('contracts')['constrained_columns'] == ['user_id']
+    assert {'ix_users_department', 'ix_users_manager', 'ix_users_modifiedOn'} <= {
+        index['name'] for index in inspector.get_indexes('users')
+    }
+
+    # Relancer l'initialisation est sans effet
+    initialize_db(engine)
+    assert get_schema_version(engine) == MIGRATIONS[-1][0]
+
+def test_initialize_db_upgrades_legacy_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}")
+    # Base créée par l'ancienne version via DataFrame.to_sql : ni clé ni type, avec un doublon
+    pd.DataFrame({'id': ['1', '1', '2'], 'name': ['Old', 'Engineering', 'Sales']}).to_sql('departments', engine, index=False)
+    pd.DataFrame({'id': ['7'], 'name': ['John Doe']}).to_sql('users', engine, index=False)
+
+    initialize_db(engine)
+
+    with engine.connect() as conn:
+        departments = conn.execute(text("SELECT id, name FROM departments ORDER BY id")).fetchall()
+        users = conn.execute(text("SELECT id, name, mail FROM users")).fetchall()
+    assert [tuple(row) for row in departments] == [(1, 'Engineering'), (2, 'Sales')]
+    assert [tuple(row) for row in users] == [(7, 'John Doe', None)]
+    assert inspect(engine).get_pk_constraint('departments')['constrained_columns'] == ['id']
+
+def test_insert_new_records_returns_inserted_count(engine):
+    users = pd.DataFrame({'id': [1, 2], 'name': ['John Doe', 'Jane Smith']})
+    assert insert_new_records(users, engine, 'users') == 2
+    assert insert_new_records(users, engine, 'users') == 0
+    assert insert_new_records(pd.DataFrame(), engine, 'users') == 0
+
+def test_create_sqlite_engine_applies_pragmas(tmp_path):
+    engine = create_sqlite_engine(str(tmp_path / 'test.sqlite'))
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -64 * 1024
+
+def test_read_only_engine_reads_while_writer_is_open(tmp_path):
+    path = str(tmp_path / 'test.sqlite')
+    writer = create_sqlite_engine(path)
+    initialize_db(writer)
+    set_sync_watermark(writer, 'users', '2023-10-01T12:00:00+00:00')
+    reader = create_sqlite_engine(path, read_only=True)
+
+    with writer.begin() as conn:
+        conn.execute(text("INSERT INTO contracts (user_id) VALUES (1)"))
+        # Transaction d'écriture en cours : le lecteur voit le dernier état validé
+        assert get_sync_watermark(reader, 'users') == '2023-10-01T12:00:00+00:00'
+        with reader.connect() as read_conn:
+            assert read_conn.execute(text("SELECT COUNT(*) FROM contracts")).scalar() == 0
+
+    with pytest.raises(OperationalError):
+        with reader.begin() as conn:
+            conn.execute(text("INSERT INTO contracts (user_id) VALUES (2)"))
+
+def test_read_only_engine_quotes_path(tmp_path):
+    directory = tmp_path / 'base?v=1#50%'
+    directory.mkdir()
+    path = str(directory / 'test.sqlite')
+    writer = create_sqlite_engine(path)
+    initialize_db(writer)
+    set_sync_watermark(writer, 'users', '2023-10-01T12:00:00+00:00')
+    assert (directory / 'test.sqlite').exists()
+
+    reader = create_sqlite_engine(path, read_only=True)
+    assert get_sync_watermark(reader, 'users') == '2023-10-01T12:00:00+00:00'
+
+def test_bulk_load_inserts_in_batches(engine):
+    contracts = pd.DataFrame({'user_id': range(1, 8), 'start_date': ['2023-01-01'] * 7})
+
+    assert bulk_load(contracts, engine, 'contracts', batch_size=3) == 7
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM contracts")).scalar() == 7
+
+def test_upsert_records_into_empty_table_deduplicates_keys(engine):
+    contracts = pd.DataFrame({'user_id': [1, 2, 1], 'start_date': ['2023-01-01', '2023-02-01', '2023-03-01']})
+
+    counts = upsert_records(contracts, engine, 'contracts', key_columns=['user_id'], batch_size=2)
+
+    assert counts == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT start_date FROM contracts WHERE user_id = 1")).scalar() == '2023-03-01'
+
+def test_replace_links_replaces_links_of_synced_owners_only(engine):
+    replace_links(pd.DataFrame({'user_id': [1, 1, 2], 'role_id': [10, 11, 10]}), engine, 'user_roles', 'user_id', [1, 2])
+
+    counts = replace_links(pd.DataFrame({'user_id': [1], 'role_id': [12]}), engine, 'user_roles', 'user_id', [1, 3])
+
+    assert counts == {'deleted': 2, 'inserted': 1}
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT user_id, role_id FROM user_roles ORDER BY user_id, role_id")).fetchall()
+        plan = conn.execute(text("EXPLAIN QUERY PLAN SELECT user_id FROM user_roles WHERE role_id = 10")).fetchall()
+    assert [tuple(row) for row in rows] == [(1, 12), (2, 10)]
+    assert 'ix_user_roles_role' in ' '.join(str(row) for row in plan)
+
+def test_department_closure_incremental_update_and_queries(engine):
+    tree = [{"id": 1, "parentId": None}, {"id": 2, "parentId": 1}, {"id": 3, "parentId": 2}, {"id": 4, "parentId": 1}]
+    assert write_department_closure(compute_department_closure(tree), engine) == {'inserted': 8, 'updated': 0, 'deleted': 0}
+    replace_links(pd.DataFrame({'department_id': [2, 3, 4, 3], 'user_id': [10, 11, 12, 10], 'is_current': [1, 1, 1, 0]}),
+                  engine, 'department_members', 'department_id', [2, 3, 4])
+
+    assert get_department_subtree(engine, 1) == [1, 2, 4, 3]
+    assert get_department_subtree(engine, 1, max_depth=1) == [1, 2, 4]
+    assert get_department_ancestors(engine, 3) == [2, 1]
+    assert get_subtree_user_ids(engine, 2) == [10, 11]
+    assert get_department_headcounts(engine) == {1: 3, 2: 2, 3: 1, 4: 1}
+
+    # Déplacer le département 3 sous le département 4 : seules les lignes de son sous-arbre changent
+    tree[2]["parentId"] = 4
+    assert write_department_closure(compute_department_closure(tree), engine) == {'inserted': 1, 'updated': 0, 'deleted': 1}
+    assert get_department_ancestors(engine, 3) == [4, 1]
+
+def _contracts(**changes):
+    contracts = pd.DataFrame({
+        'user_id': [1, 2],
+        'start_date': ['2023-01-01', '2023-02-01'],
+        'end_date': [None, None],
+        'theoretical_remuneration': [50000, 60000],
+    })
+    for column, values in changes.items():
+        contracts[column] = values
+    return contracts
+
+def test_upsert_records_skips_unchanged_rows_before_writing(engine):
+    upsert_records(_contracts(), engine, 'contracts', key_columns=['user_id'])
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+
+    counts = upsert_records(_contracts(), engine, 'contracts', key_columns=['user_id'])
+
+    assert counts == {'inserted': 0, 'updated': 0, 'unchanged': 2}
+    assert not [statement for statement in statements if statement.startswith('INSERT')]
+
+def test_upsert_records_versions_contract_history(engine):
+    upsert_records(_contracts(), engine, 'contracts', key_columns=['user_id'], history_table='contract_history')
+    upsert_records(_contracts(), engine, 'contracts', key_columns=['user_id'], history_table='contract_history')
+    counts = upsert_records(_contracts(end_date=[None, '2024-01-31']), engine, 'contracts',
+                            key_columns=['user_id'], history_table='contract_history')
+
+    assert counts == {'inserted': 0, 'updated': 1, 'unchanged': 1}
+    with engine.connect() as conn:
+        history = conn.execute(text(
+            "SELECT user_id, end_date, valid_from, valid_to FROM contract_history ORDER BY user_id, valid_from"
+        )).fetchall()
+    assert [(row[0], row[1]) for row in history] == [(1, None), (2, None), (2, '2024-01-31')]
+    assert history[0][3] is None and history[2][3] is None
+    assert history[1][3] == history[2][2]
+
+def test_migration_hashes_existing_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}")
+    _contracts().to_sql('contracts', engine, index=False)
+
+    initialize_db(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM contract_history WHERE valid_to IS NULL")).scalar() == 2
+    # Les empreintes calculées lors de la migration correspondent aux données reçues
+    counts = upsert_records(_contracts(), engine, 'contracts', key_columns=['user_id'], history_table='contract_history')
+    assert counts == {'inserted': 0, 'updated': 0, 'unchanged': 2}
+
+
+def test_upsert_records_stamps_synced_at_on_written_rows_only(engine):
+    upsert_records(_contracts(), engine, 'contracts', key_columns=['user_id'])
+    with engine.connect() as conn:
+        first = dict(conn.execute(text("SELECT user_id, synced_at FROM contracts")).fetchall())
+
+    upsert_records(_contracts(end_date=[None, '2024-01-31']), engine, 'contracts', key_columns=['user_id'])
+
+    with engine.connect() as conn:
+        second = dict(conn.execute(text("SELECT user_id, synced_at FROM contracts")).fetchall())
+    assert first[1] is not None and second[1] == first[1]
+    assert second[2] > first[2]
@@ -0,0 +1,81 @@
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine, text
+from src.db_manager import initialize_db, upsert_records, get_sync_watermark
+
+pa = pytest.importorskip('pyarrow')
+from src.export import export_table, export_snapshot, open_snapshot, main
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    initialize_db(engine)
+    return engine
+
+def _users(*ids, department='Tech'):
+    return pd.DataFrame({
+        'id': list(ids),
+        'name': [f'User {user_id}' for user_id in ids],
+        'department': [department] * len(ids),
+        'theoreticalRemuneration': ['Unknown'] + [50000.0] * (len(ids) - 1),
+    })
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_export_table_appends_changed_rows_only(engine, tmp_path, fmt):
+    output_dir = tmp_path / 'export'
+    upsert_records(_users(1, 2), engine, 'users')
+    first = export_table(engine, 'users', str(output_dir), fmt=fmt)
+
+    assert first['rows'] == 2 and len(first['files']) == 1
+    assert '/users/sync_date=' in first['files'][0] and first['files'][0].endswith(f'.{fmt}')
+    assert get_sync_watermark(engine, 'export:users') == first['watermark']
+    assert export_table(engine, 'users', str(output_dir), fmt=fmt)['rows'] == 0
+
+    upsert_records(_users(2, 3, department='Sales'), engine, 'users')
+    second = export_table(engine, 'users', str(output_dir), fmt=fmt)
+    assert second['rows'] == 2
+
+    table = open_snapshot(str(output_dir), 'users', fmt=fmt).to_table()
+    assert table.num_rows == 4
+    assert 'row_hash' not in table.column_names and 'sync_date' in table.column_names
+    assert table.schema.field('id').type == pa.int64()
+    assert table.schema.field('theoreticalRemuneration').type == pa.float64()
+    assert sorted(table.column('id').to_pylist()) == [1, 2, 2, 3]
+
+def test_export_prunes_columns(engine, tmp_path):
+    output_dir = tmp_path / 'export'
+    upsert_records(_users(1, 2), engine, 'users')
+
+    export_snapshot(engine, str(output_dir), tables=['users', 'departments'], columns={'users': ['id', 'department']})
+
+    users = open_snapshot(str(output_dir), 'users').to_table()
+    assert users.column_names == ['id', 'department', 'synced_at', 'sync_date']
+    with pytest.raises(ValueError):
+        export_table(engine, 'users', str(output_dir), columns=['salary'])
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM departments")).scalar() == 0
+
+def test_full_export_replaces_previous_files(engine, tmp_path):
+    output_dir = tmp_path / 'export'
+    upsert_records(_users(1, 2), engine, 'users')
+    export_table(engine, 'users', str(output_dir))
+    upsert_records(_users(3), engine, 'users')
+    export_table(engine, 'users', str(output_dir))
+
+    full = export_table(engine, 'users', str(output_dir), full=True)
+
+    assert full['rows'] == 3 and all('/users/sync_date=' in path for path in full['files'])
+    assert sorted(open_snapshot(str(output_dir), 'users').to_table().column('id').to_pylist()) == [1, 2, 3]
+    assert sorted(path.name for path in output_dir.iterdir()) == ['users']
+
+def test_main_passes_columns_per_table(engine, tmp_path):
+    upsert_records(_users(1), engine, 'users')
+    output_dir = tmp_path / 'export'
+
+    main([str(output_dir), '--database', str(tmp_path / 'test.sqlite'), '--tables', 'users',
+          '--columns', 'users:id,name'])
+
+    assert open_snapshot(str(output_dir), 'users').to_table().column_names == ['id', 'name', 'synced_at', 'sync_date']
+    with pytest.raises(SystemExit):
+        main([str(output_dir), '--columns', 'users'])
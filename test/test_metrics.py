@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine
+from src.api_client import LuccaAPIClient, RateLimiter
+from src.db_manager import initialize_db
+from src.metrics import RunMetrics
+from src.sync import sync_users
+
+
+class StatsClient:
+    def __init__(self):
+        self.stats = {'requests': 0, 'retries': 0, 'bytes_downloaded': 0}
+
+    def iter_user_pages(self, params=None, start_offset=0):
+        self.stats['requests'] += 2
+        self.stats['retries'] += 1
+        self.stats['bytes_downloaded'] += 1024
+        yield [{
+            "id": 1,
+            "name": "User 1",
+            "modifiedOn": "2023-10-01T12:00:00Z",
+            "department": {"name": "Engineering"},
+            "manager": None,
+            "rolePrincipal": {"name": "Developer"},
+            "legalEntity": {"name": "Company A"},
+            "dtContractStart": "2023-01-01",
+            "dtContractEnd": None,
+            "applicationData": {},
+            "habilitedRoles": [],
+        }]
+
+
+def test_stage_aggregates_calls_and_http_counters():
+    metrics = RunMetrics()
+    client = StatsClient()
+
+    for _ in range(2):
+        with metrics.stage('get_users', client=client) as stage:
+            stage['rows_out'] = len(next(client.iter_user_pages()))
+
+    stage = metrics.stages['get_users']
+    assert stage['calls'] == 2
+    assert stage['rows_out'] == 2
+    assert stage['http_requests'] == 4
+    assert stage['http_retries'] == 2
+    assert stage['bytes_downloaded'] == 2048
+    assert stage['wall_seconds'] >= 0
+
+
+@patch('src.api_client.requests.Session.get')
+def test_concurrent_stages_only_count_their_own_requests_and_cpu(mock_get):
+    calls = {'users': 0, 'departments': 0}
+    lock = threading.Lock()
+
+    def fake_get(endpoint, params=None, **kwargs):
+        name = endpoint.rsplit('/', 1)[-1]
+        offset, limit = (int(v) for v in params['paging'].split(','))
+        with lock:
+            calls[name] += 1
+        time.sleep(0.01)
+        response = MagicMock(status_code=200, content=b'x' * 10)
+        total = 23 if name == 'users' else 7
+        response.json.return_value = {"data": {"items": [{"id": i} for i in range(offset, min(offset + limit, total))]}}
+        return response
+
+    mock_get.side_effect = fake_get
+    client = LuccaAPIClient(page_size=5, max_workers=2, rate_limiter=RateLimiter(rate=1000.0), base_url='http://lucca.test')
+    metrics = RunMetrics()
+    barrier = threading.Barrier(2)
+
+    def run(name, pages):
+        with metrics.stage(f'get_{name}', client=client):
+            barrier.wait()
+            for _ in pages():
+                pass
+            if name == 'departments':
+                # Attente sans calcul : le CPU de l'autre étape ne lui est pas imputé
+                time.sleep(0.2)
+
+    threads = [threading.Thread(target=run, args=('users', client.iter_user_pages)),
+               threading.Thread(target=run, args=('departments', client.iter_department_pages))]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        pass
+    for thread in threads:
+        thread.join()
+
+    assert metrics.stages['get_users']['http_requests'] == calls['users']
+    assert metrics.stages['get_departments']['http_requests'] == calls['departments']
+    assert metrics.stages['get_departments']['bytes_downloaded'] == 10 * calls['departments']
+    assert metrics.stages['get_departments']['cpu_seconds'] < 0.1
+
+
+def test_sync_users_records_every_stage(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    initialize_db(engine)
+    metrics = RunMetrics()
+
+    sync_users(StatsClient(), engine, metrics=metrics)
+
+    assert {'get_users', 'transform_user_data', 'process_contracts_from_users',
+            'insert_new_records[users]', 'insert_new_records[contracts]'} <= set(metrics.stages)
+    assert metrics.stages['insert_new_records[users]']['rows_out'] == 1
+    assert metrics.results['users']['fetched'] == 1
+
+
+def test_exports_json_and_prometheus(tmp_path):
+    metrics = RunMetrics()
+    with metrics.stage('transform_user_data', rows_in=3) as stage:
+        stage['rows_out'] = 3
+
+    metrics.write_json(str(tmp_path / 'report.json'))
+    metrics.write_prometheus(str(tmp_path / 'sync.prom'))
+
+    report = json.loads((tmp_path / 'report.json').read_text())
+    assert report['stages']['transform_user_data']['rows_in'] == 3
+    prom = (tmp_path / 'sync.prom').read_text()
+    assert 'reflect_sync_stage_rows_out{stage="transform_user_data"} 3' in prom
+    assert '# TYPE reflect_sync_stage_wall_seconds gauge' in prom
+
+
+def test_profile_dump_for_slowest_stage(tmp_path):
+    metrics = RunMetrics(profile_dir=str(tmp_path))
+    with metrics.stage('fast'):
+        pass
+    with metrics.stage('insert_new_records[users]'):
+        sum(range(100_000))
+
+    path = metrics.dump_slowest_profile()
+    assert path is not None and path.endswith('.prof')
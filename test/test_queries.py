@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from src.db_manager import (initialize_db, upsert_records, replace_links, write_department_closure,
+                            get_sync_generation)
+from src.queries import OrgQueries
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    initialize_db(engine)
+    return engine
+
+def _users(managers):
+    # managers : ID de l'utilisateur -> ID de son manager
+    return pd.DataFrame({
+        'id': list(managers),
+        'name': [f'User {user_id}' for user_id in managers],
+        'managerId': pd.array(list(managers.values()), dtype='Int64'),
+    })
+
+def test_manager_chain_and_direct_reports(engine):
+    upsert_records(_users({1: None, 2: 1, 3: 2, 4: 2, 5: 99}), engine, 'users')
+    queries = OrgQueries(engine)
+
+    assert queries.get_user(3)['name'] == 'User 3'
+    assert 'row_hash' not in queries.get_user(3)
+    assert queries.get_user(42) is None
+    assert [user['id'] for user in queries.manager_chain(3)] == [2, 1]
+    assert queries.manager_chain(1) == []
+    # Un manager absent de la base termine la chaîne
+    assert queries.manager_chain(5) == []
+    assert [user['id'] for user in queries.direct_reports(2)] == [3, 4]
+
+def test_manager_chain_stops_on_cycle(engine):
+    upsert_records(_users({1: 3, 2: 1, 3: 2}), engine, 'users')
+
+    assert [user['id'] for user in OrgQueries(engine).manager_chain(1)] == [3, 2]
+
+def test_department_members_with_subdepartments(engine):
+    upsert_records(_users({1: None, 2: 1, 3: 1}), engine, 'users')
+    replace_links(pd.DataFrame({'department_id': [10, 10, 11], 'user_id': [1, 2, 3], 'is_current': [1, 0, 1]}),
+                  engine, 'department_members', 'department_id', [10, 11])
+    write_department_closure(pd.DataFrame({'ancestor_id': [10, 11, 10], 'descendant_id': [10, 11, 11],
+                                           'depth': [0, 0, 1]}), engine)
+    queries = OrgQueries(engine)
+
+    assert [user['id'] for user in queries.department_members(10)] == [1]
+    assert [user['id'] for user in queries.department_members(10, current_only=False)] == [1, 2]
+    assert [user['id'] for user in queries.department_members(10, include_subdepartments=True)] == [1, 3]
+
+def test_cache_is_invalidated_by_sync_generation(engine):
+    upsert_records(_users({1: None, 2: 1}), engine, 'users')
+    queries = OrgQueries(engine)
+
+    queries.direct_reports(1)[0]['name'] = 'Modified by caller'
+    assert queries.direct_reports(1)[0]['name'] == 'User 2'
+    assert queries.cache_info()['hits'] == 1
+
+    generation = get_sync_generation(engine)
+    upsert_records(_users({1: None, 2: 1}), engine, 'users')
+    assert get_sync_generation(engine) == generation
+
+    upsert_records(_users({3: 1}), engine, 'users')
+    assert get_sync_generation(engine) == generation + 1
+    assert [user['id'] for user in queries.direct_reports(1)] == [2, 3]
+    assert queries.cache_info()['generation'] == generation + 1
+
+def test_cache_evicts_least_recently_used(engine):
+    upsert_records(_users({1: None, 2: 1, 3: 1}), engine, 'users')
+    queries = OrgQueries(engine, cache_size=2)
+
+    queries.get_user(1)
+    queries.get_user(2)
+    queries.get_user(1)
+    queries.get_user(3)
+    queries.get_user(1)
+    assert queries.cache_info()['hits'] == 2
+    assert queries.cache_info()['size'] == 2
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import create_engine, text
+from src.db_manager import initialize_db, get_refetch_queue, get_sync_generation
+from src.reconcile import reconcile_users, reconcile_departments, diff_index
+from src.sync import sync_users, sync_departments
+
+
+def make_user(user_id, modified_on="2023-10-01T12:00:00Z", name=None):
+    return {
+        "id": user_id, "name": name or f"User {user_id}", "modifiedOn": modified_on,
+        "department": {"name": "Engineering"}, "manager": None, "rolePrincipal": {"name": "Developer"},
+        "legalEntity": {"name": "Company A"}, "dtContractStart": "2023-01-01", "dtContractEnd": None,
+        "applicationData": {}, "habilitedRoles": [],
+    }
+
+
+class ProbeClient:
+    # Renvoie seulement les champs et les IDs demandés, comme l'API
+    def __init__(self, users, departments=(), fail_on_ids=False):
+        self.users = users
+        self.departments = list(departments)
+        self.fail_on_ids = fail_on_ids
+        self.params = []
+
+    def _select(self, records, params):
+        self.params.append(params)
+        if 'id' in params:
+            if self.fail_on_ids:
+                raise RuntimeError("connexion interrompue")
+            wanted = {int(record_id) for record_id in params['id'].split(',')}
+            records = [record for record in records if record['id'] in wanted]
+        fields = params['fields'].split(',')
+        if len(fields) <= 2:
+            records = [{field: record[field] for field in fields} for record in records]
+        return records
+
+    def iter_user_pages(self, params=None, start_offset=0):
+        yield self._select(self.users, params)
+
+    def iter_department_pages(self, params=None):
+        yield self._select(self.departments, params)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    initialize_db(engine)
+    return engine
+
+def _users_table(engine):
+    with engine.connect() as conn:
+        return {row.id: row for row in conn.execute(text('SELECT id, name, "deletedAt" FROM users'))}
+
+def test_diff_index():
+    assert diff_index({1: 'a', 2: 'b', 4: 'd'}, {1: 'a', 2: 'x', 3: 'c'}) == ([2, 4], [3])
+
+def test_reconcile_users_tombstones_and_refetches_only_differing_ids(engine):
+    sync_users(ProbeClient([make_user(i) for i in range(1, 5)]), engine)
+    generation = get_sync_generation(engine)
+    client = ProbeClient([make_user(1), make_user(3, "2023-11-01T00:00:00Z", name="Renamed"), make_user(4), make_user(5)])
+
+    summary = reconcile_users(client, engine)
+
+    assert summary == {'probed': 4, 'deleted': 1, 'queued': 2, 'refetched': 2, 'remaining': 0, 'failed': False}
+    assert client.params[0] == {'fields': 'id,modifiedOn'}
+    assert client.params[1]['id'] == '3,5'
+    users = _users_table(engine)
+    assert users[2].deletedAt is not None
+    assert users[3].name == "Renamed" and users[5].deletedAt is None
+    assert get_sync_generation(engine) > generation
+
+    # Un utilisateur réapparu est récupéré et n'est plus marqué supprimé
+    client.users.append(make_user(2))
+    assert reconcile_users(client, engine)['queued'] == 1
+    assert _users_table(engine)[2].deletedAt is None
+
+def test_reconcile_users_refuses_mass_deletion(engine):
+    sync_users(ProbeClient([make_user(i) for i in range(1, 5)]), engine)
+
+    summary = reconcile_users(ProbeClient([make_user(1)]), engine)
+
+    assert summary['failed'] and summary['deleted'] == 0
+    assert all(user.deletedAt is None for user in _users_table(engine).values())
+
+def test_reconcile_users_keeps_queue_after_failed_refetch(engine):
+    sync_users(ProbeClient([make_user(1), make_user(2)]), engine)
+    users = [make_user(1, "2023-11-01T00:00:00Z"), make_user(2), make_user(3)]
+
+    summary = reconcile_users(ProbeClient(users, fail_on_ids=True), engine)
+    assert summary['failed'] and summary['remaining'] == 2
+    assert get_refetch_queue(engine, 'users') == [1, 3]
+
+    # La file est reprise par la réconciliation suivante
+    summary = reconcile_users(ProbeClient(users), engine)
+    assert summary['refetched'] == 2 and summary['remaining'] == 0
+    assert 3 in _users_table(engine)
+
+def test_reconcile_departments_tombstones_and_resyncs_new_ones(engine):
+    departments = [{"id": i, "name": f"Dept {i}", "parentId": None, "users": [], "currentUsers": []} for i in (1, 2, 3)]
+    sync_departments(ProbeClient([], departments), engine)
+    client = ProbeClient([], [departments[0], departments[2],
+                              {"id": 4, "name": "Dept 4", "parentId": 1, "users": [], "currentUsers": []}])
+
+    summary = reconcile_departments(client, engine)
+
+    assert summary == {'probed': 3, 'deleted': 1, 'queued': 1, 'written': 1, 'failed': False}
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text('SELECT id, "deletedAt" FROM departments')).fetchall())
+    assert rows[2] is not None and rows[4] is None
@@ -0,0 +1,261 @@
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, text
+from src.db_manager import initialize_db, get_sync_watermark, get_checkpoint
+from src.main import run_sync
+from src.metrics import RunMetrics
+from src.sync import sync_users, sync_all, sync_failed, cap_watermark
+
+
+def make_user(user_id, modified_on="2023-10-01T12:00:00Z"):
+    return {
+        "id": user_id,
+        "name": f"User {user_id}",
+        "modifiedOn": modified_on,
+        "department": {"name": "Engineering"},
+        "manager": None,
+        "rolePrincipal": {"name": "Developer"},
+        "legalEntity": {"name": "Company A"},
+        "dtContractStart": "2023-01-01",
+        "dtContractEnd": None,
+        "applicationData": {"theoreticalRemuneration": {"value": 50000}},
+        "habilitedRoles": [{"id": 10, "name": "Admin"}],
+    }
+
+
+class FakeClient:
+    def __init__(self, pages, fail_after=None):
+        self.pages = pages
+        self.fail_after = fail_after
+        self.params = []
+        self.offsets = []
+
+    def iter_user_pages(self, params=None, start_offset=0):
+        self.params.append(params)
+        self.offsets.append(start_offset)
+        after = int(params['id'].split(',')[1]) if 'id' in (params or {}) else None
+        position = 0
+        for index, page in enumerate(self.pages):
+            if self.fail_after is not None and index >= self.fail_after:
+                raise RuntimeError("connexion interrompue")
+            page = [user for user in page if after is None or user['id'] > after]
+            if page and position >= start_offset:
+                yield page
+            position += len(page)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    initialize_db(engine)
+    return engine
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_sync_users_writes_all_pages(engine, stream):
+    pages = [[make_user(1), make_user(2)], [make_user(3, "2023-10-05T08:00:00Z")]]
+
+    summary = sync_users(FakeClient(pages), engine, stream=stream)
+
+    assert summary['fetched'] == 3
+    assert summary['users']['inserted'] == 3
+    assert summary['contracts']['inserted'] == 3
+    assert get_sync_watermark(engine, 'users') == "2023-10-05T08:00:00+00:00"
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 3
+
+def test_sync_users_stream_failure_keeps_watermark(engine):
+    pages = [[make_user(1)], [make_user(2)]]
+
+    summary = sync_users(FakeClient(pages, fail_after=1), engine, stream=True)
+
+    assert summary['failed']
+    assert summary['users']['inserted'] == 1
+    assert get_sync_watermark(engine, 'users') is None
+    checkpoint = get_checkpoint(engine, 'users')
+    assert (checkpoint['next_offset'], checkpoint['stage']) == (1, 'fetch')
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_sync_users_resumes_from_checkpoint(engine, stream):
+    pages = [[make_user(1), make_user(2, "2023-10-03T00:00:00Z")], [make_user(3)]]
+    assert sync_users(FakeClient(pages, fail_after=1), engine, stream=stream)['failed']
+
+    client = FakeClient(pages)
+    summary = sync_users(client, engine, stream=stream)
+
+    # Seule la page non validée est de nouveau téléchargée et écrite, en reprenant après le dernier ID validé
+    assert client.params[0]['id'] == 'greaterthan,2'
+    assert client.params[0]['orderBy'] == 'id,asc'
+    assert (summary['resumed_from'], summary['fetched']) == (2, 1)
+    assert summary['users']['inserted'] == 1
+    assert get_sync_watermark(engine, 'users') == "2023-10-03T00:00:00+00:00"
+    assert get_checkpoint(engine, 'users') is None
+
+def test_sync_users_stops_at_failed_write(engine, monkeypatch):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TRIGGER fail_user_2 BEFORE INSERT ON users WHEN NEW.id = 2 "
+                          "BEGIN SELECT RAISE(ABORT, 'disque plein'); END"))
+    pages = [[make_user(1)], [make_user(2)], [make_user(3)]]
+
+    summary = sync_users(FakeClient(pages), engine, stream=True)
+
+    assert summary['failed'] and summary['users']['inserted'] == 1
+    checkpoint = get_checkpoint(engine, 'users')
+    assert (checkpoint['next_offset'], checkpoint['stage']) == (1, 'write')
+    # Un échec d'écriture fait échouer la synchronisation au lieu d'être masqué
+    monkeypatch.setenv('SYNC_STREAM', '1')
+    assert not run_sync(ConcurrentClient(pages), engine, RunMetrics())
+
+def test_sync_users_requests_changes_since_watermark(engine):
+    sync_users(FakeClient([[make_user(1)]]), engine)
+    client = FakeClient([[make_user(1, "2023-10-02T00:00:00Z")]])
+
+    summary = sync_users(client, engine, stream=True)
+
+    assert client.params[0]['modifiedOn'] == "since,2023-10-01T12:00:00+00:00"
+    assert summary['users'] == {'inserted': 0, 'updated': 1, 'unchanged': 0}
+
+class LiveClient:
+    # Applique les filtres `modifiedOn=since,...` et `id=greaterthan,...` ; `edits` modifie les
+    # utilisateurs entre deux pages, `fail_at` interrompt une fois le parcours avant cet ID
+    def __init__(self, users, edits=None, fail_at=None):
+        self.users = {user['id']: user for user in users}
+        self.edits = edits or {}
+        self.fail_at = fail_at
+
+    def iter_user_pages(self, params=None, start_offset=0):
+        since = params.get('modifiedOn', 'since,').split(',', 1)[1]
+        after = int(params.get('id', 'greaterthan,0').split(',')[1])
+        for user_id in sorted(user_id for user_id in self.users if user_id > after):
+            if user_id == self.fail_at:
+                self.fail_at = None
+                raise RuntimeError("connexion interrompue")
+            user = self.users[user_id]
+            if not since or datetime.fromisoformat(user['modifiedOn']) >= datetime.fromisoformat(since):
+                yield [dict(user)]
+            for edited_id, changes in self.edits.pop(user_id, {}).items():
+                self.users[edited_id].update(changes)
+
+def test_cap_watermark():
+    started_at = datetime(2023, 10, 1, 12, 0, tzinfo=timezone.utc)
+    assert cap_watermark("2023-10-01T10:00:00+00:00", started_at) == "2023-10-01T10:00:00+00:00"
+    assert cap_watermark("2023-10-01T12:10:00+00:00", started_at) == "2023-10-01T11:55:00+00:00"
+    assert cap_watermark(None, started_at) is None
+
+def test_sync_users_refetches_user_edited_during_run(engine):
+    now = datetime.now(timezone.utc)
+    # L'utilisateur 1 est modifié après la récupération de sa page, avant celle de l'utilisateur 2
+    client = LiveClient(
+        [make_user(1, (now - timedelta(days=1)).isoformat()), make_user(2, (now + timedelta(seconds=10)).isoformat())],
+        edits={1: {1: {'name': "Renamed", 'modifiedOn': (now + timedelta(seconds=5)).isoformat()}}},
+    )
+    sync_users(client, engine, stream=True)
+    assert get_sync_watermark(engine, 'users') < now.isoformat()
+
+    sync_users(client, engine, stream=True)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM users WHERE id = 1")).scalar() == "Renamed"
+
+
+def test_sync_users_resume_catches_users_edited_before_the_resume_key(engine, monkeypatch):
+    monkeypatch.setenv('SYNC_WATERMARK_MARGIN', '0')
+    day_ago = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    client = LiveClient([make_user(1, day_ago), make_user(2, day_ago), make_user(3, day_ago)], fail_at=3)
+    assert sync_users(client, engine, stream=True)['failed']
+    # Pendant l'interruption, l'utilisateur 1 (avant la clé de reprise) puis l'utilisateur 3 sont modifiés
+    edited_at = datetime.now(timezone.utc)
+    client.users[1].update({'name': "Renamed", 'modifiedOn': edited_at.isoformat()})
+    client.users[3]['modifiedOn'] = (edited_at + timedelta(milliseconds=1)).isoformat()
+    time.sleep(0.01)
+
+    summary = sync_users(client, engine, stream=True)
+    assert (summary['resumed_from'], summary['fetched']) == (2, 1)
+    # Le high-water mark est plafonné au début du passage interrompu, pas à celui de la reprise
+    assert datetime.fromisoformat(summary['watermark']) < edited_at
+
+    sync_users(client, engine, stream=True)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM users WHERE id = 1")).scalar() == "Renamed"
+
+
+class ConcurrentClient(FakeClient):
+    """Client dont les deux endpoints ne répondent que s'ils sont interrogés en même temps."""
+
+    def __init__(self, pages, fail_users=False):
+        super().__init__(pages)
+        self.fail_users = fail_users
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def iter_user_pages(self, params=None, start_offset=0):
+        self.barrier.wait()
+        if self.fail_users:
+            raise RuntimeError("connexion interrompue")
+        yield from super().iter_user_pages(params, start_offset)
+
+    def iter_department_pages(self, params=None):
+        self.barrier.wait()
+        yield [{"id": 1, "name": "Engineering", "users": [{"id": 1}], "currentUsers": []}]
+
+def test_sync_all_runs_both_endpoints_concurrently(engine):
+    results = sync_all(ConcurrentClient([[make_user(1), make_user(2)]]), engine)
+
+    assert results['users']['users']['inserted'] == 2
+    assert results['departments']['inserted'] == 1
+
+def test_sync_all_branch_failure_does_not_cancel_the_other(engine):
+    results = sync_all(ConcurrentClient([[make_user(1)]], fail_users=True), engine)
+
+    assert results['users']['failed']
+    assert results['departments']['inserted'] == 1
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM departments")).scalar() == 1
+
+def test_sync_all_writes_junction_tables_by_id(engine):
+    sync_all(ConcurrentClient([[make_user(1), make_user(2)]]), engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT user_id FROM user_roles WHERE role_id = 10 ORDER BY user_id")).scalars().all() == [1, 2]
+        assert conn.execute(text("SELECT name FROM roles WHERE id = 10")).scalar() == "Admin"
+        assert conn.execute(text("SELECT department_id FROM department_members WHERE user_id = 1")).scalars().all() == [1]
+
+
+def test_sync_users_parallel_transform_matches_serial(engine, tmp_path, monkeypatch):
+    users = [make_user(user_id) for user_id in range(1, 8)]
+    users[5]['manager'] = {"id": 1, "name": "User 1"}
+    users[6]['dtContractEnd'] = "2024-01-01"
+    sync_users(FakeClient([users]), engine)
+
+    parallel_engine = create_engine(f"sqlite:///{tmp_path / 'parallel.sqlite'}")
+    initialize_db(parallel_engine)
+    monkeypatch.setenv('SYNC_TRANSFORM_WORKERS', '3')
+    monkeypatch.setenv('SYNC_PARALLEL_MIN_ROWS', '2')
+    metrics = RunMetrics()
+    sync_users(FakeClient([users]), parallel_engine, metrics=metrics)
+
+    assert 'process_contracts_from_users' not in metrics.stages
+    for table in ('users', 'contracts'):
+        query = text(f"SELECT * FROM {table} ORDER BY 1")
+        with engine.connect() as conn, parallel_engine.connect() as parallel_conn:
+            serial_rows = [{k: v for k, v in row.items() if k != 'synced_at'} for row in conn.execute(query).mappings()]
+            parallel_rows = [{k: v for k, v in row.items() if k != 'synced_at'}
+                             for row in parallel_conn.execute(query).mappings()]
+        assert parallel_rows == serial_rows
+
+def test_sync_all_parallel_transform_alongside_fetch_threads(engine, monkeypatch):
+    # Les processus de transformation sont lancés depuis le thread d'écriture, d'autres threads étant actifs
+    monkeypatch.setenv('SYNC_TRANSFORM_WORKERS', '2')
+    monkeypatch.setenv('SYNC_PARALLEL_MIN_ROWS', '2')
+
+    results = sync_all(ConcurrentClient([[make_user(user_id) for user_id in range(1, 5)]]), engine)
+
+    assert results['users']['users']['inserted'] == 4
+    assert not results['users']['failed']
+
+def test_sync_failed_flags_errors_and_empty_first_sync():
+    users = {'fetched': 0, 'failed': False, 'previous_watermark': None, 'resumed_from': 0}
+    assert sync_failed({'users': users, 'departments': None}) == ['departments', 'users']
+    assert sync_failed({'users': dict(users, previous_watermark="2023-10-01T12:00:00+00:00")}) == []
+    assert sync_failed({'users': dict(users, fetched=3, failed=True)}) == ['users']
+    assert sync_failed({'departments': {'inserted': 0, 'updated': 0, 'unchanged': 0}}) == []
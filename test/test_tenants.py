@@ -0,0 +1,72 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from src.tenants import load_manifest, sync_tenant, run_tenants
+
+
+def write_manifest(tmp_path, tenants):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps({'tenants': tenants}))
+    return str(path)
+
+def test_load_manifest_applies_defaults(tmp_path):
+    path = write_manifest(tmp_path, [
+        {'name': 'paris', 'api_url': 'http://paris.test', 'token_env': 'PARIS_TOKEN', 'rate_limit': 5},
+        {'name': 'lyon', 'api_url': 'http://lyon.test', 'database': 'autre.sqlite'},
+    ])
+
+    paris, lyon = load_manifest(path)
+
+    assert paris['database'] == str(tmp_path / 'paris.sqlite')
+    assert paris['rate_limit'] == 5 and paris['max_workers'] is None
+    assert lyon['database'] == str(tmp_path / 'autre.sqlite')
+
+@pytest.mark.parametrize("tenants, message", [
+    ([{'name': 'a', 'api_url': 'http://a.test'}, {'name': 'a', 'api_url': 'http://b.test'}], "plusieurs fois"),
+    ([{'name': 'a', 'api_url': 'http://a.test', 'rate': 5}], "Options inconnues"),
+    ([{'name': 'a'}], "api_url"),
+    ([], "Aucun tenant"),
+])
+def test_load_manifest_rejects_invalid_entries(tmp_path, tenants, message):
+    with pytest.raises(ValueError, match=message):
+        load_manifest(write_manifest(tmp_path, tenants))
+
+def _fake_get(url, params=None, **kwargs):
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {}
+    response.content = b''
+    if url.endswith('/users'):
+        items = [{"id": 1, "name": "John Doe", "modifiedOn": "2023-10-01T12:00:00Z",
+                  "department": {"name": "Engineering"}, "manager": None, "rolePrincipal": {"name": "Developer"},
+                  "legalEntity": {"name": "Company A"}, "dtContractStart": "2023-01-01", "dtContractEnd": None,
+                  "applicationData": {}, "habilitedRoles": []}]
+    else:
+        items = [{"id": 1, "name": "Engineering", "parentId": None, "users": [], "currentUsers": []}]
+    response.json.return_value = {"data": {"items": items}}
+    return response
+
+@patch('src.api_client.requests.Session.get', side_effect=_fake_get)
+def test_sync_tenant_writes_its_own_database(mock_get, tmp_path):
+    tenant = load_manifest(write_manifest(tmp_path, [{'name': 'paris', 'api_url': 'http://paris.test', 'token': 't'}]))[0]
+
+    report = sync_tenant(tenant)
+
+    assert report['status'] == 'ok'
+    assert report['results']['users']['users']['inserted'] == 1
+    assert report['results']['departments']['inserted'] == 1
+    assert (tmp_path / 'paris.sqlite').exists()
+    assert all(call.args[0].startswith('http://paris.test/') for call in mock_get.call_args_list)
+
+def test_run_tenants_aggregates_failures_without_stopping(tmp_path):
+    tenants = load_manifest(write_manifest(tmp_path, [
+        {'name': 'paris', 'api_url': 'http://paris.test', 'token_env': 'REFLECT_TEST_MISSING_TOKEN'},
+        {'name': 'lyon', 'api_url': 'http://lyon.test', 'token_env': 'REFLECT_TEST_MISSING_TOKEN'},
+    ]))
+
+    report = run_tenants(tenants, max_processes=2)
+
+    assert report['tenants'] == 2
+    assert report['succeeded'] == 0
+    assert report['failed'] == ['lyon', 'paris']
+    assert all('token' in tenant_report['error'] for tenant_report in report['reports'])